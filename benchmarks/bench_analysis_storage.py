@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Benchmark do Layout de Gravação das Análises
+Compara o layout antigo da tabela analyses (cada seção serializada com
+json.dumps e repetida dentro de comprehensive_analysis) com o layout
+normalizado (seções gravadas uma vez e remontadas na leitura): tamanho do
+payload enviado ao Supabase, tempo de montagem/serialização da linha e
+tempo de desserialização/remontagem da resposta, com json e com orjson.
+
+A análise usada é gerada pelo motor contra os provedores stub, ou lida de
+um arquivo JSON (--analysis).
+
+Uso:
+    python benchmarks/bench_analysis_storage.py --iterations 200
+    python benchmarks/bench_analysis_storage.py --analysis analise.json --json armazenamento.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from datetime import datetime
+from typing import Any, Callable, Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bench_pipeline import SAMPLE_REQUEST, _free_port, _git_revision, _percentiles
+
+# Campos que get_analysis desserializava um a um no layout antigo
+LEGACY_JSON_FIELDS = [
+    'avatar_data', 'positioning_data', 'competition_data',
+    'marketing_data', 'metrics_data', 'funnel_data',
+    'market_intelligence', 'action_plan', 'comprehensive_analysis'
+]
+
+def generate_analysis(args) -> Dict[str, Any]:
+    """Gera uma análise completa com o motor apontado para os stubs"""
+    port = _free_port()
+    os.environ.update(
+        STUB_PROVIDERS_ENABLED='true',
+        STUB_PROVIDERS_URL=f"http://127.0.0.1:{port}",
+        LOG_FILE_ENABLED='false',
+        AI_WARMUP_ENABLED='false',
+        QUOTA_SAFETY_MARGIN='1000000',
+        SEARCH_CACHE_ENABLED='false',
+        CACHE_ENABLED='false'
+    )
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.chdir(tempfile.mkdtemp(prefix='arqv30-storage-'))
+
+    import logging
+    logging.basicConfig(level=getattr(logging, os.environ['LOG_LEVEL']))
+
+    from services.stub_providers import StubProviderServer
+    from services.enhanced_analysis_engine import enhanced_analysis_engine
+
+    stub_server = StubProviderServer(port=port, seed=args.seed, latency_scale=args.latency_scale).start()
+    try:
+        return enhanced_analysis_engine.generate_comprehensive_analysis(dict(SAMPLE_REQUEST))
+    finally:
+        stub_server.stop()
+
+def legacy_row(db_manager, analysis_data: Dict[str, Any], dumps: Callable[[Any], str]) -> Dict[str, Any]:
+    """Linha no layout antigo: seções como strings JSON e o documento inteiro repetido"""
+    row = db_manager.build_analysis_row({
+        key: value for key, value in analysis_data.items()
+        if key not in db_manager.SECTION_COLUMNS.values()
+    })
+    for column, key in db_manager.SECTION_COLUMNS.items():
+        if analysis_data.get(key):
+            row[column] = dumps(analysis_data[key])
+    row['comprehensive_analysis'] = dumps(analysis_data)
+    return row
+
+def measure(func: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return _percentiles(samples)
+
+def run_layouts(analysis: Dict[str, Any], iterations: int) -> Dict[str, Any]:
+    from database import db_manager
+    from utils import json_codec
+
+    # O cliente Supabase serializa o corpo com json.dumps (httpx) - é o que vai pela rede
+    wire_dumps, wire_loads = json.dumps, json.loads
+    backends = ['stdlib'] + (['orjson'] if json_codec.orjson is not None else [])
+    results = {}
+
+    for backend in backends:
+        json_codec.BACKEND = backend
+
+        def legacy_write():
+            return wire_dumps([legacy_row(db_manager, analysis, json_codec.dumps)])
+
+        def normalized_write():
+            return wire_dumps([db_manager.build_analysis_row(analysis)])
+
+        legacy_body, normalized_body = legacy_write(), normalized_write()
+
+        def legacy_read():
+            row = wire_loads(legacy_body)[0]
+            for field in LEGACY_JSON_FIELDS:
+                if isinstance(row.get(field), str):
+                    row[field] = json_codec.loads(row[field])
+            return row
+
+        def normalized_read():
+            return db_manager.assemble_analysis(wire_loads(normalized_body)[0])
+
+        # A remontagem precisa devolver o mesmo documento que o layout antigo
+        rebuilt = normalized_read()['comprehensive_analysis']
+        assert wire_dumps(rebuilt, sort_keys=True) == wire_dumps(json.loads(wire_dumps(analysis)), sort_keys=True)
+
+        results[backend] = {
+            'legacy': {
+                'payload_bytes': len(legacy_body.encode('utf-8')),
+                'write_ms': measure(legacy_write, iterations),
+                'read_ms': measure(legacy_read, iterations)
+            },
+            'normalized': {
+                'payload_bytes': len(normalized_body.encode('utf-8')),
+                'write_ms': measure(normalized_write, iterations),
+                'read_ms': measure(normalized_read, iterations)
+            }
+        }
+
+    return results
+
+def print_report(results: Dict[str, Any], document_bytes: int):
+    print(f"📦 Documento da análise: {document_bytes / 1024:.1f} KB")
+    print("-" * 78)
+    print(f"{'codec':<8}{'layout':<12}{'payload KB':>12}{'escrita p50':>14}{'p95':>9}{'leitura p50':>14}{'p95':>9}   (ms)")
+    for backend, layouts in results.items():
+        for layout, data in layouts.items():
+            print(f"{backend:<8}{layout:<12}{data['payload_bytes'] / 1024:>12.1f}"
+                  f"{data['write_ms']['p50']:>14.3f}{data['write_ms']['p95']:>9.3f}"
+                  f"{data['read_ms']['p50']:>14.3f}{data['read_ms']['p95']:>9.3f}")
+    print("-" * 78)
+    for backend, layouts in results.items():
+        legacy, normalized = layouts['legacy'], layouts['normalized']
+        saved = 1 - normalized['payload_bytes'] / legacy['payload_bytes']
+        print(f"{backend}: payload {saved * 100:.0f}% menor, escrita {legacy['write_ms']['p50'] / normalized['write_ms']['p50']:.1f}x, "
+              f"leitura {legacy['read_ms']['p50'] / normalized['read_ms']['p50']:.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara o layout antigo e o normalizado da tabela analyses')
+    parser.add_argument('--analysis', help='Arquivo JSON com uma análise (senão gera uma com os stubs)')
+    parser.add_argument('--iterations', type=int, default=200, help='Repetições de cada medição')
+    parser.add_argument('--latency-scale', type=float, default=0.01, help='Multiplicador das latências dos stubs')
+    parser.add_argument('--seed', type=int, default=42, help='Semente dos stubs')
+    parser.add_argument('--json', dest='json_output', help='Arquivo para salvar resultados em JSON')
+    args = parser.parse_args()
+
+    if args.json_output:
+        args.json_output = os.path.abspath(args.json_output)
+
+    if args.analysis:
+        with open(args.analysis, 'r', encoding='utf-8') as f:
+            analysis = json.load(f)
+    else:
+        analysis = generate_analysis(args)
+
+    # Mesma normalização de tipos que a resposta JSON da API aplica
+    analysis = json.loads(json.dumps(analysis, default=str))
+    document_bytes = len(json.dumps(analysis, ensure_ascii=False).encode('utf-8'))
+
+    results = run_layouts(analysis, args.iterations)
+    print_report(results, document_bytes)
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'revision': _git_revision(),
+                'timestamp': datetime.now().isoformat(),
+                'document_bytes': document_bytes,
+                'params': {'iterations': args.iterations, 'source': args.analysis or 'stubs'},
+                'results': results
+            }, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados salvos em {args.json_output}")
+
+if __name__ == '__main__':
+    main()
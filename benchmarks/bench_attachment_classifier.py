@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Benchmark do Classificador de Anexos
+Gera textos sintéticos de vários MB, um por categoria dominante, e compara a
+classificação antiga (um `count`/`in content.lower()` por palavra-chave) com o
+KeywordMatcher (uma regex, uma passada, sem diferenciar acentos). Mede o caminho
+completo: classificação + processamento específico da categoria.
+
+Uso:
+    python benchmarks/bench_attachment_classifier.py --sizes-mb 1 5 20
+    python benchmarks/bench_attachment_classifier.py --sizes-mb 50 --iterations 2 --json classificador.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bench_pipeline import _git_revision, _percentiles
+
+FILLER = [
+    "O mercado de cursos online cresceu no último ano e a concorrência aumentou.",
+    "A equipe revisou o funil de vendas e a página de captura.",
+    "O vendedor acompanhou os leads durante a semana de lançamento.",
+    "Os clientes relataram dificuldade para encontrar o botão de compra.",
+    "A campanha foi veiculada em três canais com orçamentos diferentes.",
+]
+
+# Frases com as palavras-chave de cada categoria, com e sem acento e em caixa alta
+CATEGORY_SENTENCES = {
+    'drivers_mentais': [
+        "A oferta usa urgência e escassez, com ancoragem de preço e prova social.",
+        "Gatilho de AUTORIDADE e reciprocidade; a aversao a perda foi testada.",
+    ],
+    'provas_visuais': [
+        "Cada depoimento veio com gráfico de antes e depois e screenshot do resultado.",
+        "O case mostra o percentual de ganho; o testemunho cita um numero exato.",
+    ],
+    'perfis_psicologicos': [
+        "A persona tem perfil de comportamento impulsivo, desejo de status e uma dor clara.",
+        "Motivação, necessidade e aspiração definem a PERSONALIDADE; idade e renda variam.",
+    ],
+    'dados_pesquisa': [
+        "A pesquisa (survey) teve questionário com amostra de 1.200 respondentes.",
+        "Análise dos dados: a tendência e o insight principal vêm da estatistica descritiva.",
+    ],
+}
+
+def build_text(category: str, size_bytes: int, seed: int) -> str:
+    """Texto com ~1 frase da categoria a cada 4 de preenchimento"""
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < size_bytes:
+        sentence = rng.choice(CATEGORY_SENTENCES[category]) if rng.random() < 0.2 else rng.choice(FILLER)
+        parts.append(sentence)
+        size += len(sentence.encode('utf-8')) + 1
+    return " ".join(parts)
+
+def legacy_process(service, content: str) -> str:
+    """Classificação e processamento específicos como eram no AttachmentService"""
+    content_lower = content.lower()
+    scores = {}
+    for category, keywords in service.content_classifiers.items():
+        score = 0
+        for keyword in keywords:
+            score += content_lower.count(keyword.lower())
+        scores[category] = score
+    best_category = max(scores, key=scores.get)
+    content_type = best_category if scores[best_category] > 0 else 'geral'
+
+    if content_type == 'drivers_mentais':
+        for driver in service.content_classifiers['drivers_mentais']:
+            if driver.lower() in content.lower():
+                pass
+    elif content_type == 'perfis_psicologicos':
+        for keyword in ['idade', 'gênero', 'renda', 'comportamento', 'interesse']:
+            if keyword in content.lower():
+                pass
+    return content_type
+
+def matcher_process(service, content: str) -> str:
+    """Caminho atual: uma contagem alimenta a classificação e o processamento"""
+    keyword_counts = service._keyword_matcher.count_keywords(content)
+    content_type = service._classify_content(keyword_counts)
+    if content_type == 'drivers_mentais':
+        service._keyword_matcher.found(keyword_counts, 'drivers_mentais')
+    elif content_type == 'perfis_psicologicos':
+        service._keyword_matcher.found(keyword_counts, 'persona')
+    return content_type
+
+def measure(func: Callable[[], str], iterations: int) -> Dict[str, Any]:
+    samples, result = [], None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'ms': _percentiles(samples), 'category': result}
+
+def run(sizes_mb: List[float], iterations: int, seed: int) -> List[Dict[str, Any]]:
+    from services.attachment_service import attachment_service
+
+    rows = []
+    for size_mb in sizes_mb:
+        for category in CATEGORY_SENTENCES:
+            text = build_text(category, int(size_mb * 1024 * 1024), seed)
+            legacy = measure(lambda: legacy_process(attachment_service, text), iterations)
+            matcher = measure(lambda: matcher_process(attachment_service, text), iterations)
+            rows.append({
+                'size_mb': size_mb,
+                'expected': category,
+                'legacy': legacy,
+                'matcher': matcher,
+                'agree': legacy['category'] == matcher['category']
+            })
+    return rows
+
+def print_report(rows: List[Dict[str, Any]]):
+    print(f"{'MB':>6}  {'categoria esperada':<22}{'antigo ms':>11}{'novo ms':>10}{'novo MB/s':>11}  {'antigo':<20}{'novo':<20}")
+    print("-" * 102)
+    for row in rows:
+        new_ms = row['matcher']['ms']['p50']
+        print(f"{row['size_mb']:>6g}  {row['expected']:<22}{row['legacy']['ms']['p50']:>11.0f}{new_ms:>10.0f}"
+              f"{row['size_mb'] / (new_ms / 1000):>11.1f}  {row['legacy']['category']:<20}{row['matcher']['category']:<20}")
+    agreed = sum(row['agree'] for row in rows)
+    print("-" * 102)
+    print(f"✅ Mesma categoria nos dois classificadores: {agreed}/{len(rows)}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara o classificador antigo de anexos com o KeywordMatcher')
+    parser.add_argument('--sizes-mb', nargs='+', type=float, default=[1, 5, 20], help='Tamanhos dos textos sintéticos (MB)')
+    parser.add_argument('--iterations', type=int, default=3, help='Execuções medidas por texto')
+    parser.add_argument('--seed', type=int, default=7, help='Semente do gerador de texto')
+    parser.add_argument('--json', dest='json_output', help='Arquivo para salvar resultados em JSON')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_FILE_ENABLED', 'false')
+    rows = run(args.sizes_mb, args.iterations, args.seed)
+    print_report(rows)
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'revision': _git_revision(),
+                'timestamp': datetime.now().isoformat(),
+                'params': {'sizes_mb': args.sizes_mb, 'iterations': args.iterations, 'seed': args.seed},
+                'results': rows
+            }, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados salvos em {args.json_output}")
+
+if __name__ == '__main__':
+    main()
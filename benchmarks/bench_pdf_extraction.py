@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Benchmark de Extração de Texto de PDFs Anexados
+Gera um PDF de texto com N páginas (reportlab) ou usa um arquivo existente e
+compara o extrator antigo (PyPDF2 página a página com `content +=`) com o
+PDFTextExtractor sequencial e paralelo, para cada backend.
+
+Uso:
+    python benchmarks/bench_pdf_extraction.py --pages 150 --workers 4
+    python benchmarks/bench_pdf_extraction.py --pdf documento.pdf --backends pypdf --json extracao.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bench_pipeline import _git_revision, _percentiles
+
+def build_pdf(path: str, pages: int, lines_per_page: int = 45):
+    """PDF sintético com texto corrido em todas as páginas"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    pdf = canvas.Canvas(path, pagesize=A4)
+    for page in range(pages):
+        text = pdf.beginText(40, 800)
+        text.setFont('Helvetica', 10)
+        for line in range(lines_per_page):
+            text.textLine(f"Página {page + 1}, linha {line + 1}: pesquisa de mercado com dados, "
+                          f"depoimentos e estatística de conversão {page * line}")
+        pdf.drawText(text)
+        pdf.showPage()
+    pdf.save()
+
+def legacy_extract(file_path: str) -> str:
+    """Extrator anterior do AttachmentService"""
+    import PyPDF2
+    content = ""
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page_num in range(len(pdf_reader.pages)):
+            page = pdf_reader.pages[page_num]
+            content += page.extract_text() + "\n"
+    return content.strip()
+
+def measure(func: Callable[[], str], iterations: int) -> Dict[str, Any]:
+    samples, size = [], 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        size = len(func())
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'ms': _percentiles(samples), 'chars': size}
+
+def run(pdf_path: str, backends: List[str], workers: int, iterations: int) -> Dict[str, Any]:
+    from services.pdf_text_extractor import PDFTextExtractor, count_pages
+
+    pages = count_pages(pdf_path, 'pypdf')
+    results = {'pages': pages, 'variants': {}}
+    results['variants']['legacy PyPDF2 +='] = measure(lambda: legacy_extract(pdf_path), iterations)
+
+    sequential = PDFTextExtractor()
+    sequential.max_pages = sequential.parallel_min_pages = pages + 1
+
+    parallel = PDFTextExtractor()
+    parallel.max_pages = pages + 1
+    parallel.parallel_min_pages = 1
+    parallel.max_workers = workers
+    parallel.chunk_pages = max(1, -(-pages // (workers * 4)))
+
+    start = time.perf_counter()
+    parallel.extract_text(pdf_path, backends[0])
+    results['pool_start_ms'] = (time.perf_counter() - start) * 1000
+
+    for backend in backends:
+        results['variants'][f"{backend} sequencial"] = measure(lambda: sequential.extract_text(pdf_path, backend), iterations)
+        results['variants'][f"{backend} paralelo x{workers}"] = measure(lambda: parallel.extract_text(pdf_path, backend), iterations)
+
+    parallel.reset_after_fork()
+    return results
+
+def print_report(results: Dict[str, Any]):
+    print(f"📄 {results['pages']} páginas | primeira extração paralela (inclui spawn do pool): {results['pool_start_ms']:.0f} ms")
+    print("-" * 72)
+    print(f"{'variante':<32}{'p50 ms':>10}{'p95 ms':>10}{'ms/página':>12}{'caracteres':>12}")
+    for name, data in results['variants'].items():
+        print(f"{name:<32}{data['ms']['p50']:>10.0f}{data['ms']['p95']:>10.0f}"
+              f"{data['ms']['p50'] / results['pages']:>12.2f}{data['chars']:>12}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara os extratores de texto de PDFs anexados')
+    parser.add_argument('--pdf', help='PDF a extrair (senão gera um sintético)')
+    parser.add_argument('--pages', type=int, default=150, help='Páginas do PDF sintético')
+    parser.add_argument('--backends', nargs='+', default=['PyPDF2', 'pypdf', 'pdfplumber'], help='Backends do PDFTextExtractor')
+    parser.add_argument('--workers', type=int, default=max(2, os.cpu_count() or 1), help='Processos do pool paralelo')
+    parser.add_argument('--iterations', type=int, default=3, help='Extrações medidas por variante')
+    parser.add_argument('--json', dest='json_output', help='Arquivo para salvar resultados em JSON')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_FILE_ENABLED', 'false')
+    pdf_path = args.pdf
+    if not pdf_path:
+        pdf_path = os.path.join(tempfile.mkdtemp(prefix='arqv30-pdf-extract-'), 'sintetico.pdf')
+        build_pdf(pdf_path, args.pages)
+
+    results = run(pdf_path, args.backends, args.workers, args.iterations)
+    print_report(results)
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'revision': _git_revision(),
+                'timestamp': datetime.now().isoformat(),
+                'params': {'pdf': args.pdf or f'sintético ({args.pages} páginas)', 'workers': args.workers,
+                           'backends': args.backends, 'iterations': args.iterations},
+                'results': results
+            }, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados salvos em {args.json_output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Benchmark de Renderização de PDF
+Mede o tempo do PDFGenerator por relatório e por página, direto no reportlab
+(sem o cache de PDFs renderizados), para análises sintéticas de tamanhos
+crescentes. Também mede o primeiro relatório do processo, que inclui o import
+do reportlab e a montagem dos estilos.
+
+Uso:
+    python benchmarks/bench_pdf_render.py --iterations 30
+    python benchmarks/bench_pdf_render.py --scales 5 50 200 --json pdf_render.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bench_pipeline import SAMPLE_REQUEST, _git_revision, _percentiles
+
+PAGE_PATTERN = re.compile(rb'/Type\s*/Page\b')
+
+def build_analysis(scale: int) -> Dict[str, Any]:
+    """Análise sintética com `scale` itens em cada lista do relatório"""
+    items = lambda prefix: [f"{prefix} {i}: texto de exemplo com alguma extensão para quebrar linha no parágrafo" for i in range(scale)]
+    return dict(
+        SAMPLE_REQUEST,
+        objetivo_receita='100000',
+        metadata={'generated_at': '2026-01-01T00:00:00', 'model': 'stub', 'processing_time': 12},
+        avatar_ultra_detalhado={
+            'perfil_demografico': {'idade': '35-55', 'genero': 'Feminino', 'renda': 'R$ 5-15 mil',
+                                   'escolaridade': 'Superior', 'localizacao': 'Capitais'},
+            'perfil_psicografico': {'valores': 'Saúde e bem-estar', 'estilo_vida': 'Ativo'},
+            'dores_especificas': items('Dor'),
+            'desejos_profundos': items('Desejo')
+        },
+        escopo={'posicionamento_mercado': 'Premium acessível', 'proposta_valor': 'Resultado visível em 30 dias',
+                'diferenciais_competitivos': items('Diferencial')},
+        analise_concorrencia_detalhada={
+            'concorrentes_diretos': [{'nome': f'Concorrente {i}', 'pontos_fortes': ['Marca', 'Preço'],
+                                      'pontos_fracos': ['Atendimento']} for i in range(max(1, scale // 5))],
+            'gaps_oportunidade': items('Gap')
+        },
+        estrategia_palavras_chave={'palavras_primarias': items('kw')[:10], 'palavras_secundarias': items('kw2'),
+                                   'long_tail': items('lt')},
+        metricas_performance_detalhadas={'kpis_principais': [{'metrica': f'KPI {i}', 'objetivo': 'Crescer 10%'}
+                                                             for i in range(scale)], 'roi_esperado': '3x em 12 meses'},
+        projecoes_cenarios={name: {'receita_mensal': 'R$ 50 mil', 'clientes_mes': '250', 'ticket_medio': 'R$ 197'}
+                            for name in ('conservador', 'realista', 'otimista')},
+        plano_acao_detalhado={fase: {'duracao': '30 dias', 'atividades': items('Atividade')}
+                              for fase in ('fase_1_preparacao', 'fase_2_lancamento', 'fase_3_crescimento')},
+        insights_exclusivos=items('Insight')
+    )
+
+def run_scales(scales: List[int], iterations: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    from services.pdf_report_generator import PDFGenerator
+    generator = PDFGenerator()
+    first = generator.generate_analysis_report(build_analysis(scales[0])).getvalue()
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    results = {'cold_first_report_ms': cold_ms, 'scales': {}}
+    for scale in scales:
+        analysis = build_analysis(scale)
+        pages = len(PAGE_PATTERN.findall(generator.generate_analysis_report(analysis).getvalue()))
+        samples = []
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            generator.generate_analysis_report(analysis)
+            samples.append((time.perf_counter() - t0) * 1000)
+        report_ms = _percentiles(samples)
+        results['scales'][str(scale)] = {
+            'pages': pages,
+            'report_ms': report_ms,
+            'page_ms_p50': report_ms['p50'] / pages if pages else None
+        }
+    return results
+
+def print_report(results: Dict[str, Any]):
+    print(f"🧊 Primeiro relatório do processo (import + estilos): {results['cold_first_report_ms']:.0f} ms")
+    print("-" * 60)
+    print(f"{'itens':>8}{'páginas':>10}{'p50 ms':>12}{'p95 ms':>12}{'ms/página':>14}")
+    for scale, data in results['scales'].items():
+        print(f"{scale:>8}{data['pages']:>10}{data['report_ms']['p50']:>12.1f}"
+              f"{data['report_ms']['p95']:>12.1f}{data['page_ms_p50']:>14.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Mede o tempo de renderização do relatório PDF por página')
+    parser.add_argument('--scales', type=int, nargs='+', default=[5, 50, 200], help='Itens por lista em cada análise sintética')
+    parser.add_argument('--iterations', type=int, default=20, help='Renderizações medidas por tamanho')
+    parser.add_argument('--json', dest='json_output', help='Arquivo para salvar resultados em JSON')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_FILE_ENABLED', 'false')
+    results = run_scales(args.scales, args.iterations)
+    print_report(results)
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'revision': _git_revision(),
+                'timestamp': datetime.now().isoformat(),
+                'params': {'scales': args.scales, 'iterations': args.iterations},
+                'results': results
+            }, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados salvos em {args.json_output}")
+
+if __name__ == '__main__':
+    main()
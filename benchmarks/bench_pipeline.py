@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Benchmark do Pipeline de Análise
+Executa o pipeline completo contra os provedores stub locais com concorrência
+configurável e reporta percentis por fase (search, extraction, llm, drivers,
+predictions, db_save, pdf), throughput e pico de RSS.
+
+Modos:
+    engine  chama enhanced_analysis_engine + PDFGenerator diretamente
+    app     usa o test client do Flask em /api/analyze e /api/generate_pdf
+    http    dispara contra um servidor já em execução (--url), ex.: gunicorn
+            iniciado com STUB_PROVIDERS_ENABLED=true
+
+Uso:
+    python benchmarks/bench_pipeline.py --mode app --requests 20 --concurrency 4 --save
+    python benchmarks/bench_pipeline.py --compare benchmarks/results/<sha_a>.json benchmarks/results/<sha_b>.json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import resource
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+sys.path.insert(0, SRC_DIR)
+
+PHASES = ['search', 'extraction', 'llm', 'drivers', 'predictions', 'db_save', 'pdf']
+
+SAMPLE_REQUEST = {
+    'segmento': 'Produtos naturais',
+    'produto': 'Suplemento de colágeno',
+    'publico': 'Mulheres de 35 a 55 anos',
+    'preco': '197',
+    'concorrentes': 'Marcas de farmácia',
+    'query': 'mercado suplemento colágeno Brasil'
+}
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _git_revision() -> dict:
+    def run(*args):
+        try:
+            return subprocess.check_output(['git', *args], cwd=ROOT_DIR, stderr=subprocess.DEVNULL).decode().strip()
+        except Exception:
+            return ''
+    return {'sha': run('rev-parse', '--short', 'HEAD') or 'unknown', 'dirty': bool(run('status', '--porcelain', '--untracked-files=no'))}
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss é KB no Linux e bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+def _percentiles(samples: list) -> dict:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pct(p):
+        index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return round(ordered[index], 2)
+
+    return {
+        'count': len(ordered),
+        'mean': round(statistics.mean(ordered), 2),
+        'p50': pct(50),
+        'p90': pct(90),
+        'p95': pct(95),
+        'p99': pct(99),
+        'max': round(ordered[-1], 2)
+    }
+
+def _parse_server_timing(header: str) -> dict:
+    phases = {}
+    for entry in filter(None, (e.strip() for e in (header or '').split(','))):
+        name, _, dur = entry.partition(';dur=')
+        if dur and name != 'total':
+            phases[name] = float(dur)
+    return phases
+
+class PipelineRunner:
+    """Executa uma iteração do pipeline e devolve tempos por fase em ms"""
+
+    def __init__(self, mode: str, url: str = None, with_pdf: bool = True):
+        self.mode = mode
+        self.with_pdf = with_pdf
+
+        if mode == 'engine':
+            from services.enhanced_analysis_engine import enhanced_analysis_engine
+            from services.phase_timing import phase_recording, record_phase
+            from routes.pdf_generator import pdf_generator
+            self.engine = enhanced_analysis_engine
+            self.phase_recording = phase_recording
+            self.record_phase = record_phase
+            self.pdf_generator = pdf_generator
+        elif mode == 'app':
+            from run import create_app
+            self.client = create_app().test_client()
+        else:
+            import requests
+            self.session = requests.Session()
+            self.url = url.rstrip('/')
+
+    def run_once(self, payload: dict) -> dict:
+        start = time.perf_counter()
+        phases = getattr(self, f"_run_{self.mode}")(payload)
+        return {'total_ms': (time.perf_counter() - start) * 1000, 'phases': phases}
+
+    def _run_engine(self, payload: dict) -> dict:
+        with self.phase_recording() as recorder:
+            analysis = self.engine.generate_comprehensive_analysis(dict(payload))
+            if self.with_pdf:
+                with self.record_phase('pdf'):
+                    self.pdf_generator.generate_analysis_report(analysis)
+        return {phase: data['ms'] for phase, data in recorder.as_dict()['phases'].items()}
+
+    def _run_app(self, payload: dict) -> dict:
+        response = self.client.post('/api/analyze', json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/analyze retornou {response.status_code}")
+        analysis = response.get_json()
+        phases = {
+            phase: data['ms']
+            for phase, data in analysis.get('metadata', {}).get('phase_timings', {}).get('phases', {}).items()
+        }
+        if self.with_pdf:
+            pdf_response = self.client.post('/api/generate_pdf', json=analysis)
+            if pdf_response.status_code != 200:
+                raise RuntimeError(f"/api/generate_pdf retornou {pdf_response.status_code}")
+            phases.update(_parse_server_timing(pdf_response.headers.get('Server-Timing')))
+            pdf_response.close()
+        return phases
+
+    def _run_http(self, payload: dict) -> dict:
+        response = self.session.post(f"{self.url}/api/analyze", json=payload, timeout=600)
+        response.raise_for_status()
+        analysis = response.json()
+        phases = _parse_server_timing(response.headers.get('Server-Timing'))
+        if self.with_pdf:
+            pdf_response = self.session.post(f"{self.url}/api/generate_pdf", json=analysis, timeout=600)
+            pdf_response.raise_for_status()
+            phases.update(_parse_server_timing(pdf_response.headers.get('Server-Timing')))
+        return phases
+
+def run_benchmark(args) -> dict:
+    runner = PipelineRunner(args.mode, url=args.url, with_pdf=not args.no_pdf)
+
+    for _ in range(args.warmup):
+        runner.run_once(SAMPLE_REQUEST)
+
+    samples, errors = [], []
+    lock = threading.Lock()
+
+    def task(i):
+        payload = dict(SAMPLE_REQUEST, query=f"{SAMPLE_REQUEST['query']} {i}" if args.unique_queries else SAMPLE_REQUEST['query'])
+        try:
+            sample = runner.run_once(payload)
+            with lock:
+                samples.append(sample)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(task, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    phases = {
+        phase: _percentiles([s['phases'][phase] for s in samples if phase in s['phases']])
+        for phase in PHASES
+    }
+
+    return {
+        'revision': _git_revision(),
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'params': {
+            'mode': args.mode,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'warmup': args.warmup,
+            'pdf': not args.no_pdf,
+            'latency_scale': args.latency_scale
+        },
+        'total_ms': _percentiles([s['total_ms'] for s in samples]),
+        'phases_ms': {phase: stats for phase, stats in phases.items() if stats},
+        'throughput_rps': round(len(samples) / elapsed, 3) if elapsed else 0.0,
+        'elapsed_seconds': round(elapsed, 3),
+        'errors': len(errors),
+        'error_samples': errors[:5],
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+def print_report(results: dict):
+    params = results['params']
+    print(f"🚀 Pipeline ({params['mode']}) - {params['requests']} requisições, concorrência {params['concurrency']}")
+    print("-" * 78)
+    print(f"{'fase':<14}{'n':>6}{'mean':>10}{'p50':>10}{'p90':>10}{'p95':>10}{'p99':>10}   (ms)")
+    rows = list(results['phases_ms'].items()) + [('TOTAL', results['total_ms'])]
+    for name, stats in rows:
+        if stats:
+            print(f"{name:<14}{stats['count']:>6}{stats['mean']:>10.1f}{stats['p50']:>10.1f}"
+                  f"{stats['p90']:>10.1f}{stats['p95']:>10.1f}{stats['p99']:>10.1f}")
+    print("-" * 78)
+    print(f"Throughput: {results['throughput_rps']} req/s | Erros: {results['errors']} | Pico RSS: {results['peak_rss_mb']} MB")
+
+def compare(baseline_path: str, candidate_path: str):
+    """Compara dois arquivos de resultado (p50/p95 por fase, throughput e RSS)"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(candidate_path, 'r', encoding='utf-8') as f:
+        candidate = json.load(f)
+
+    def delta(old, new):
+        if not old:
+            return 'n/a'
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    print(f"📊 {baseline['revision']['sha']} → {candidate['revision']['sha']}")
+    print("-" * 78)
+    names = [p for p in PHASES if p in baseline['phases_ms'] or p in candidate['phases_ms']] + ['TOTAL']
+    for name in names:
+        old = baseline['total_ms'] if name == 'TOTAL' else baseline['phases_ms'].get(name, {})
+        new = candidate['total_ms'] if name == 'TOTAL' else candidate['phases_ms'].get(name, {})
+        for key in ('p50', 'p95'):
+            if key in old or key in new:
+                print(f"{name:<14}{key:<5}{old.get(key, 0):>12.1f} → {new.get(key, 0):>12.1f}  {delta(old.get(key), new.get(key, 0))}")
+    print(f"{'throughput':<19}{baseline['throughput_rps']:>12} → {candidate['throughput_rps']:>12}  "
+          f"{delta(baseline['throughput_rps'], candidate['throughput_rps'])}")
+    print(f"{'peak_rss_mb':<19}{baseline['peak_rss_mb']:>12} → {candidate['peak_rss_mb']:>12}  "
+          f"{delta(baseline['peak_rss_mb'], candidate['peak_rss_mb'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ponta a ponta do pipeline de análise')
+    parser.add_argument('--mode', choices=['engine', 'app', 'http'], default='app', help='Como o pipeline é acionado')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='URL do servidor (modo http)')
+    parser.add_argument('--requests', type=int, default=10, help='Total de análises')
+    parser.add_argument('--concurrency', type=int, default=1, help='Análises simultâneas')
+    parser.add_argument('--warmup', type=int, default=1, help='Análises descartadas antes da medição')
+    parser.add_argument('--latency-scale', type=float, default=0.1, help='Multiplicador das latências dos stubs')
+    parser.add_argument('--seed', type=int, default=42, help='Semente dos stubs')
+    parser.add_argument('--no-pdf', action='store_true', help='Não gera PDF após a análise')
+    parser.add_argument('--with-cache', action='store_true', help='Mantém caches de busca/conteúdo habilitados')
+    parser.add_argument('--unique-queries', action='store_true', help='Query diferente por requisição')
+    parser.add_argument('--json', dest='json_output', help='Arquivo para salvar resultados em JSON')
+    parser.add_argument('--save', action='store_true', help='Salva em benchmarks/results/<git sha>.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NOVO'), help='Compara dois arquivos de resultado')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.json_output:
+        args.json_output = os.path.abspath(args.json_output)
+
+    stub_server = None
+    if args.mode != 'http':
+        # Precisa ser configurado antes de importar os serviços
+        port = _free_port()
+        os.environ['STUB_PROVIDERS_ENABLED'] = 'true'
+        os.environ['STUB_PROVIDERS_URL'] = f"http://127.0.0.1:{port}"
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        os.environ.setdefault('LOG_FILE_ENABLED', 'false')
+        os.environ.setdefault('AI_WARMUP_ENABLED', 'false')
+        os.environ.setdefault('QUOTA_SAFETY_MARGIN', '1000000')
+        if not args.with_cache:
+            os.environ['SEARCH_CACHE_ENABLED'] = 'false'
+            os.environ['CACHE_ENABLED'] = 'false'
+
+        # Caches e ledger SQLite isolados do diretório de trabalho
+        os.chdir(tempfile.mkdtemp(prefix='arqv30-bench-'))
+
+        import logging
+        logging.basicConfig(level=getattr(logging, os.environ['LOG_LEVEL']))
+
+        from services.stub_providers import StubProviderServer
+        stub_server = StubProviderServer(port=port, seed=args.seed, latency_scale=args.latency_scale).start()
+
+    results = run_benchmark(args)
+    print_report(results)
+
+    if stub_server:
+        stub_server.stop()
+
+    output = args.json_output
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{results['revision']['sha']}.json")
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados salvos em {output}")
+
+if __name__ == '__main__':
+    main()
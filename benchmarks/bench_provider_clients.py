@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Benchmark de Clientes de Provedores
+Mede o overhead por chamada de recriar clientes OpenAI / usar requests.post
+sem sessão, comparado com clientes de longa duração com pool de conexões.
+
+Uso:
+    python benchmarks/bench_provider_clients.py --calls 200
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import httpx
+import openai
+import requests
+from utils.http_utils import create_pooled_session
+
+CHAT_RESPONSE = json.dumps({
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-3.5-turbo",
+    "choices": [{
+        "index": 0,
+        "message": {"role": "assistant", "content": "OK"},
+        "finish_reason": "stop"
+    }],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+}).encode('utf-8')
+
+HF_RESPONSE = json.dumps([{"generated_text": "OK"}]).encode('utf-8')
+
+class _Handler(BaseHTTPRequestHandler):
+    """Servidor local mínimo que imita OpenAI e HuggingFace"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        body = CHAT_RESPONSE if self.path.endswith('/chat/completions') else HF_RESPONSE
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def _timed(func, calls: int) -> list:
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def _summary(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        'mean_ms': round(statistics.mean(ordered), 3),
+        'p50_ms': round(ordered[len(ordered) // 2], 3),
+        'p95_ms': round(ordered[int(len(ordered) * 0.95) - 1], 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de clientes de provedores de IA')
+    parser.add_argument('--calls', type=int, default=200, help='Chamadas por cenário')
+    parser.add_argument('--json', dest='json_output', help='Arquivo para salvar resultados em JSON')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    messages = [{"role": "user", "content": "ping"}]
+    hf_url = f"{base_url}/models/google/flan-t5-base"
+    hf_payload = {"inputs": "ping", "parameters": {"max_new_tokens": 8}}
+
+    def openai_per_call():
+        client = openai.OpenAI(api_key='bench', base_url=f"{base_url}/v1")
+        client.chat.completions.create(model='gpt-3.5-turbo', messages=messages)
+
+    shared_client = openai.OpenAI(
+        api_key='bench',
+        base_url=f"{base_url}/v1",
+        http_client=httpx.Client(limits=httpx.Limits(max_connections=10, max_keepalive_connections=10)),
+        max_retries=0
+    )
+
+    def openai_reused():
+        shared_client.chat.completions.create(model='gpt-3.5-turbo', messages=messages)
+
+    def hf_without_session():
+        requests.post(hf_url, json=hf_payload, headers={"Authorization": "Bearer bench"}, timeout=10)
+
+    session = create_pooled_session(headers={"Authorization": "Bearer bench"})
+
+    def hf_pooled_session():
+        session.post(hf_url, json=hf_payload, timeout=10)
+
+    scenarios = [
+        ('openai_client_per_call', openai_per_call),
+        ('openai_client_reused', openai_reused),
+        ('huggingface_requests_post', hf_without_session),
+        ('huggingface_pooled_session', hf_pooled_session)
+    ]
+
+    results = {}
+    print(f"🚀 Benchmark de clientes ({args.calls} chamadas por cenário)")
+    print("-" * 70)
+    for name, func in scenarios:
+        func()  # Descarta primeira chamada (imports/lazy init)
+        results[name] = _summary(_timed(func, args.calls))
+        print(f"{name:.<40} mean={results[name]['mean_ms']:>8.3f}ms  p95={results[name]['p95_ms']:>8.3f}ms")
+
+    print("-" * 70)
+    openai_saved = results['openai_client_per_call']['mean_ms'] - results['openai_client_reused']['mean_ms']
+    hf_saved = results['huggingface_requests_post']['mean_ms'] - results['huggingface_pooled_session']['mean_ms']
+    print(f"✅ Overhead removido por chamada: OpenAI {openai_saved:.3f}ms, HuggingFace {hf_saved:.3f}ms")
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Benchmark de Inicialização
+Mede, em processos Python novos, o tempo de import de run.py, o tempo do
+create_app(), o RSS resultante e quais bibliotecas pesadas já foram
+carregadas. Com --first-requests mede também a primeira chamada de cada
+endpoint, onde os serviços lazy pagam sua inicialização.
+
+Uso:
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --runs 3 --first-requests --json startup.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bench_pipeline import SRC_DIR, SAMPLE_REQUEST, _free_port, _git_revision
+
+HEAVY_MODULES = [
+    'pandas', 'numpy', 'reportlab', 'PyPDF2', 'docx', 'openpyxl',
+    'google.generativeai', 'openai', 'httpx', 'supabase'
+]
+
+# Executado em um processo novo para que nenhum import anterior mascare o resultado
+PROBE_SCRIPT = r'''
+import os, sys, json, time, resource
+
+def rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+result = {}
+start = time.perf_counter()
+import run
+result['import_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+start = time.perf_counter()
+app = run.create_app()
+result['create_app_ms'] = round((time.perf_counter() - start) * 1000, 1)
+result['rss_mb'] = rss_mb()
+result['heavy_modules'] = [name for name in json.loads(os.environ['BENCH_HEAVY_MODULES']) if name in sys.modules]
+
+if os.environ.get('BENCH_FIRST_REQUESTS') == 'true':
+    client = app.test_client()
+    first = {}
+    for label, method, path, body in [
+        ('health', 'get', '/api/health', None),
+        ('analyze', 'post', '/api/analyze', json.loads(os.environ['BENCH_SAMPLE_REQUEST'])),
+    ]:
+        start = time.perf_counter()
+        response = getattr(client, method)(path, json=body)
+        first[label] = {'ms': round((time.perf_counter() - start) * 1000, 1), 'status': response.status_code}
+        if label == 'analyze' and response.status_code == 200:
+            analysis = response.get_json()
+            start = time.perf_counter()
+            pdf = client.post('/api/generate_pdf', json=analysis)
+            first['pdf'] = {'ms': round((time.perf_counter() - start) * 1000, 1), 'status': pdf.status_code}
+            pdf.close()
+    result['first_requests'] = first
+    result['rss_after_requests_mb'] = rss_mb()
+
+print('BENCH_RESULT ' + json.dumps(result))
+'''
+
+def run_probe(args, stub_url: str = None) -> dict:
+    env = dict(
+        os.environ,
+        PYTHONPATH=SRC_DIR,
+        LOG_LEVEL='WARNING',
+        LOG_FILE_ENABLED='false',
+        AI_WARMUP_ENABLED='false',
+        QUOTA_SAFETY_MARGIN='1000000',
+        BENCH_HEAVY_MODULES=json.dumps(HEAVY_MODULES),
+        BENCH_SAMPLE_REQUEST=json.dumps(SAMPLE_REQUEST)
+    )
+    if stub_url:
+        env.update(STUB_PROVIDERS_ENABLED='true', STUB_PROVIDERS_URL=stub_url, BENCH_FIRST_REQUESTS='true')
+
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE_SCRIPT],
+        cwd=tempfile.mkdtemp(prefix='arqv30-startup-'),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+
+    for line in output.splitlines():
+        if line.startswith('BENCH_RESULT '):
+            return json.loads(line[len('BENCH_RESULT '):])
+    raise RuntimeError('Processo de medição não retornou resultado')
+
+def summarize(runs: list) -> dict:
+    def median(values):
+        return round(statistics.median(values), 1) if values else None
+
+    summary = {
+        'import_ms': median([r['import_ms'] for r in runs]),
+        'create_app_ms': median([r['create_app_ms'] for r in runs]),
+        'rss_mb': median([r['rss_mb'] for r in runs]),
+        'heavy_modules': runs[-1]['heavy_modules']
+    }
+    if 'first_requests' in runs[-1]:
+        summary['first_requests_ms'] = {
+            label: median([r['first_requests'][label]['ms'] for r in runs if label in r['first_requests']])
+            for label in runs[-1]['first_requests']
+        }
+        summary['rss_after_requests_mb'] = median([r['rss_after_requests_mb'] for r in runs])
+    return summary
+
+def print_report(summary: dict, runs: int):
+    print(f"🚀 Inicialização (mediana de {runs} processos)")
+    print("-" * 60)
+    print(f"{'import run.py':<28}{summary['import_ms']:>12.1f} ms")
+    print(f"{'create_app()':<28}{summary['create_app_ms']:>12.1f} ms")
+    print(f"{'RSS após startup':<28}{summary['rss_mb']:>12.1f} MB")
+    for label, ms in summary.get('first_requests_ms', {}).items():
+        print(f"{'1ª requisição ' + label:<28}{ms:>12.1f} ms")
+    if 'rss_after_requests_mb' in summary:
+        print(f"{'RSS após requisições':<28}{summary['rss_after_requests_mb']:>12.1f} MB")
+    print("-" * 60)
+    print(f"Bibliotecas pesadas carregadas no startup: {', '.join(summary['heavy_modules']) or 'nenhuma'}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Mede tempo de startup e memória de um worker novo')
+    parser.add_argument('--runs', type=int, default=5, help='Processos medidos')
+    parser.add_argument('--first-requests', action='store_true', help='Mede também a primeira análise e o primeiro PDF (usa stubs)')
+    parser.add_argument('--latency-scale', type=float, default=0.01, help='Multiplicador das latências dos stubs')
+    parser.add_argument('--json', dest='json_output', help='Arquivo para salvar resultados em JSON')
+    args = parser.parse_args()
+
+    stub_server = None
+    if args.first_requests:
+        from services.stub_providers import StubProviderServer
+        stub_server = StubProviderServer(port=_free_port(), latency_scale=args.latency_scale).start()
+
+    try:
+        runs = [run_probe(args, stub_server.url if stub_server else None) for _ in range(args.runs)]
+    finally:
+        if stub_server:
+            stub_server.stop()
+
+    summary = summarize(runs)
+    print_report(summary, len(runs))
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'revision': _git_revision(),
+                'timestamp': datetime.now().isoformat(),
+                'summary': summary,
+                'runs': runs
+            }, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados salvos em {args.json_output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Benchmark dos Perfis de Worker do Gunicorn
+Sobe o gunicorn com cada perfil (sync, gthread, gevent) apontado para os
+provedores stub, dispara análises longas em paralelo e, ao mesmo tempo,
+mede a latência de um endpoint barato para mostrar se ele fica enfileirado
+atrás das análises.
+
+Uso:
+    python benchmarks/bench_worker_profiles.py --profiles sync gthread --analyses 8 --concurrency 4
+    python benchmarks/bench_worker_profiles.py --workers 2 --latency-scale 0.5 --json perfis.json
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import importlib.util
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bench_pipeline import ROOT_DIR, SRC_DIR, SAMPLE_REQUEST, _free_port, _git_revision, _percentiles
+
+def _wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn encerrou com código {process.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"gunicorn não respondeu em {timeout}s")
+
+def _start_gunicorn(profile: str, args, stub_url: str, workdir: str) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(
+        os.environ,
+        GUNICORN_PROFILE=profile,
+        GUNICORN_WORKERS=str(args.workers),
+        PORT=str(port),
+        PYTHONPATH=SRC_DIR,
+        STUB_PROVIDERS_ENABLED='true',
+        STUB_PROVIDERS_URL=stub_url,
+        LOG_LEVEL='WARNING',
+        LOG_FILE_ENABLED='false',
+        AI_WARMUP_ENABLED='false',
+        QUOTA_SAFETY_MARGIN='1000000',
+        SEARCH_CACHE_ENABLED='false',
+        CACHE_ENABLED='false',
+        METRICS_MULTIPROC_DIR=os.path.join(workdir, 'metrics')
+    )
+    if args.threads:
+        env['GUNICORN_THREADS'] = str(args.threads)
+    if args.timeout:
+        env['GUNICORN_TIMEOUT'] = str(args.timeout)
+
+    os.makedirs(os.path.join(workdir, 'logs'), exist_ok=True)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', os.path.join(ROOT_DIR, 'gunicorn.conf.py'), 'run:create_app()'],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=None if args.verbose else subprocess.DEVNULL
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+def _run_load(base_url: str, args) -> dict:
+    analyses, analysis_errors = [], []
+    probes, probe_errors = [], []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def analyze(i):
+        payload = dict(SAMPLE_REQUEST, query=f"{SAMPLE_REQUEST['query']} {i}")
+        start = time.perf_counter()
+        try:
+            response = requests.post(f"{base_url}/api/analyze", json=payload, timeout=args.request_timeout)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if response.status_code == 200:
+                    analyses.append(elapsed)
+                else:
+                    analysis_errors.append(f"HTTP {response.status_code}")
+        except requests.RequestException as e:
+            with lock:
+                analysis_errors.append(type(e).__name__)
+
+    def probe():
+        # Endpoint barato consultado enquanto as análises estão em andamento
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                response = requests.get(f"{base_url}{args.probe_path}", timeout=args.request_timeout)
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    if response.status_code < 500:
+                        probes.append(elapsed)
+                    else:
+                        probe_errors.append(f"HTTP {response.status_code}")
+            except requests.RequestException as e:
+                with lock:
+                    probe_errors.append(type(e).__name__)
+            done.wait(args.probe_interval)
+
+    probe_thread = threading.Thread(target=probe, daemon=True)
+    started = time.perf_counter()
+    probe_thread.start()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(analyze, range(args.analyses)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    probe_thread.join()
+
+    return {
+        'analysis_ms': _percentiles(analyses),
+        'analysis_errors': len(analysis_errors),
+        'analysis_error_samples': analysis_errors[:5],
+        'throughput_rps': round(len(analyses) / elapsed, 3) if elapsed else 0.0,
+        'probe_ms': _percentiles(probes),
+        'probe_errors': len(probe_errors),
+        'elapsed_seconds': round(elapsed, 3)
+    }
+
+def run_profile(profile: str, args, stub_url: str) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f'arqv30-{profile}-')
+    process, base_url = _start_gunicorn(profile, args, stub_url, workdir)
+    try:
+        _wait_until_ready(f"{base_url}{args.probe_path}", process)
+        results = _run_load(base_url, args)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    results['profile'] = profile
+    # Sem gevent instalado o gunicorn.conf.py cai para gthread
+    if profile == 'gevent' and importlib.util.find_spec('gevent') is None:
+        results['profile'] = 'gevent*'
+        results['fallback'] = 'gthread'
+    return results
+
+def print_report(results: list):
+    print("-" * 96)
+    print(f"{'perfil':<10}{'análise p50':>13}{'p95':>10}{'erros':>7}{'req/s':>8}"
+          f"{'probe p50':>12}{'p95':>10}{'p99':>10}{'erros':>7}   (ms)")
+    for item in results:
+        analysis, probe = item['analysis_ms'], item['probe_ms']
+        print(f"{item['profile']:<10}{analysis.get('p50', 0):>13.0f}{analysis.get('p95', 0):>10.0f}"
+              f"{item['analysis_errors']:>7}{item['throughput_rps']:>8}"
+              f"{probe.get('p50', 0):>12.1f}{probe.get('p95', 0):>10.1f}{probe.get('p99', 0):>10.1f}"
+              f"{item['probe_errors']:>7}")
+    print("-" * 96)
+    if any(item.get('fallback') for item in results):
+        print("* gevent não instalado - medido com o fallback gthread")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara os perfis de worker do gunicorn sob carga de análises longas')
+    parser.add_argument('--profiles', nargs='+', default=['sync', 'gthread', 'gevent'], help='Perfis a comparar')
+    parser.add_argument('--workers', type=int, default=2, help='Processos worker por perfil')
+    parser.add_argument('--threads', type=int, help='Sobrescreve GUNICORN_THREADS')
+    parser.add_argument('--timeout', type=int, help='Sobrescreve GUNICORN_TIMEOUT')
+    parser.add_argument('--analyses', type=int, default=8, help='Total de análises')
+    parser.add_argument('--concurrency', type=int, default=4, help='Análises simultâneas')
+    parser.add_argument('--probe-path', default='/api/app_status', help='Endpoint barato medido durante a carga')
+    parser.add_argument('--probe-interval', type=float, default=0.2, help='Intervalo entre probes (s)')
+    parser.add_argument('--request-timeout', type=float, default=600, help='Timeout do cliente (s)')
+    parser.add_argument('--latency-scale', type=float, default=0.5, help='Multiplicador das latências dos stubs')
+    parser.add_argument('--seed', type=int, default=42, help='Semente dos stubs')
+    parser.add_argument('--json', dest='json_output', help='Arquivo para salvar resultados em JSON')
+    parser.add_argument('--verbose', action='store_true', help='Mostra o log de erro do gunicorn')
+    args = parser.parse_args()
+
+    from services.stub_providers import StubProviderServer
+    stub_port = _free_port()
+    stub_server = StubProviderServer(port=stub_port, seed=args.seed, latency_scale=args.latency_scale).start()
+
+    results = []
+    try:
+        for profile in args.profiles:
+            print(f"🚀 Perfil {profile}: {args.analyses} análises, concorrência {args.concurrency}, {args.workers} workers")
+            results.append(run_profile(profile, args, stub_server.url))
+    finally:
+        stub_server.stop()
+
+    print_report(results)
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'revision': _git_revision(),
+                'timestamp': datetime.now().isoformat(),
+                'params': {key: value for key, value in vars(args).items() if key != 'json_output'},
+                'results': results
+            }, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados salvos em {args.json_output}")
+
+if __name__ == '__main__':
+    main()
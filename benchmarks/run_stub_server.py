@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Servidor Stub de Provedores
+Sobe o servidor local que imita Gemini, OpenAI, HuggingFace, Google CSE,
+Serper, Bing, DuckDuckGo, Yahoo, Jina Reader e as páginas do corpus.
+
+Uso:
+    python benchmarks/run_stub_server.py --port 8765 --latency-scale 0.1
+
+Em outro terminal, aponte a aplicação para o stub:
+    STUB_PROVIDERS_ENABLED=true STUB_PROVIDERS_URL=http://127.0.0.1:8765 python src/run.py
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from services.stub_providers import StubProviderServer, DEFAULT_LATENCIES
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor stub de provedores para benchmarks offline')
+    parser.add_argument('--host', default='127.0.0.1', help='Endereço de escuta')
+    parser.add_argument('--port', type=int, default=8765, help='Porta de escuta')
+    parser.add_argument('--seed', type=int, default=42, help='Semente do corpus e das latências')
+    parser.add_argument('--corpus-dir', help='Diretório com pages/*.html e search/<buscador>.html gravados')
+    parser.add_argument('--latency-scale', type=float, help='Multiplicador aplicado a todas as latências')
+    parser.add_argument(
+        '--latency', action='append', default=[], metavar='ROTA=SPEC',
+        help=f"Sobrescreve latência de uma rota, ex.: gemini=fixed:500 (rotas: {', '.join(DEFAULT_LATENCIES)})"
+    )
+    parser.add_argument('--llm-response-file', help='Arquivo com a resposta fixa dos provedores de IA')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    latencies = dict(item.split('=', 1) for item in args.latency)
+
+    server = StubProviderServer(
+        host=args.host,
+        port=args.port,
+        seed=args.seed,
+        corpus_dir=args.corpus_dir,
+        latencies=latencies,
+        latency_scale=args.latency_scale,
+        llm_response_file=args.llm_response_file
+    ).start()
+
+    print(f"🧪 Servidor stub ativo em {server.url} (Ctrl+C para encerrar)")
+    print(f"   export STUB_PROVIDERS_ENABLED=true STUB_PROVIDERS_URL={server.url}")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n📊 Requisições atendidas: {server.request_counts}")
+        server.stop()
+
+if __name__ == '__main__':
+    main()
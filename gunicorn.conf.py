@@ -13,10 +13,51 @@ bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
 backlog = 2048
 
 # Worker processes
-workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
-worker_class = "sync"
-worker_connections = 1000
-timeout = 60
+# GUNICORN_PROFILE escolhe o modelo de worker:
+#   sync    - um request por processo; timeout precisa cobrir a análise inteira
+#   gthread - threads por processo; o heartbeat independe do request em andamento
+#   gevent  - greenlets cooperativos (requer gevent instalado, senão cai para gthread)
+WORKER_PROFILES = {
+    'sync': {
+        'worker_class': 'sync',
+        'workers': multiprocessing.cpu_count() * 2 + 1,
+        'threads': 1,
+        'timeout': 600
+    },
+    'gthread': {
+        'worker_class': 'gthread',
+        'workers': multiprocessing.cpu_count() + 1,
+        'threads': 16,
+        'timeout': 120
+    },
+    'gevent': {
+        'worker_class': 'gevent',
+        'workers': multiprocessing.cpu_count() + 1,
+        'threads': 1,
+        'timeout': 120
+    }
+}
+
+worker_profile = os.getenv('GUNICORN_PROFILE', 'sync').lower()
+if worker_profile not in WORKER_PROFILES:
+    print(f"⚠️ GUNICORN_PROFILE={worker_profile} desconhecido - usando sync")
+    worker_profile = 'sync'
+
+if worker_profile == 'gevent':
+    try:
+        # Precisa acontecer antes do preload da aplicação importar requests/ssl/threading
+        from gevent import monkey
+        monkey.patch_all()
+    except ImportError:
+        print("⚠️ gevent não instalado - usando perfil gthread")
+        worker_profile = 'gthread'
+
+_profile = WORKER_PROFILES[worker_profile]
+workers = int(os.getenv('GUNICORN_WORKERS', _profile['workers']))
+worker_class = _profile['worker_class']
+threads = int(os.getenv('GUNICORN_THREADS', _profile['threads']))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', _profile['timeout']))
 keepalive = 2
 
 # Restart workers after this many requests, to help prevent memory leaks
@@ -26,6 +67,11 @@ max_requests_jitter = 100
 # Preload app for better performance
 preload_app = True
 
+# Identifica o master para o protocolo pós-fork (services/fork_safety.py):
+# tarefas que abrem conexões são adiadas para os workers em vez de rodar no preload
+if preload_app:
+    os.environ['GUNICORN_PRELOAD_PID'] = str(os.getpid())
+
 # Logging
 accesslog = "logs/gunicorn_access.log" if os.getenv('LOG_FILE_ENABLED', 'true').lower() == 'true' else "-"
 errorlog = "logs/gunicorn_error.log" if os.getenv('LOG_FILE_ENABLED', 'true').lower() == 'true' else "-"
@@ -54,9 +100,25 @@ limit_request_field_size = 8190
 # Performance tuning
 worker_tmp_dir = '/dev/shm' if os.path.exists('/dev/shm') else None
 
+def on_starting(server):
+    """Called just before the master process is initialized"""
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+    from services.metrics import registry
+    
+    # Descarta snapshots de métricas de execuções anteriores
+    registry.reset_multiproc_dir()
+
 def when_ready(server):
     """Called just after the server is started"""
     server.log.info("🚀 ARQV30 Enhanced v2.0 server is ready. Listening on: %s", server.address)
+    server.log.info("⚙️ Worker profile: %s (%s x %s threads, timeout %ss)", worker_profile, workers, threads, timeout)
+    
+    if preload_app:
+        from services.fork_safety import prepare_for_fork
+        
+        # Tabelas estáticas carregadas uma vez no master e compartilhadas via copy-on-write
+        prepare_for_fork()
 
 def worker_int(worker):
     """Called just after a worker exited on SIGINT or SIGQUIT"""
@@ -68,8 +130,36 @@ def pre_fork(server, worker):
 
 def post_fork(server, worker):
     """Called just after a worker has been forked"""
+    from services.fork_safety import start_worker
+    
+    # Recria clientes, locks e filas herdados do master antes do primeiro request
+    start_worker()
     server.log.info("✅ Worker %s forked successfully", worker.pid)
 
+def post_worker_init(worker):
+    """Called just after a worker has initialized the application"""
+    from services.profiler import profiler
+    
+    # Registrado após os sinais do worker; o master usa SIGUSR2 para upgrade e não deve recebê-lo
+    profiler.install_signal_handler()
+
+def worker_exit(server, worker):
+    """Called just after a worker has been exited"""
+    from services.persistence_queue import persistence_queue
+    from services.metrics import registry
+    
+    # Análises ainda na fila write-behind são gravadas antes do processo sair
+    persistence_queue.flush()
+    # Último snapshot, consolidado pelo master no child_exit
+    registry.flush()
+
+def child_exit(server, worker):
+    """Called just after a worker has been exited, in the master process"""
+    from services.metrics import registry
+    
+    # Totais do worker vão para o snapshot consolidado e o arquivo dele é removido
+    registry.retire_worker(worker.pid)
+
 def worker_abort(worker):
     """Called when a worker received the SIGABRT signal"""
     worker.log.info("💥 Worker %s aborted", worker.pid)
@@ -89,14 +89,13 @@ def run_with_gunicorn():
     """Executa aplicação com Gunicorn"""
     logger.info("🚀 Iniciando ARQV30 Enhanced v2.0 com Gunicorn...")
     
-    # Configurações do Gunicorn
-    workers = os.getenv('GUNICORN_WORKERS', '4')
+    # Configurações do Gunicorn (workers, threads e timeout vêm do perfil GUNICORN_PROFILE)
     port = os.getenv('PORT', '5000')
+    logger.info(f"⚙️ Perfil de workers: {os.getenv('GUNICORN_PROFILE', 'sync')}")
     
     cmd = [
         'gunicorn',
         '--config', 'gunicorn.conf.py',
-        '--workers', workers,
         '--bind', f'0.0.0.0:{port}',
         '--chdir', 'src',
         'run:create_app()'
@@ -6,19 +6,39 @@ Integração com Supabase PostgreSQL
 """
 
 import os
+import time
+import base64
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-from supabase.client import create_client, Client
-import json
+from typing import Dict, List, Optional, Any, Tuple
+import threading
+from services.metrics import timed_db_operation
+from services.tracing import traced
+from utils import json_codec
+from services.fork_safety import register_after_fork
 
 logger = logging.getLogger(__name__)
 
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Cursor opaco com a chave (created_at, id) da última linha da página"""
+    raw = f"{row['created_at']}|{row['id']}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Valida e decodifica o cursor; levanta ValueError se ele foi adulterado"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        created_at, last_id = raw.rsplit('|', 1)
+        datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        return created_at, int(last_id)
+    except Exception:
+        raise ValueError(f"Cursor inválido: {cursor}")
+
 class DatabaseManager:
     """Gerenciador de conexão e operações com Supabase"""
     
     def __init__(self):
-        """Inicializa conexão com Supabase"""
+        """Lê credenciais do Supabase; os clientes são criados no primeiro uso"""
         self.supabase_url = os.getenv('SUPABASE_URL')
         self.supabase_key = os.getenv('SUPABASE_ANON_KEY')
         self.service_role_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
@@ -26,41 +46,64 @@ class DatabaseManager:
         # Verifica se as credenciais estão configuradas
         self.available = bool(self.supabase_url and self.supabase_key)
         
-        if not self.available:
-            logger.warning("⚠️ Credenciais do Supabase não configuradas - Banco de dados indisponível")
-            self.client = None
-            self.admin_client = None
-            return
+        self._client = None
+        self._admin_client = None
+        self._client_lock = threading.Lock()
         
-        # Cliente principal (anon key)
-        try:
-            self.client: Client = create_client(self.supabase_url, self.supabase_key)
-            # Testa conexão básica
-            test_result = self.client.table('analyses').select('id').limit(1).execute()
-            logger.info("✅ Conexão com Supabase testada com sucesso")
-        except Exception as e:
-            logger.error(f"❌ Erro ao criar cliente Supabase: {str(e)}")
-            self.available = False
-            self.client = None
-            self.admin_client = None
-            return
-        
-        # Cliente admin (service role)
-        if self.service_role_key:
-            try:
-                self.admin_client: Client = create_client(self.supabase_url, self.service_role_key)
-                logger.info("✅ Cliente admin Supabase inicializado")
-            except Exception as e:
-                logger.warning(f"⚠️ Erro ao criar cliente admin Supabase: {str(e)}")
-                self.admin_client = self.client
-        else:
-            self.admin_client = self.client
+        # Cache das estatísticas agregadas (get_session_info consulta a cada chamada)
+        self.stats_ttl = float(os.getenv('DB_STATS_TTL', 30))
+        self._stats_cache: Optional[Dict[str, Any]] = None
+        self._stats_lock = threading.Lock()
+        self._stats_refreshing = False
+        self._stats_rpc_warned = False
         
         if self.available:
-            logger.info("✅ DatabaseManager inicializado com Supabase")
+            logger.info("✅ DatabaseManager configurado com Supabase (conexão no primeiro uso)")
         else:
-            logger.warning("⚠️ DatabaseManager inicializado sem banco de dados")
+            logger.warning("⚠️ Credenciais do Supabase não configuradas - Banco de dados indisponível")
     
+    @property
+    def client(self):
+        """Cliente principal (anon key), criado sob demanda"""
+        if self._client is None and self.available:
+            self._connect()
+        return self._client
+    
+    @property
+    def admin_client(self):
+        """Cliente admin (service role), criado sob demanda"""
+        if self._client is None and self.available:
+            self._connect()
+        return self._admin_client
+    
+    def _connect(self):
+        """Cria os clientes Supabase (o SDK só é importado aqui)"""
+        with self._client_lock:
+            if self._client is not None or not self.available:
+                return
+            
+            try:
+                from supabase.client import create_client
+                client = create_client(self.supabase_url, self.supabase_key)
+            except Exception as e:
+                logger.error(f"❌ Erro ao criar cliente Supabase: {str(e)}")
+                self.available = False
+                return
+            
+            admin_client = client
+            if self.service_role_key:
+                try:
+                    admin_client = create_client(self.supabase_url, self.service_role_key)
+                    logger.info("✅ Cliente admin Supabase inicializado")
+                except Exception as e:
+                    logger.warning(f"⚠️ Erro ao criar cliente admin Supabase: {str(e)}")
+            
+            self._admin_client = admin_client
+            self._client = client
+            logger.info("✅ Cliente Supabase inicializado")
+    
+    @timed_db_operation('test_connection')
+    @traced('db.test_connection')
     def test_connection(self) -> bool:
         """Testa conexão com o banco"""
         if not self.available or not self.client:
@@ -74,53 +117,93 @@ class DatabaseManager:
             logger.error(f"Erro ao testar conexão: {str(e)}")
             return False
     
+    # Seções do resultado gravadas apenas em colunas JSONB próprias; comprehensive_analysis guarda o restante
+    SECTION_COLUMNS = {
+        'avatar_data': 'avatar_ultra_detalhado',
+        'positioning_data': 'estrategia_posicionamento',
+        'competition_data': 'analise_concorrencia_profunda',
+        'marketing_data': 'estrategia_palavras_chave',
+        'metrics_data': 'metricas_performance'
+    }
+    
+    @staticmethod
+    def _to_decimal(value: Any) -> Optional[float]:
+        """Converte valores numéricos do formulário; texto livre vira None"""
+        if value and str(value).replace('.', '').isdigit():
+            return float(value)
+        return None
+    
+    def build_analysis_row(self, analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Monta a linha da tabela analyses; cada seção aparece uma única vez no payload"""
+        now = datetime.now().isoformat()
+        # Seções vazias continuam no documento, já que a coluna fica nula
+        section_keys = {key for key in self.SECTION_COLUMNS.values() if analysis_data.get(key)}
+        row = {
+            'nicho': analysis_data.get('segmento', ''),
+            'produto': analysis_data.get('produto', ''),
+            'descricao': analysis_data.get('descricao', ''),
+            'preco': self._to_decimal(analysis_data.get('preco')),
+            'publico': analysis_data.get('publico', ''),
+            'concorrentes': analysis_data.get('concorrentes', ''),
+            'dados_adicionais': analysis_data.get('dados_adicionais', ''),
+            'objetivo_receita': self._to_decimal(analysis_data.get('objetivo_receita')),
+            'orcamento_marketing': self._to_decimal(analysis_data.get('orcamento_marketing')),
+            'prazo_lancamento': analysis_data.get('prazo_lancamento', ''),
+            'status': analysis_data.get('status', 'completed'),
+            'comprehensive_analysis': {k: v for k, v in analysis_data.items() if k not in section_keys},
+            'created_at': now,
+            'updated_at': now
+        }
+        for column, key in self.SECTION_COLUMNS.items():
+            if key in section_keys:
+                row[column] = analysis_data[key]
+        
+        # Remove campos None
+        return {k: v for k, v in row.items() if v is not None}
+    
+    def assemble_analysis(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Reconstrói o documento completo em comprehensive_analysis a partir das colunas de seção"""
+        document = row.get('comprehensive_analysis')
+        if not isinstance(document, dict):
+            return row
+        
+        # Linhas antigas já trazem as seções dentro do documento
+        for column, key in self.SECTION_COLUMNS.items():
+            if key not in document and row.get(column) is not None:
+                document[key] = row[column]
+        return row
+    
+    @timed_db_operation('insert_analyses')
+    @traced('db.insert_analyses')
+    def insert_analyses(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insere um lote de linhas em uma única requisição; erros são propagados para quem faz retry"""
+        if not self.available or not self.client:
+            raise RuntimeError("Banco de dados não disponível")
+        
+        result = self.client.table('analyses').insert(rows).execute()
+        if not result.data or len(result.data) != len(rows):
+            raise RuntimeError(f"Inserção em lote retornou {len(result.data or [])} de {len(rows)} linhas")
+        return result.data
+    
+    @timed_db_operation('create_analysis')
+    @traced('db.create_analysis')
     def create_analysis(self, analysis_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Cria nova análise no banco"""
+        """Cria nova análise no banco (síncrono; a rota de análise usa a fila de persistência)"""
         if not self.available or not self.client:
             logger.warning("⚠️ Banco de dados não disponível - análise não será salva")
             return None
             
         try:
-            # Prepara dados para inserção
-            insert_data = {
-                'nicho': analysis_data.get('segmento', ''),
-                'produto': analysis_data.get('produto', ''),
-                'descricao': analysis_data.get('descricao', ''),
-                'preco': float(analysis_data.get('preco', 0)) if analysis_data.get('preco') and str(analysis_data.get('preco')).replace('.', '').isdigit() else None,
-                'publico': analysis_data.get('publico', ''),
-                'concorrentes': analysis_data.get('concorrentes', ''),
-                'dados_adicionais': analysis_data.get('dados_adicionais', ''),
-                'objetivo_receita': float(analysis_data.get('objetivo_receita', 0)) if analysis_data.get('objetivo_receita') and str(analysis_data.get('objetivo_receita')).replace('.', '').isdigit() else None,
-                'orcamento_marketing': float(analysis_data.get('orcamento_marketing', 0)) if analysis_data.get('orcamento_marketing') and str(analysis_data.get('orcamento_marketing')).replace('.', '').isdigit() else None,
-                'prazo_lancamento': analysis_data.get('prazo_lancamento', ''),
-                'status': analysis_data.get('status', 'completed'),
-                'avatar_data': json.dumps(analysis_data.get('avatar_ultra_detalhado', {}), ensure_ascii=False) if analysis_data.get('avatar_ultra_detalhado') else None,
-                'positioning_data': json.dumps(analysis_data.get('estrategia_posicionamento', {}), ensure_ascii=False) if analysis_data.get('estrategia_posicionamento') else None,
-                'competition_data': json.dumps(analysis_data.get('analise_concorrencia_profunda', {}), ensure_ascii=False) if analysis_data.get('analise_concorrencia_profunda') else None,
-                'marketing_data': json.dumps(analysis_data.get('estrategia_palavras_chave', {}), ensure_ascii=False) if analysis_data.get('estrategia_palavras_chave') else None,
-                'metrics_data': json.dumps(analysis_data.get('metricas_performance', {}), ensure_ascii=False) if analysis_data.get('metricas_performance') else None,
-                'comprehensive_analysis': json.dumps(analysis_data, ensure_ascii=False),
-                'created_at': datetime.now().isoformat(),
-                'updated_at': datetime.now().isoformat()
-            }
-            
-            # Remove campos None
-            insert_data = {k: v for k, v in insert_data.items() if v is not None}
-            
-            # Insere no banco
-            result = self.client.table('analyses').insert(insert_data).execute()
-            
-            if result.data:
-                logger.info(f"Análise criada com ID: {result.data[0]['id']}")
-                return result.data[0]
-            else:
-                logger.error("Erro ao criar análise: resultado vazio")
-                return None
+            saved = self.insert_analyses([self.build_analysis_row(analysis_data)])[0]
+            logger.info(f"Análise criada com ID: {saved['id']}")
+            return saved
                 
         except Exception as e:
             logger.error(f"Erro ao criar análise: {str(e)}")
             return None
     
+    @timed_db_operation('update_analysis')
+    @traced('db.update_analysis')
     def update_analysis(self, analysis_id: int, update_data: Dict[str, Any]) -> bool:
         """Atualiza análise existente"""
         if not self.available or not self.client:
@@ -131,11 +214,6 @@ class DatabaseManager:
             # Adiciona timestamp de atualização
             update_data['updated_at'] = datetime.now().isoformat()
             
-            # Converte dados JSON para string se necessário
-            for key, value in update_data.items():
-                if isinstance(value, (dict, list)):
-                    update_data[key] = json.dumps(value, ensure_ascii=False)
-            
             # Atualiza no banco
             result = self.client.table('analyses').update(update_data).eq('id', analysis_id).execute()
             
@@ -150,6 +228,8 @@ class DatabaseManager:
             logger.error(f"Erro ao atualizar análise {analysis_id}: {str(e)}")
             return False
     
+    @timed_db_operation('get_analysis')
+    @traced('db.get_analysis')
     def get_analysis(self, analysis_id: int) -> Optional[Dict[str, Any]]:
         """Busca análise por ID"""
         if not self.available or not self.client:
@@ -162,7 +242,7 @@ class DatabaseManager:
             if result.data:
                 analysis = result.data[0]
                 
-                # Converte campos JSON de volta para objetos
+                # Linhas gravadas antes da migração 002 guardam JSON como string dentro do JSONB
                 json_fields = [
                     'avatar_data', 'positioning_data', 'competition_data',
                     'marketing_data', 'metrics_data', 'funnel_data',
@@ -172,11 +252,11 @@ class DatabaseManager:
                 for field in json_fields:
                     if analysis.get(field) and isinstance(analysis[field], str):
                         try:
-                            analysis[field] = json.loads(analysis[field])
-                        except json.JSONDecodeError:
+                            analysis[field] = json_codec.loads(analysis[field])
+                        except json_codec.DecodeError:
                             pass
                 
-                return analysis
+                return self.assemble_analysis(analysis)
             else:
                 return None
                 
@@ -184,16 +264,73 @@ class DatabaseManager:
             logger.error(f"Erro ao buscar análise {analysis_id}: {str(e)}")
             return None
     
-    def list_analyses(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
-        """Lista análises com paginação"""
+    @timed_db_operation('get_analysis_document')
+    @traced('db.get_analysis_document')
+    def get_analysis_document(self, analysis_id: int, keys: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        """Busca só as chaves pedidas do documento da análise (seções das colunas próprias, o resto via ->)"""
+        if not self.available or not self.client:
+            logger.warning("⚠️ Banco de dados não disponível")
+            return None
+        
+        column_for = {key: column for column, key in self.SECTION_COLUMNS.items()}
+        selects = ['id']
+        for key in keys:
+            if key in column_for:
+                selects.append(column_for[key])
+            selects.append(f"{key}:comprehensive_analysis->{key}")
+        
+        try:
+            result = self.client.table('analyses').select(', '.join(selects)).eq('id', analysis_id).execute()
+        except Exception as e:
+            logger.error(f"Erro ao buscar documento da análise {analysis_id}: {str(e)}")
+            return None
+        
+        if not result.data:
+            return None
+        
+        row = result.data[0]
+        document = {key: row[key] for key in keys if row.get(key) is not None}
+        for key in keys:
+            column = column_for.get(key)
+            if key not in document and column and row.get(column) is not None:
+                document[key] = row[column]
+        
+        # Documento gravado como string JSON (antes da migração 002): o -> não enxerga as chaves
+        if not any(key not in column_for for key in document):
+            analysis = self.get_analysis(analysis_id)
+            full = (analysis or {}).get('comprehensive_analysis')
+            if isinstance(full, dict):
+                return {key: full[key] for key in keys if key in full}
+        return document
+    
+    # Colunas permitidas na listagem; nunca inclui os campos JSONB pesados
+    LIST_COLUMNS = ('id', 'nicho', 'produto', 'status', 'created_at', 'updated_at')
+    
+    @timed_db_operation('list_analyses')
+    @traced('db.list_analyses')
+    def list_analyses(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        nicho: Optional[str] = None,
+        status: Optional[str] = None,
+        columns: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Lista análises com paginação por offset (mantido para compatibilidade; prefira list_analyses_page)"""
         if not self.available or not self.client:
             logger.warning("⚠️ Banco de dados não disponível")
             return []
             
         try:
-            result = self.client.table('analyses')\
-                .select('id, nicho, produto, status, created_at, updated_at')\
+            selected = [c for c in self.LIST_COLUMNS if not columns or c in columns]
+            query = self.client.table('analyses').select(', '.join(selected))
+            if nicho:
+                query = query.eq('nicho', nicho)
+            if status:
+                query = query.eq('status', status)
+            result = query\
                 .order('created_at', desc=True)\
+                .order('id', desc=True)\
                 .range(offset, offset + limit - 1)\
                 .execute()
             
@@ -203,6 +340,49 @@ class DatabaseManager:
             logger.error(f"Erro ao listar análises: {str(e)}")
             return []
     
+    @timed_db_operation('list_analyses_page')
+    @traced('db.list_analyses_page')
+    def list_analyses_page(
+        self,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        nicho: Optional[str] = None,
+        status: Optional[str] = None,
+        columns: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Página de análises por keyset em (created_at, id), com filtros nos campos indexados
+        
+        O cursor é opaco (devolvido em next_cursor); cursor inválido levanta ValueError.
+        """
+        if not self.available or not self.client:
+            logger.warning("⚠️ Banco de dados não disponível")
+            return {'analyses': [], 'next_cursor': None}
+        
+        # A chave do keyset precisa estar na projeção para gerar o próximo cursor
+        selected = [c for c in self.LIST_COLUMNS if not columns or c in columns or c in ('id', 'created_at')]
+        query = self.client.table('analyses').select(', '.join(selected))
+        
+        if nicho:
+            query = query.eq('nicho', nicho)
+        if status:
+            query = query.eq('status', status)
+        if cursor:
+            created_at, last_id = decode_cursor(cursor)
+            query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{last_id})')
+        
+        try:
+            # Uma linha a mais indica se existe próxima página sem precisar de count
+            result = query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1).execute()
+        except Exception as e:
+            logger.error(f"Erro ao listar análises: {str(e)}")
+            return {'analyses': [], 'next_cursor': None}
+        
+        rows = result.data or []
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return {'analyses': rows[:limit], 'next_cursor': next_cursor}
+    
+    @timed_db_operation('delete_analysis')
+    @traced('db.delete_analysis')
     def delete_analysis(self, analysis_id: int) -> bool:
         """Remove análise do banco"""
         if not self.available or not self.client:
@@ -224,7 +404,11 @@ class DatabaseManager:
             return False
     
     def get_stats(self) -> Dict[str, Any]:
-        """Retorna estatísticas do banco"""
+        """Retorna estatísticas do banco a partir de um cache com TTL
+        
+        Dentro do TTL não há consulta; com o cache vencido devolve o valor anterior
+        e atualiza em background, de modo que só a primeira chamada espera o banco.
+        """
         if not self.available or not self.client:
             return {
                 'total_analyses': 0,
@@ -233,7 +417,61 @@ class DatabaseManager:
                 'error': 'Banco de dados não disponível',
                 'available': False
             }
-            
+        
+        cached = self._stats_cache
+        if cached is None:
+            with self._stats_lock:
+                if self._stats_cache is None:
+                    self._refresh_stats()
+            return self._stats_cache['stats']
+        
+        if time.time() - cached['fetched_at'] > self.stats_ttl:
+            self._schedule_stats_refresh()
+        return cached['stats']
+    
+    def _schedule_stats_refresh(self):
+        """Dispara no máximo uma atualização em background por vez"""
+        with self._stats_lock:
+            if self._stats_refreshing:
+                return
+            self._stats_refreshing = True
+        
+        def refresh():
+            try:
+                self._refresh_stats()
+            finally:
+                self._stats_refreshing = False
+        
+        threading.Thread(target=refresh, name='db-stats-refresh', daemon=True).start()
+    
+    def _refresh_stats(self):
+        stats = self._fetch_stats()
+        # Falhas não substituem um valor bom já em cache
+        if stats.get('available') or self._stats_cache is None:
+            self._stats_cache = {'stats': stats, 'fetched_at': time.time()}
+    
+    @timed_db_operation('get_stats')
+    @traced('db.get_stats')
+    def _fetch_stats(self) -> Dict[str, Any]:
+        """Uma única agregação no servidor (função analysis_stats da migração 004)"""
+        try:
+            result = self.client.rpc('analysis_stats', {'recent_days': 7}).execute()
+            stats = result.data[0] if isinstance(result.data, list) else result.data
+            return {
+                'total_analyses': stats.get('total_analyses', 0),
+                'status_counts': stats.get('status_counts') or {},
+                'recent_analyses': stats.get('recent_analyses', 0),
+                'timestamp': datetime.now().isoformat(),
+                'available': True
+            }
+        except Exception as e:
+            if not self._stats_rpc_warned:
+                logger.warning(f"⚠️ RPC analysis_stats indisponível ({str(e)}) - aplique a migração 004; usando consultas separadas")
+                self._stats_rpc_warned = True
+            return self._fetch_stats_legacy()
+    
+    def _fetch_stats_legacy(self) -> Dict[str, Any]:
+        """Cálculo anterior em três consultas, usado enquanto a migração 004 não foi aplicada"""
         try:
             # Total de análises
             total_result = self.client.table('analyses').select('id', count='exact').execute()
@@ -278,10 +516,19 @@ class DatabaseManager:
                 'error': str(e),
                 'available': False
             }
+    
+    def reset_after_fork(self):
+        """Descarta clientes Supabase herdados do master (sockets compartilhados entre processos)"""
+        self._client = None
+        self._admin_client = None
+        self._client_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats_refreshing = False
 
 # Instância global do gerenciador
 try:
     db_manager = DatabaseManager()
+    register_after_fork('db_manager', db_manager.reset_after_fork)
 except Exception as e:
     logger.error(f"❌ Erro ao inicializar DatabaseManager: {str(e)}")
     # Cria um manager mock para evitar erros
@@ -302,9 +549,15 @@ except Exception as e:
         def get_analysis(self, analysis_id):
             return None
         
-        def list_analyses(self, limit=50, offset=0):
+        def get_analysis_document(self, analysis_id, keys):
+            return None
+        
+        def list_analyses(self, limit=50, offset=0, nicho=None, status=None, columns=None):
             return []
         
+        def list_analyses_page(self, limit=20, cursor=None, nicho=None, status=None, columns=None):
+            return {'analyses': [], 'next_cursor': None}
+        
         def delete_analysis(self, analysis_id):
             return False
         
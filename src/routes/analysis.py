@@ -12,8 +12,12 @@ import time
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from services.enhanced_analysis_engine import enhanced_analysis_engine
+from services.attachment_jobs import attachment_job_manager
 from services.attachment_service import attachment_service
 from database import db_manager
+from services.persistence_queue import persistence_queue
+from services.phase_timing import record_phase, get_current_recorder
+from services.tracing import set_attribute
 
 logger = logging.getLogger(__name__)
 
@@ -41,24 +45,24 @@ def analyze_market():
                 'message': 'O campo segmento é obrigatório para análise'
             }), 400
         
+        attachment_ids = data.get('attachment_ids')
+        if attachment_ids is not None and (
+            not isinstance(attachment_ids, list) or not all(isinstance(item, str) for item in attachment_ids)
+        ):
+            return jsonify({
+                'error': 'attachment_ids inválido',
+                'message': 'Envie attachment_ids como lista com os IDs dos anexos exibidos'
+            }), 400
+        
         logger.info(f"🚀 Iniciando análise para segmento: {data.get('segmento')}")
         start_time = time.time()
         
         # Gera análise usando o motor enhanced
         session_id = data.get('session_id')
+        set_attribute('session_id', session_id)
+        set_attribute('segmento', data.get('segmento'))
         analysis_result = enhanced_analysis_engine.generate_comprehensive_analysis(data, session_id)
         
-        # Salva no banco se disponível
-        try:
-            if analysis_result and db_manager.available:
-                saved_analysis = db_manager.create_analysis(analysis_result)
-                if saved_analysis:
-                    analysis_result['database_id'] = saved_analysis['id']
-                    logger.info(f"✅ Análise salva no banco com ID: {saved_analysis['id']}")
-        except Exception as e:
-            logger.warning(f"⚠️ Erro ao salvar no banco: {str(e)}")
-            # Continua mesmo se não conseguir salvar no banco
-        
         end_time = time.time()
         processing_time = end_time - start_time
         
@@ -74,6 +78,29 @@ def analyze_market():
             'success': True
         })
         
+        recorder = get_current_recorder()
+        if recorder:
+            analysis_result['metadata']['phase_timings'] = recorder.as_dict()
+        
+        # Gravação no banco em background (write-behind); a resposta leva só o ID pendente
+        try:
+            if analysis_result and db_manager.available:
+                with record_phase('db_save'):
+                    pending_id = persistence_queue.enqueue(analysis_result)
+                if pending_id:
+                    analysis_result['persistence'] = {
+                        'status': 'pending',
+                        'pending_id': pending_id,
+                        'status_url': f"/api/analysis/pending/{pending_id}"
+                    }
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao agendar gravação no banco: {str(e)}")
+            # Continua mesmo se não conseguir salvar no banco
+
+        # A resposta inclui também o tempo de enfileiramento (a cópia na fila não é afetada)
+        if recorder:
+            analysis_result['metadata']['phase_timings'] = recorder.as_dict()
+
         logger.info(f"✅ Análise concluída em {processing_time:.2f} segundos")
         
         return jsonify(analysis_result)
@@ -99,7 +126,13 @@ def upload_attachment():
             }), 400
         
         file = request.files['file']
-        session_id = request.form.get('session_id', 'default_session')
+        session_id = request.form.get('session_id', '').strip()
+        
+        if not session_id:
+            return jsonify({
+                'error': 'Sessão não informada',
+                'message': 'Envie o session_id da análise junto com o arquivo'
+            }), 400
         
         if file.filename == '':
             return jsonify({
@@ -107,12 +140,14 @@ def upload_attachment():
                 'message': 'Selecione um arquivo válido'
             }), 400
         
-        logger.info(f"📎 Processando anexo: {file.filename}")
+        logger.info(f"📎 Recebendo anexo: {file.filename}")
         
-        # Processa arquivo
-        result = attachment_service.process_attachment(file, session_id)
+        # Reenvios saem do cache na hora; o resto é extraído em background
+        result = attachment_job_manager.submit(file, session_id)
         
-        if result['success']:
+        if result['status'] == 'processing':
+            return jsonify(result), 202
+        elif result['success']:
             logger.info(f"✅ Anexo processado: {file.filename}")
             return jsonify(result)
         else:
@@ -126,6 +161,50 @@ def upload_attachment():
             'message': str(e)
         }), 500
 
+@analysis_bp.route('/attachment_jobs/<job_id>', methods=['GET'])
+def get_attachment_job(job_id):
+    """Status do processamento de um anexo enviado"""
+    
+    job = attachment_job_manager.get_status(job_id)
+    if not job:
+        return jsonify({
+            'error': 'Job não encontrado',
+            'message': f'Nenhum anexo em processamento com ID {job_id}'
+        }), 404
+    
+    return jsonify(job)
+
+@analysis_bp.route('/session_attachments/<session_id>', methods=['GET', 'DELETE'])
+def session_attachments(session_id):
+    """Lista (sem o texto) ou remove os anexos processados de uma sessão"""
+    
+    if request.method == 'DELETE':
+        if not attachment_service.clear_session_attachments(session_id):
+            return jsonify({
+                'error': 'Erro ao remover anexos',
+                'message': f'Não foi possível limpar os anexos da sessão {session_id}'
+            }), 500
+        return jsonify({'success': True, 'session_id': session_id})
+    
+    attachments = attachment_service.get_session_attachments(session_id)
+    return jsonify({
+        'session_id': session_id,
+        'attachments': attachments,
+        'count': len(attachments)
+    })
+
+@analysis_bp.route('/session_attachments/<session_id>/<attachment_id>', methods=['DELETE'])
+def remove_session_attachment(session_id, attachment_id):
+    """Tira um anexo da sessão: a próxima análise não o usa mais"""
+    
+    if not attachment_service.remove_session_attachment(session_id, attachment_id):
+        return jsonify({
+            'error': 'Anexo não encontrado',
+            'message': f'Nenhum anexo {attachment_id} na sessão {session_id}'
+        }), 404
+    
+    return jsonify({'success': True, 'session_id': session_id, 'attachment_id': attachment_id})
+
 @analysis_bp.route('/analysis/<int:analysis_id>', methods=['GET'])
 def get_analysis(analysis_id):
     """Recupera análise por ID"""
@@ -154,9 +233,22 @@ def get_analysis(analysis_id):
             'message': str(e)
         }), 500
 
+@analysis_bp.route('/analysis/pending/<pending_id>', methods=['GET'])
+def get_pending_analysis(pending_id):
+    """Status da gravação de uma análise ainda não persistida"""
+    
+    status = persistence_queue.get_status(pending_id)
+    if not status:
+        return jsonify({
+            'error': 'Gravação não encontrada',
+            'message': f'Nenhuma análise pendente com ID {pending_id}'
+        }), 404
+    
+    return jsonify(status)
+
 @analysis_bp.route('/analyses', methods=['GET'])
 def list_analyses():
-    """Lista análises com paginação"""
+    """Lista análises com paginação por offset (padrão) ou por cursor (?cursor=, vazio na primeira página)"""
     
     try:
         if not db_manager.available:
@@ -165,16 +257,53 @@ def list_analyses():
                 'message': 'Configure o Supabase para usar esta funcionalidade'
             }), 503
         
-        limit = min(int(request.args.get('limit', 20)), 100)
-        offset = int(request.args.get('offset', 0))
+        limit = max(min(int(request.args.get('limit', 20)), 100), 1)
+        filters = {
+            'nicho': request.args.get('nicho') or None,
+            'status': request.args.get('status') or None
+        }
+        columns = [c.strip() for c in request.args.get('fields', '').split(',') if c.strip()]
+        unknown = [c for c in columns if c not in db_manager.LIST_COLUMNS]
+        if unknown:
+            return jsonify({
+                'error': 'Campos inválidos',
+                'message': f"Campos permitidos: {', '.join(db_manager.LIST_COLUMNS)}"
+            }), 400
         
-        analyses = db_manager.list_analyses(limit, offset)
+        # Sem `cursor` mantém a paginação por offset e a resposta dos clientes antigos;
+        # `cursor` (vazio na primeira página) ativa o keyset e devolve next_cursor
+        if 'cursor' not in request.args:
+            offset = max(int(request.args.get('offset', 0)), 0)
+            analyses = db_manager.list_analyses(limit, offset, columns=columns or None, **filters)
+            return jsonify({
+                'analyses': analyses,
+                'limit': limit,
+                'offset': offset,
+                'count': len(analyses)
+            })
+        
+        if 'offset' in request.args:
+            return jsonify({
+                'error': 'Paginação ambígua',
+                'message': 'Use offset ou cursor, não os dois'
+            }), 400
+        
+        try:
+            page = db_manager.list_analyses_page(
+                limit=limit,
+                cursor=request.args.get('cursor') or None,
+                columns=columns or None,
+                **filters
+            )
+        except ValueError as e:
+            return jsonify({'error': 'Cursor inválido', 'message': str(e)}), 400
         
         return jsonify({
-            'analyses': analyses,
+            'analyses': page['analyses'],
             'limit': limit,
-            'offset': offset,
-            'count': len(analyses)
+            'count': len(page['analyses']),
+            'next_cursor': page['next_cursor'],
+            'filters': {k: v for k, v in filters.items() if v}
         })
         
     except Exception as e:
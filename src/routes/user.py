@@ -10,6 +10,7 @@ import uuid
 from datetime import datetime
 from flask import Blueprint, request, jsonify, session
 from database import db_manager
+from services.attachment_service import attachment_service
 
 logger = logging.getLogger(__name__)
 
@@ -264,7 +265,7 @@ def export_user_data():
             'session_id': session_id,
             'export_date': datetime.now().isoformat(),
             'analyses': [],  # Seria preenchido com análises do usuário
-            'attachments': [],  # Seria preenchido com anexos do usuário
+            'attachments': attachment_service.get_session_attachments(session_id),
             'preferences': session.get('preferences', {}),
             'metadata': {
                 'version': '2.0.0',
@@ -10,12 +10,14 @@ import sys
 import logging
 import locale
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template, send_file
+from flask import Flask, request, jsonify, render_template, send_file, g, Response, session, abort
 from flask_cors import CORS
 from dotenv import load_dotenv
 import traceback
 import signal
 import atexit
+import time
+import hmac
 
 # Carrega variáveis de ambiente
 load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.env'))
@@ -52,8 +54,16 @@ logger = logging.getLogger(__name__)
 from routes.analysis import analysis_bp
 from routes.user import user_bp
 from routes.pdf_generator import pdf_bp
+from database import db_manager
 from services.production_search_manager import production_search_manager
 from services.production_content_extractor import production_content_extractor
+from services.ai_manager import ai_manager
+from services.quota_ledger import quota_ledger
+from services.phase_timing import start_recording, stop_recording
+from services.metrics import registry as metrics_registry, http_request_seconds, http_requests_in_progress
+from services.tracing import begin_span, end_span
+from services.profiler import profiler
+from services.fork_safety import call_in_worker
 
 def create_app():
     """Cria e configura a aplicação Flask"""
@@ -93,6 +103,61 @@ def create_app():
             response.headers['Referrer-Policy'] = 'strict-origin-when-cross-origin'
             return response
     
+    # Tempo por fase do pipeline, exposto no cabeçalho Server-Timing
+    @app.before_request
+    def start_phase_recording():
+        g.phase_recorder, g.phase_recorder_token = start_recording()
+        g.request_started_at = time.perf_counter()
+        g.metrics_endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics_registry.start_flusher()
+        http_requests_in_progress.inc(endpoint=g.metrics_endpoint)
+        g.trace_span, g.trace_span_token = begin_span(
+            f"{request.method} {g.metrics_endpoint}",
+            traceparent=request.headers.get('traceparent'),
+            kind=2,
+            **{'http.method': request.method, 'http.route': g.metrics_endpoint, 'http.target': request.path}
+        )
+        # Sem profiler armado o custo é apenas esta verificação
+        if profiler.armed and g.metrics_endpoint not in PROFILE_IGNORED_ROUTES:
+            g.profile = profiler.begin(
+                f"{request.method} {g.metrics_endpoint}",
+                route=g.metrics_endpoint,
+                session_id=_request_session_id()
+            )
+    
+    @app.after_request
+    def add_server_timing(response):
+        recorder = g.get('phase_recorder')
+        if recorder is not None and recorder.durations:
+            response.headers['Server-Timing'] = recorder.server_timing_header()
+        if 'request_started_at' in g:
+            http_request_seconds.observe(
+                time.perf_counter() - g.request_started_at,
+                endpoint=g.metrics_endpoint,
+                method=request.method,
+                status=response.status_code
+            )
+        span = g.get('trace_span')
+        if span is not None and span.recording:
+            span.set_attribute('http.status_code', response.status_code)
+            response.headers['X-Trace-Id'] = span.trace_id
+        return response
+    
+    @app.teardown_request
+    def stop_phase_recording(exc):
+        token = g.pop('phase_recorder_token', None)
+        if token is not None:
+            stop_recording(token)
+        endpoint = g.pop('metrics_endpoint', None)
+        if endpoint is not None:
+            http_requests_in_progress.dec(endpoint=endpoint)
+        span_token = g.pop('trace_span_token', None)
+        if span_token is not None:
+            end_span(g.pop('trace_span'), span_token, exc)
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profiler.finish(profile)
+    
     # Compressão GZIP
     if os.getenv('GZIP_ENABLED', 'true').lower() == 'true':
         from flask_compress import Compress
@@ -106,6 +171,10 @@ def create_app():
     app.register_blueprint(user_bp, url_prefix='/api')
     app.register_blueprint(pdf_bp, url_prefix='/api')
     
+    # Aquece conexões dos provedores de IA em background (no master com preload, só depois do fork)
+    if os.getenv('AI_WARMUP_ENABLED', 'true').lower() == 'true':
+        call_in_worker('ai_manager.warm_up', ai_manager.warm_up)
+    
     # Service Worker route
     @app.route('/sw.js')
     def service_worker():
@@ -125,6 +194,12 @@ def create_app():
         """Página principal da aplicação"""
         return render_template('enhanced_index.html')
     
+    # Métricas no formato Prometheus, agregadas entre os workers
+    @app.route('/metrics')
+    def metrics():
+        """Exposição das métricas da aplicação"""
+        return Response(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    
     # Health check
     @app.route('/api/health')
     def health_check():
@@ -164,7 +239,8 @@ def create_app():
                     },
                     'content_extraction': {'available': True},
                     'cache': {'enabled': os.getenv('CACHE_ENABLED', 'true').lower() == 'true'},
-                    'database': {'available': bool(os.getenv('SUPABASE_URL'))}
+                    'database': {'available': bool(os.getenv('SUPABASE_URL'))},
+                    'quotas': quota_ledger.get_remaining()
                 },
                 'environment': {
                     'python_version': sys.version,
@@ -225,6 +301,42 @@ def create_app():
                 'message': str(e)
             }), 500
     
+    # Rota administrativa de profiling (desabilitada sem ADMIN_TOKEN)
+    @app.route('/api/admin/profile', methods=['GET', 'POST', 'DELETE'])
+    def admin_profile():
+        """Arma, consulta ou desarma a captura de perfis neste worker"""
+        admin_token = os.getenv('ADMIN_TOKEN')
+        if not admin_token:
+            abort(404)
+        
+        provided = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(provided.encode(), admin_token.encode()):
+            return jsonify({'error': 'Não autorizado'}), 401
+        
+        try:
+            if request.method == 'POST':
+                data = request.get_json(silent=True) or {}
+                status = profiler.arm(
+                    requests=int(data.get('requests', 0)),
+                    session_id=data.get('session_id'),
+                    mode=data.get('mode'),
+                    route=data.get('route'),
+                    ttl_seconds=data.get('ttl_seconds')
+                )
+            elif request.method == 'DELETE':
+                profiler.disarm()
+                status = profiler.status()
+            else:
+                status = profiler.status()
+            
+            return jsonify({
+                'profiler': status,
+                'profiles': profiler.list_profiles(),
+                'timestamp': datetime.now().isoformat()
+            })
+        except ValueError as e:
+            return jsonify({'error': 'Parâmetros inválidos', 'message': str(e)}), 400
+    
     # Handler de erro global
     @app.errorhandler(Exception)
     def handle_exception(e):
@@ -256,6 +368,18 @@ def create_app():
     
     return app
 
+# Rotas que nunca consomem capturas do profiler
+PROFILE_IGNORED_ROUTES = {'/metrics', '/api/health', '/api/admin/profile'}
+
+def _request_session_id():
+    """session_id da requisição (corpo JSON, query string ou sessão Flask) para o profiler"""
+    if not profiler.session_ids:
+        return None
+    data = request.get_json(silent=True) if request.is_json else None
+    if isinstance(data, dict) and data.get('session_id'):
+        return data['session_id']
+    return request.args.get('session_id') or session.get('session_id')
+
 def setup_signal_handlers():
     """Configura handlers para sinais do sistema"""
     def signal_handler(signum, frame):
@@ -265,6 +389,8 @@ def setup_signal_handlers():
     
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    # SIGUSR2 arma o profiler (kill -USR2 <pid>)
+    profiler.install_signal_handler()
 
 def cleanup_on_exit():
     """Função de limpeza executada na saída"""
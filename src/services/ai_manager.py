@@ -9,11 +9,16 @@ import os
 import logging
 import time
 import json
+import threading
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
-import google.generativeai as genai
-import openai
-import requests
+from utils.http_utils import create_pooled_session, warm_up_session
+from services.context_packer import context_packer
+from services.quota_ledger import quota_ledger
+from services.stub_providers import is_stub_mode, resolve_url, StubGenerativeModel
+from services.metrics import llm_requests_total, llm_request_seconds, llm_tokens_total
+from services.tracing import begin_span, end_span
+from services.fork_safety import register_after_fork
 
 logger = logging.getLogger(__name__)
 
@@ -56,74 +61,161 @@ class AIManager:
             }
         }
         
+        # Protege contadores de erro e rotação de modelos entre threads
+        self._lock = threading.Lock()
+        self._client_lock = threading.Lock()
+        self.request_timeout = int(os.getenv('AI_REQUEST_TIMEOUT', 60))
+        self.pool_size = int(os.getenv('AI_HTTP_POOL_SIZE', 10))
+        
         self.initialize_providers()
         logger.info(f"AI Manager inicializado com {len([p for p in self.providers.values() if p['available']])} provedores disponíveis")
     
     def initialize_providers(self):
-        """Inicializa todos os provedores de IA"""
+        """Marca provedores configurados; clientes e SDKs são carregados no primeiro uso"""
         
-        # Inicializa Gemini
-        try:
-            gemini_key = os.getenv('GEMINI_API_KEY')
-            if gemini_key:
-                genai.configure(api_key=gemini_key)
-                self.providers['gemini']['client'] = genai.GenerativeModel("gemini-1.5-flash")
-                self.providers['gemini']['available'] = True
-                logger.info("✅ Gemini Flash inicializado com sucesso")
-        except Exception as e:
-            logger.warning(f"⚠️ Falha ao inicializar Gemini: {str(e)}")
+        if os.getenv('GEMINI_API_KEY'):
+            self.providers['gemini']['available'] = True
+            logger.info("✅ Gemini Flash configurado")
         
-        # Inicializa OpenAI
-        try:
-            openai_key = os.getenv('OPENAI_API_KEY')
-            if openai_key:
-                openai.api_key = openai_key
-                self.providers["openai"]["client"] = openai.OpenAI(api_key=openai_key)
-                self.providers["openai"]["available"] = True
-                logger.info("✅ OpenAI inicializado com sucesso")
-        except Exception as e:
-            logger.warning(f"⚠️ Falha ao inicializar OpenAI: {str(e)}")
+        if os.getenv('OPENAI_API_KEY'):
+            self.providers['openai']['available'] = True
+            logger.info("✅ OpenAI configurado")
         
-        # Inicializa HuggingFace
-        try:
-            hf_key = os.getenv('HUGGINGFACE_API_KEY')
-            if hf_key:
-                self.providers['huggingface']['client'] = {
-                    'api_key': hf_key,
-                    'base_url': 'https://api-inference.huggingface.co/models/'
+        if os.getenv('HUGGINGFACE_API_KEY'):
+            self.providers['huggingface']['available'] = True
+            logger.info("✅ HuggingFace configurado")
+    
+    def _get_client(self, provider_name: str) -> Any:
+        """Retorna o cliente do provedor, criando-o na primeira chamada"""
+        client = self.providers[provider_name]['client']
+        if client is not None:
+            return client
+        
+        with self._client_lock:
+            client = self.providers[provider_name]['client']
+            if client is None:
+                try:
+                    client = getattr(self, f"_create_{provider_name}_client")()
+                except Exception as e:
+                    logger.warning(f"⚠️ Falha ao inicializar {provider_name}: {str(e)}")
+                    self.providers[provider_name]['available'] = False
+                    raise
+                self.providers[provider_name]['client'] = client
+                logger.info(f"✅ Cliente {provider_name} inicializado")
+        
+        return client
+    
+    def _create_gemini_client(self) -> Any:
+        """Cria cliente Gemini (ou stub local)"""
+        if is_stub_mode():
+            return StubGenerativeModel(
+                self.providers['gemini']['model'],
+                session=create_pooled_session(pool_size=self.pool_size),
+                timeout=self.request_timeout
+            )
+        
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+        return genai.GenerativeModel(self.providers['gemini']['model'])
+    
+    def _create_openai_client(self) -> Any:
+        """Cria cliente OpenAI único e thread-safe com pool de conexões próprio"""
+        import openai
+        import httpx
+        
+        openai_key = os.getenv('OPENAI_API_KEY')
+        openai.api_key = openai_key
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size
+            ),
+            timeout=self.request_timeout
+        )
+        return openai.OpenAI(
+            api_key=openai_key,
+            base_url=resolve_url(os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')),
+            http_client=http_client,
+            max_retries=0
+        )
+    
+    def _create_huggingface_client(self) -> Dict[str, Any]:
+        """Cria sessão HTTP da Inference API do HuggingFace"""
+        hf_key = os.getenv('HUGGINGFACE_API_KEY')
+        return {
+            'api_key': hf_key,
+            'base_url': resolve_url('https://api-inference.huggingface.co/models/'),
+            'session': create_pooled_session(
+                pool_size=self.pool_size,
+                headers={
+                    "Authorization": f"Bearer {hf_key}",
+                    "Content-Type": "application/json"
                 }
-                self.providers['huggingface']['available'] = True
-                logger.info("✅ HuggingFace inicializado com sucesso")
-        except Exception as e:
-            logger.warning(f"⚠️ Falha ao inicializar HuggingFace: {str(e)}")
+            )
+        }
+    
+    def warm_up(self, background: bool = True):
+        """Aquece conexões dos provedores disponíveis (DNS, TCP e TLS)"""
+        if background:
+            thread = threading.Thread(target=self.warm_up, kwargs={'background': False}, daemon=True)
+            thread.start()
+            return
+        
+        warmed = []
+        
+        if self.providers['gemini']['available']:
+            try:
+                gemini_client = self._get_client('gemini')
+                if isinstance(gemini_client, StubGenerativeModel):
+                    warm_up_session(gemini_client.session, gemini_client.url)
+                else:
+                    import google.generativeai as genai
+                    genai.get_model(f"models/{self.providers['gemini']['model']}")
+                warmed.append('gemini')
+            except Exception as e:
+                logger.debug(f"Warm-up Gemini falhou: {e}")
+        
+        if self.providers['openai']['available']:
+            try:
+                self._get_client('openai').with_options(timeout=5.0).models.list()
+                warmed.append('openai')
+            except Exception as e:
+                logger.debug(f"Warm-up OpenAI falhou: {e}")
+        
+        if self.providers['huggingface']['available']:
+            hf_client = self._get_client('huggingface')
+            if warm_up_session(hf_client['session'], hf_client['base_url']):
+                warmed.append('huggingface')
+        
+        logger.info(f"🔥 Warm-up dos provedores de IA concluído: {', '.join(warmed) or 'nenhum'}")
     
-    def get_best_provider(self) -> Optional[str]:
-        """Retorna o melhor provedor disponível"""
-        available_providers = [
+    def get_best_provider(self, estimated_tokens: int = 0) -> Optional[str]:
+        """Retorna o melhor provedor disponível; None se nenhum tiver quota para a chamada"""
+        with_capacity = [
             (name, provider) for name, provider in self.providers.items() 
-            if provider['available'] and provider['error_count'] < 5
+            if provider['available'] and quota_ledger.has_capacity(name, tokens=estimated_tokens)
         ]
+        available_providers = [(name, provider) for name, provider in with_capacity if provider['error_count'] < 5]
         
-        if not available_providers:
-            # Reset error counts se todos falharam
-            for provider in self.providers.values():
-                provider['error_count'] = 0
-            available_providers = [
-                (name, provider) for name, provider in self.providers.items() 
-                if provider['available']
-            ]
+        if not available_providers and with_capacity:
+            # Reset error counts se todos falharam, só entre os que ainda têm quota
+            with self._lock:
+                for _, provider in with_capacity:
+                    provider['error_count'] = 0
+            available_providers = with_capacity
         
         if available_providers:
             # Ordena por prioridade e menor número de erros
             available_providers.sort(key=lambda x: (x[1]['priority'], x[1]['error_count']))
             return available_providers[0][0]
         
+        logger.warning("⚠️ Nenhum provedor de IA com quota disponível")
         return None
     
     def generate_analysis(self, prompt: str, max_tokens: int = 8192) -> Optional[str]:
         """Gera análise usando o melhor provedor disponível"""
         
-        provider_name = self.get_best_provider()
+        provider_name = self.get_best_provider(context_packer.estimate_tokens(prompt))
         if not provider_name:
             logger.error("❌ Nenhum provedor de IA disponível")
             return None
@@ -131,25 +223,50 @@ class AIManager:
         logger.info(f"🤖 Usando provedor: {provider_name}")
         
         try:
-            if provider_name == 'gemini':
-                return self._generate_with_gemini(prompt, max_tokens)
-            elif provider_name == 'openai':
-                return self._generate_with_openai(prompt, max_tokens)
-            elif provider_name == 'huggingface':
-                return self._generate_with_huggingface(prompt, max_tokens)
+            return self._call_provider(provider_name, prompt, max_tokens)
         except Exception as e:
             logger.error(f"❌ Erro no provedor {provider_name}: {str(e)}")
-            self.providers[provider_name]['error_count'] += 1
+            self._increment_error(provider_name)
             
             # Tenta próximo provedor
             return self._try_fallback(prompt, max_tokens, exclude=[provider_name])
+    
+    def _call_provider(self, provider_name: str, prompt: str, max_tokens: int) -> Optional[str]:
+        """Executa chamada no provedor e contabiliza requisição e tokens no ledger de quotas"""
+        prompt_tokens = context_packer.estimate_tokens(prompt, provider_name)
+        content = None
+        start = time.perf_counter()
+        span, span_token = begin_span('llm.provider', provider=provider_name, max_tokens=max_tokens)
+        error = None
         
-        return None
+        try:
+            if provider_name == 'gemini':
+                content = self._generate_with_gemini(prompt, max_tokens)
+            elif provider_name == 'openai':
+                content = self._generate_with_openai(prompt, max_tokens)
+            elif provider_name == 'huggingface':
+                content = self._generate_with_huggingface(prompt, max_tokens)
+            return content
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            completion_tokens = context_packer.estimate_tokens(content or '', provider_name)
+            quota_ledger.record(provider_name, tokens=prompt_tokens + completion_tokens)
+            
+            span.set_attribute('prompt_tokens', prompt_tokens)
+            span.set_attribute('completion_tokens', completion_tokens)
+            end_span(span, span_token, error)
+            
+            llm_request_seconds.observe(time.perf_counter() - start, provider=provider_name)
+            llm_requests_total.inc(provider=provider_name, status='ok' if content else 'error')
+            llm_tokens_total.inc(prompt_tokens, provider=provider_name, kind='prompt')
+            llm_tokens_total.inc(completion_tokens, provider=provider_name, kind='completion')
     
     def _generate_with_gemini(self, prompt: str, max_tokens: int) -> Optional[str]:
         """Gera conteúdo usando Gemini"""
         try:
-            client = self.providers['gemini']['client']
+            client = self._get_client('gemini')
             
             generation_config = {
                 'temperature': 0.7,
@@ -187,12 +304,11 @@ class AIManager:
     def _generate_with_openai(self, prompt: str, max_tokens: int) -> Optional[str]:
         """Gera conteúdo usando OpenAI"""
         try:
-            openai_key = os.getenv("OPENAI_API_KEY")
-            if not openai_key:
-                raise ValueError("OPENAI_API_KEY not found")
-            client = openai.OpenAI(api_key=openai_key)
+            client = self._get_client('openai')
+            if not client:
+                raise ValueError("Cliente OpenAI não inicializado")
             response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
+                model=self.providers['openai']['model'],
                 messages=[
                     {"role": "system", "content": "Você é um especialista em análise de mercado ultra-detalhada."},
                     {"role": "user", "content": prompt}
@@ -220,16 +336,15 @@ class AIManager:
         hf_config = self.providers['huggingface']
         models = hf_config['models']
         
+        hf_client = self._get_client('huggingface')
+        session = hf_client['session']
+        
         # Tenta todos os modelos disponíveis
         for attempt in range(len(models)):
             current_model = models[hf_config['current_model_index']]
             
             try:
-                url = f"{hf_config['client']['base_url']}{current_model}"
-                headers = {
-                    "Authorization": f"Bearer {hf_config['client']['api_key']}",
-                    "Content-Type": "application/json"
-                }
+                url = f"{hf_client['base_url']}{current_model}"
                 
                 payload = {
                     "inputs": prompt,
@@ -246,7 +361,7 @@ class AIManager:
                     }
                 }
                 
-                response = requests.post(url, headers=headers, json=payload, timeout=60)
+                response = session.post(url, json=payload, timeout=self.request_timeout)
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -270,20 +385,34 @@ class AIManager:
                 elif response.status_code == 503:
                     logger.warning(f"⚠️ Modelo {current_model} carregando, tentando próximo...")
                     # Rotaciona para próximo modelo
-                    hf_config['current_model_index'] = (hf_config['current_model_index'] + 1) % len(models)
+                    self._rotate_hf_model(current_model)
                     continue
                 else:
                     logger.warning(f"⚠️ Erro {response.status_code} no modelo {current_model}")
-                    hf_config['current_model_index'] = (hf_config['current_model_index'] + 1) % len(models)
+                    self._rotate_hf_model(current_model)
                     continue
                     
             except Exception as e:
                 logger.warning(f"⚠️ Erro no modelo {current_model}: {str(e)}")
-                hf_config['current_model_index'] = (hf_config['current_model_index'] + 1) % len(models)
+                self._rotate_hf_model(current_model)
                 continue
         
         raise Exception("Todos os modelos HuggingFace falharam")
     
+    def _rotate_hf_model(self, failed_model: str):
+        """Avança para o próximo modelo HuggingFace (apenas se outra thread ainda não avançou)"""
+        hf_config = self.providers['huggingface']
+        models = hf_config['models']
+        
+        with self._lock:
+            if models[hf_config['current_model_index']] == failed_model:
+                hf_config['current_model_index'] = (hf_config['current_model_index'] + 1) % len(models)
+    
+    def _increment_error(self, provider_name: str):
+        """Incrementa contador de erros do provedor de forma thread-safe"""
+        with self._lock:
+            self.providers[provider_name]['error_count'] += 1
+    
     def _try_fallback(self, prompt: str, max_tokens: int, exclude: List[str] = None) -> Optional[str]:
         """Tenta usar provedor de fallback"""
         exclude = exclude or []
@@ -298,18 +427,16 @@ class AIManager:
             if self.providers[provider_name]['error_count'] >= 5:
                 continue
             
+            if not quota_ledger.has_capacity(provider_name, tokens=context_packer.estimate_tokens(prompt, provider_name)):
+                continue
+            
             logger.info(f"🔄 Tentando fallback para: {provider_name}")
             
             try:
-                if provider_name == 'gemini':
-                    return self._generate_with_gemini(prompt, max_tokens)
-                elif provider_name == 'openai':
-                    return self._generate_with_openai(prompt, max_tokens)
-                elif provider_name == 'huggingface':
-                    return self._generate_with_huggingface(prompt, max_tokens)
+                return self._call_provider(provider_name, prompt, max_tokens)
             except Exception as e:
                 logger.warning(f"⚠️ Fallback {provider_name} falhou: {str(e)}")
-                self.providers[provider_name]['error_count'] += 1
+                self._increment_error(provider_name)
                 continue
         
         logger.error("❌ Todos os provedores de fallback falharam")
@@ -324,7 +451,8 @@ class AIManager:
                 'available': provider['available'],
                 'priority': provider['priority'],
                 'error_count': provider['error_count'],
-                'rate_limited': (provider.get('rate_limit_reset') or 0) > time.time()
+                'rate_limited': (provider.get('rate_limit_reset') or 0) > time.time(),
+                'quota': quota_ledger.get_remaining(name).get(name, {})
             }
             
             if name == 'huggingface' and provider['available']:
@@ -335,14 +463,23 @@ class AIManager:
     
     def reset_provider_errors(self, provider_name: str = None):
         """Reset contadores de erro"""
-        if provider_name:
-            if provider_name in self.providers:
-                self.providers[provider_name]['error_count'] = 0
-                logger.info(f"🔄 Reset erros do provedor: {provider_name}")
-        else:
-            for provider in self.providers.values():
-                provider['error_count'] = 0
-            logger.info("🔄 Reset erros de todos os provedores")
+        with self._lock:
+            if provider_name:
+                if provider_name in self.providers:
+                    self.providers[provider_name]['error_count'] = 0
+                    logger.info(f"🔄 Reset erros do provedor: {provider_name}")
+            else:
+                for provider in self.providers.values():
+                    provider['error_count'] = 0
+                logger.info("🔄 Reset erros de todos os provedores")
+    
+    def reset_after_fork(self):
+        """Descarta clientes e locks herdados do master; cada worker cria os seus no primeiro uso"""
+        self._lock = threading.Lock()
+        self._client_lock = threading.Lock()
+        for provider in self.providers.values():
+            provider['client'] = None
 
 # Instância global
 ai_manager = AIManager()
+register_after_fork('ai_manager', ai_manager.reset_after_fork)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Attachment Jobs
+Processamento de anexos em background: o upload é gravado e respondido na hora,
+a extração roda em um pool de threads e o resultado é consultado por job_id
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, ContextManager
+from werkzeug.datastructures import FileStorage
+from services.attachment_service import attachment_service
+from services.metrics import registry
+from services.fork_safety import register_after_fork, process_owner, owner_alive
+from utils.sqlite_utils import ThreadLocalConnections, add_missing_columns
+from utils import json_codec
+
+logger = logging.getLogger(__name__)
+
+attachment_jobs_total = registry.counter(
+    'arqv30_attachment_jobs_total', 'Uploads de anexos por resultado', ('result',)
+)
+
+class AttachmentJobManager:
+    """Recebe uploads, responde reenvios direto do cache de texto e agenda o resto no pool.
+
+    O pool é de threads do worker que recebeu o upload: se ele morrer ou o prazo passar,
+    o job 'processing' é reportado como 'failed'."""
+
+    def __init__(self, cache_dir: str = "cache"):
+        self.max_workers = int(os.getenv('ATTACHMENT_WORKERS', 2))
+        self.retention_seconds = int(os.getenv('ATTACHMENT_JOB_RETENTION_HOURS', 24)) * 3600
+        self.job_timeout = int(os.getenv('ATTACHMENT_JOB_TIMEOUT', 300))
+
+        self.cache_dir = cache_dir
+        self.db_path = os.path.join(cache_dir, "attachment_jobs.db")
+        self._connections = ThreadLocalConnections(self.db_path)
+        self._db_ready = False
+        self._init_lock = threading.Lock()
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        if not self._db_ready:
+            self._init_database()
+        return self._connections.transaction()
+
+    def _init_database(self):
+        """Cria a tabela de jobs e descarta os antigos"""
+        with self._init_lock:
+            if self._db_ready:
+                return
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with self._connections.transaction() as conn:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS attachment_jobs (
+                            job_id TEXT PRIMARY KEY,
+                            session_id TEXT NOT NULL,
+                            filename TEXT NOT NULL,
+                            content_hash TEXT NOT NULL,
+                            status TEXT NOT NULL,
+                            result TEXT,
+                            created_at REAL NOT NULL,
+                            updated_at REAL NOT NULL
+                        )
+                    """)
+                    add_missing_columns(conn, 'attachment_jobs', {'owner': 'TEXT', 'deadline': 'REAL'})
+                    conn.execute("DELETE FROM attachment_jobs WHERE updated_at < ?", (time.time() - self.retention_seconds,))
+                    conn.commit()
+                self._db_ready = True
+            except Exception as e:
+                logger.error(f"Erro ao inicializar tabela de jobs de anexos: {e}")
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='attachment')
+        return self._executor
+
+    def submit(self, file: FileStorage, session_id: str) -> Dict[str, Any]:
+        """Grava o upload (com hash); reenvio conhecido volta concluído, o resto vira job 'processing'"""
+        mime_type, error = attachment_service.validate_upload(file)
+        if error:
+            attachment_jobs_total.inc(result='rejected')
+            return {'success': False, 'status': 'failed', 'error': error}
+
+        saved = attachment_service.save_upload(file, session_id)
+        if not saved:
+            attachment_jobs_total.inc(result='failed')
+            return {'success': False, 'status': 'failed', 'error': 'Erro ao salvar arquivo'}
+
+        file_path, content_hash = saved
+        if attachment_service.get_cached(content_hash, mime_type) is not None:
+            # Reenvio: process_saved_file só monta a resposta a partir do texto em cache
+            attachment_jobs_total.inc(result='deduplicated')
+            result = attachment_service.process_saved_file(file_path, file.filename, mime_type, session_id, content_hash)
+            result['status'] = 'done' if result.get('success') else 'failed'
+            return result
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        registered = False
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO attachment_jobs (job_id, session_id, filename, content_hash, status, owner, deadline, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, 'processing', ?, ?, ?, ?)",
+                    (job_id, session_id, file.filename, content_hash, process_owner(), now + self.job_timeout, now, now)
+                )
+                conn.commit()
+            registered = True
+            self._get_executor().submit(self._run, job_id, file_path, file.filename, mime_type, session_id, content_hash)
+        except Exception as e:
+            # Sem job registrado (ou sem thread para processá-lo) ninguém apagaria o upload gravado
+            logger.error(f"❌ Erro ao agendar anexo {file.filename}: {e}")
+            attachment_service._cleanup_temp_file(file_path)
+            if registered:
+                self._finish(job_id, 'failed', {'success': False, 'error': 'Erro ao agendar processamento'})
+            attachment_jobs_total.inc(result='failed')
+            return {'success': False, 'status': 'failed', 'error': 'Erro ao agendar processamento'}
+
+        logger.info(f"📎 Anexo {file.filename} enfileirado (job {job_id})")
+        return self.get_status(job_id)
+
+    def _run(self, job_id: str, file_path: str, filename: str, mime_type: str, session_id: str, content_hash: str):
+        result = attachment_service.process_saved_file(file_path, filename, mime_type, session_id, content_hash)
+        status = 'done' if result.get('success') else 'failed'
+        attachment_jobs_total.inc(result=status)
+        self._finish(job_id, status, result)
+
+    def _finish(self, job_id: str, status: str, result: Dict[str, Any]) -> bool:
+        """Encerra um job 'processing'; False se ele já tinha sido encerrado (ex.: por tempo esgotado)"""
+        try:
+            with self._connect() as conn:
+                updated = conn.execute(
+                    "UPDATE attachment_jobs SET status = ?, result = ?, updated_at = ? WHERE job_id = ? AND status = 'processing'",
+                    (status, json_codec.dumps(result), time.time(), job_id)
+                ).rowcount
+                conn.commit()
+            return updated > 0
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar resultado do anexo {job_id}: {e}")
+            return False
+
+    def _stale_reason(self, owner: Optional[str], deadline: Optional[float], updated_at: float) -> Optional[str]:
+        # Jobs gravados antes da coluna existir usam o último update como referência
+        if time.time() > (deadline if deadline is not None else updated_at + self.job_timeout):
+            return 'Tempo limite de processamento excedido'
+        if not owner_alive(owner):
+            return 'Worker que recebeu o upload foi encerrado'
+        return None
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status do job; quando concluído, inclui a mesma resposta do upload síncrono"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT session_id, filename, status, result, created_at, updated_at, owner, deadline FROM attachment_jobs WHERE job_id = ?",
+                    (job_id,)
+                ).fetchone()
+        except Exception as e:
+            logger.error(f"Erro ao consultar job de anexo {job_id}: {e}")
+            return None
+
+        if not row:
+            return None
+
+        if row[2] == 'processing':
+            reason = self._stale_reason(row[6], row[7], row[5])
+            if reason and self._finish(job_id, 'failed', {'success': False, 'error': reason}):
+                logger.warning(f"⚠️ Job de anexo {job_id} encerrado: {reason}")
+                attachment_jobs_total.inc(result='expired')
+                return self.get_status(job_id)
+
+        status = {
+            'success': row[2] != 'failed',
+            'job_id': job_id,
+            'session_id': row[0],
+            'filename': row[1],
+            'status': row[2],
+            'created_at': row[4],
+            'updated_at': row[5],
+            'status_url': f"/api/attachment_jobs/{job_id}"
+        }
+        if row[3]:
+            status.update(json_codec.loads(row[3]))
+        return status
+
+    def reset_after_fork(self):
+        """Threads do pool não sobrevivem ao fork"""
+        self._connections.reset_after_fork()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._init_lock = threading.Lock()
+
+# Instância global
+attachment_job_manager = AttachmentJobManager()
+register_after_fork('attachment_job_manager', attachment_job_manager.reset_after_fork)
@@ -6,26 +6,55 @@ Análise inteligente de documentos e arquivos
 """
 
 import os
+import time
+import uuid
+import sqlite3
+import hashlib
 import logging
 import mimetypes
-from typing import Dict, List, Optional, Any, Tuple
+import threading
+from typing import Dict, List, Optional, Any, Tuple, ContextManager
+from collections import Counter
 from werkzeug.datastructures import FileStorage
-import PyPDF2
-import pandas as pd
-from docx import Document
+from werkzeug.utils import secure_filename
 import json
 from datetime import datetime
+from services.fork_safety import register_after_fork
+from utils.sqlite_utils import ThreadLocalConnections
+from utils.keyword_matcher import KeywordMatcher
+from services.pdf_text_extractor import pdf_text_extractor
+from services.tabular_extractor import tabular_extractor
+
+# pypdf/pdfplumber, pandas e python-docx são importados dentro dos extratores, só quando chega um anexo do tipo
 
 logger = logging.getLogger(__name__)
 
 class AttachmentService:
     """Serviço para processamento inteligente de anexos"""
     
-    def __init__(self):
+    # Bloco de leitura do upload: o hash é calculado enquanto o arquivo é gravado
+    UPLOAD_BLOCK_SIZE = 1024 * 1024
+    
+    def __init__(self, cache_dir: str = "cache"):
         """Inicializa serviço de anexos"""
         self.upload_folder = os.path.join(os.path.dirname(__file__), '..', 'uploads')
         os.makedirs(self.upload_folder, exist_ok=True)
         
+        # Texto extraído por hash do conteúdo: reenvios do mesmo arquivo não são extraídos de novo
+        self.cache_enabled = os.getenv('ATTACHMENT_CACHE_ENABLED', 'true').lower() == 'true'
+        self.cache_ttl = int(os.getenv('ATTACHMENT_CACHE_TTL_DAYS', 7)) * 86400
+        
+        # Anexos de cada sessão (índice por session_id apontando para o texto extraído)
+        self.session_ttl = int(os.getenv('ATTACHMENT_SESSION_TTL_HOURS', 24)) * 3600
+        # Limpeza de expirados também durante a vida do worker, não só na inicialização
+        self.prune_interval = int(os.getenv('ATTACHMENT_PRUNE_INTERVAL_MINUTES', 60)) * 60
+        self._last_prune = 0.0
+        self.cache_dir = cache_dir
+        self.db_path = os.path.join(cache_dir, "attachments.db")
+        self._connections = ThreadLocalConnections(self.db_path)
+        self._db_ready = False
+        self._init_lock = threading.Lock()
+        
         # Tipos de arquivo suportados
         self.supported_types = {
             'application/pdf': 'pdf',
@@ -57,71 +86,226 @@ class AttachmentService:
                 'amostra', 'respondente', 'análise', 'insight', 'tendência'
             ]
         }
+        self.persona_characteristics = ['idade', 'gênero', 'renda', 'comportamento', 'interesse']
+        
+        # Todas as listas em uma regex: o texto é percorrido uma única vez por anexo
+        self._keyword_matcher = KeywordMatcher({
+            **self.content_classifiers,
+            'persona': self.persona_characteristics
+        })
+    
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        if not self._db_ready:
+            self._init_database()
+        return self._connections.transaction()
+    
+    def _init_database(self):
+        """Cria as tabelas de textos extraídos e de anexos por sessão e descarta o que expirou"""
+        with self._init_lock:
+            if self._db_ready:
+                return
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with self._connections.transaction() as conn:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS attachment_texts (
+                            cache_key TEXT PRIMARY KEY,
+                            content_type TEXT NOT NULL,
+                            processed_content TEXT NOT NULL,
+                            content_length INTEGER NOT NULL,
+                            created_at REAL NOT NULL,
+                            last_used_at REAL NOT NULL
+                        )
+                    """)
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS session_attachments (
+                            attachment_id TEXT PRIMARY KEY,
+                            session_id TEXT NOT NULL,
+                            cache_key TEXT NOT NULL,
+                            filename TEXT NOT NULL,
+                            mime_type TEXT NOT NULL,
+                            created_at REAL NOT NULL,
+                            expires_at REAL NOT NULL,
+                            UNIQUE (session_id, cache_key)
+                        )
+                    """)
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_session_attachments_expires ON session_attachments (expires_at)")
+                    self._prune(conn)
+                self._db_ready = True
+            except Exception as e:
+                logger.error(f"Erro ao inicializar cache de anexos: {e}")
+    
+    def _prune(self, conn: sqlite3.Connection):
+        """Descarta anexos de sessões expiradas e textos que nenhuma sessão referencia mais"""
+        now = time.time()
+        conn.execute("DELETE FROM session_attachments WHERE expires_at < ?", (now,))
+        # Textos ainda referenciados por alguma sessão ficam até a sessão expirar
+        deleted = conn.execute(
+            "DELETE FROM attachment_texts WHERE last_used_at < ? "
+            "AND cache_key NOT IN (SELECT cache_key FROM session_attachments)",
+            (now - self.cache_ttl,)
+        ).rowcount
+        conn.commit()
+        self._last_prune = now
+        if deleted:
+            logger.info(f"🧹 {deleted} texto(s) de anexos expirados removidos")
+    
+    @staticmethod
+    def _cache_key(content_hash: str, mime_type: str) -> str:
+        # O mesmo conteúdo enviado com outro tipo passa por outro extrator
+        return f"{content_hash}:{mime_type}"
+    
+    def get_cached(self, content_hash: str, mime_type: str) -> Optional[Dict[str, Any]]:
+        """Resultado já extraído para este conteúdo, ou None"""
+        if not self.cache_enabled:
+            return None
+        try:
+            key = self._cache_key(content_hash, mime_type)
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT content_type, processed_content, content_length FROM attachment_texts WHERE cache_key = ?",
+                    (key,)
+                ).fetchone()
+                if row:
+                    conn.execute("UPDATE attachment_texts SET last_used_at = ? WHERE cache_key = ?", (time.time(), key))
+                    conn.commit()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao consultar cache de anexos: {e}")
+            return None
+        
+        if not row:
+            return None
+        return {'content_type': row[0], 'processed_content': row[1], 'content_length': row[2]}
+    
+    def _store_text(self, content_hash: str, mime_type: str, extracted: Dict[str, Any]):
+        """Grava o texto extraído; é gravado mesmo com o cache desligado porque as sessões o referenciam"""
+        try:
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO attachment_texts "
+                    "(cache_key, content_type, processed_content, content_length, created_at, last_used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (self._cache_key(content_hash, mime_type), extracted['content_type'],
+                     extracted['processed_content'], extracted['content_length'], now, now)
+                )
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao gravar cache de anexos: {e}")
+    
+    def _register_session_attachment(self, session_id: str, filename: str, mime_type: str, content_hash: str) -> Optional[str]:
+        """Associa o texto extraído à sessão (reenvio na mesma sessão só renova o prazo); retorna o attachment_id"""
+        try:
+            now = time.time()
+            key = self._cache_key(content_hash, mime_type)
+            with self._connect() as conn:
+                # Workers de longa duração não passam de novo pelo _init_database
+                if now - self._last_prune > self.prune_interval:
+                    self._prune(conn)
+                conn.execute(
+                    "INSERT INTO session_attachments "
+                    "(attachment_id, session_id, cache_key, filename, mime_type, created_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (session_id, cache_key) DO UPDATE SET "
+                    "filename = excluded.filename, created_at = excluded.created_at, expires_at = excluded.expires_at",
+                    (uuid.uuid4().hex, session_id, key, filename, mime_type, now, now + self.session_ttl)
+                )
+                row = conn.execute(
+                    "SELECT attachment_id FROM session_attachments WHERE session_id = ? AND cache_key = ?",
+                    (session_id, key)
+                ).fetchone()
+                conn.commit()
+            return row[0] if row else None
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao registrar anexo na sessão {session_id}: {e}")
+            return None
+    
+    def validate_upload(self, file: FileStorage) -> Tuple[Optional[str], Optional[str]]:
+        """(mime_type, None) se o arquivo é aceito, senão (None, mensagem de erro)"""
+        if not file or not file.filename:
+            return None, 'Arquivo inválido'
+        
+        mime_type = file.content_type or mimetypes.guess_type(file.filename)[0]
+        if mime_type not in self.supported_types:
+            return None, f'Tipo de arquivo não suportado: {mime_type}'
+        
+        return mime_type, None
     
     def process_attachment(
         self, 
         file: FileStorage, 
         session_id: str
     ) -> Dict[str, Any]:
-        """Processa anexo enviado pelo usuário"""
+        """Processa anexo enviado pelo usuário (síncrono; a rota de upload usa attachment_job_manager)"""
         
         try:
             logger.info(f"Processando anexo: {file.filename}")
             
-            # Valida arquivo
-            if not file or not file.filename:
+            mime_type, error = self.validate_upload(file)
+            if error:
                 return {
                     'success': False,
-                    'error': 'Arquivo inválido'
-                }
-            
-            # Verifica tipo de arquivo
-            mime_type = file.content_type or mimetypes.guess_type(file.filename)[0]
-            if mime_type not in self.supported_types:
-                return {
-                    'success': False,
-                    'error': f'Tipo de arquivo não suportado: {mime_type}'
+                    'error': error
                 }
             
             # Salva arquivo temporariamente
-            file_path = self._save_temp_file(file, session_id)
-            if not file_path:
+            saved = self.save_upload(file, session_id)
+            if not saved:
                 return {
                     'success': False,
                     'error': 'Erro ao salvar arquivo'
                 }
             
-            # Extrai conteúdo
-            content = self._extract_content(file_path, mime_type)
-            if not content:
-                return {
-                    'success': False,
-                    'error': 'Erro ao extrair conteúdo'
-                }
-            
-            # Classifica conteúdo
-            content_type = self._classify_content(content)
-            
-            # Processa conteúdo específico
-            processed_content = self._process_specific_content(content, content_type)
-            
-            # Remove arquivo temporário
-            self._cleanup_temp_file(file_path)
+            file_path, content_hash = saved
+            return self.process_saved_file(file_path, file.filename, mime_type, session_id, content_hash)
             
+        except Exception as e:
+            logger.error(f"Erro ao processar anexo: {str(e)}")
             return {
-                'success': True,
-                'message': 'Anexo processado com sucesso',
-                'session_id': session_id,
-                'filename': file.filename,
-                'content_type': content_type,
-                'content_preview': processed_content[:500] + '...' if len(processed_content) > 500 else processed_content,
-                'full_content': processed_content,
-                'metadata': {
-                    'file_size': len(content),
-                    'mime_type': mime_type,
-                    'processed_at': datetime.now().isoformat()
-                }
+                'success': False,
+                'error': f'Erro interno: {str(e)}'
             }
+    
+    def process_saved_file(
+        self,
+        file_path: str,
+        filename: str,
+        mime_type: str,
+        session_id: str,
+        content_hash: str
+    ) -> Dict[str, Any]:
+        """Extrai, classifica e processa um upload já gravado; o arquivo temporário é sempre removido"""
+        
+        try:
+            extracted = self.get_cached(content_hash, mime_type)
+            deduplicated = extracted is not None
+            
+            if extracted is None:
+                # Extrai conteúdo
+                content = self._extract_content(file_path, mime_type)
+                if not content:
+                    return {
+                        'success': False,
+                        'error': 'Erro ao extrair conteúdo'
+                    }
+                
+                # Classifica conteúdo
+                keyword_counts = self._keyword_matcher.count_keywords(content)
+                content_type = self._classify_content(keyword_counts)
+                
+                # Processa conteúdo específico
+                extracted = {
+                    'content_type': content_type,
+                    'processed_content': self._process_specific_content(content, content_type, keyword_counts),
+                    'content_length': len(content)
+                }
+                self._store_text(content_hash, mime_type, extracted)
+            else:
+                logger.info(f"♻️ Anexo {filename} já processado (sha256 {content_hash[:12]}), reutilizando texto extraído")
+            
+            attachment_id = self._register_session_attachment(session_id, filename, mime_type, content_hash)
+            return self.build_result(filename, mime_type, session_id, content_hash, extracted, deduplicated, attachment_id)
             
         except Exception as e:
             logger.error(f"Erro ao processar anexo: {str(e)}")
@@ -129,22 +313,62 @@ class AttachmentService:
                 'success': False,
                 'error': f'Erro interno: {str(e)}'
             }
+        finally:
+            self._cleanup_temp_file(file_path)
+    
+    def build_result(
+        self,
+        filename: str,
+        mime_type: str,
+        session_id: str,
+        content_hash: str,
+        extracted: Dict[str, Any],
+        deduplicated: bool,
+        attachment_id: Optional[str]
+    ) -> Dict[str, Any]:
+        """Resposta do upload a partir do texto extraído; o texto completo fica no servidor, só vai a prévia"""
+        processed_content = extracted['processed_content']
+        return {
+            'success': True,
+            'message': 'Anexo processado com sucesso',
+            'session_id': session_id,
+            'attachment_id': attachment_id,
+            'filename': filename,
+            'content_type': extracted['content_type'],
+            'content_preview': processed_content[:500] + '...' if len(processed_content) > 500 else processed_content,
+            'deduplicated': deduplicated,
+            'metadata': {
+                'file_size': extracted['content_length'],
+                'mime_type': mime_type,
+                'content_hash': content_hash,
+                'processed_at': datetime.now().isoformat()
+            }
+        }
     
-    def _save_temp_file(self, file: FileStorage, session_id: str) -> Optional[str]:
-        """Salva arquivo temporariamente"""
+    def save_upload(self, file: FileStorage, session_id: str) -> Optional[Tuple[str, str]]:
+        """Grava o upload em blocos calculando o sha256 no caminho; retorna (caminho, hash)"""
+        file_path = None
         try:
             # Gera nome único
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{session_id}_{timestamp}_{file.filename}"
+            filename = f"{secure_filename(session_id)}_{timestamp}_{uuid.uuid4().hex[:8]}_{secure_filename(file.filename)}"
             file_path = os.path.join(self.upload_folder, filename)
             
-            # Salva arquivo
-            file.save(file_path)
+            digest = hashlib.sha256()
+            with open(file_path, 'wb') as output:
+                while True:
+                    block = file.stream.read(self.UPLOAD_BLOCK_SIZE)
+                    if not block:
+                        break
+                    digest.update(block)
+                    output.write(block)
             
-            return file_path
+            return file_path, digest.hexdigest()
             
         except Exception as e:
             logger.error(f"Erro ao salvar arquivo: {str(e)}")
+            if file_path:
+                self._cleanup_temp_file(file_path)
             return None
     
     def _extract_content(self, file_path: str, mime_type: str) -> Optional[str]:
@@ -172,17 +396,9 @@ class AttachmentService:
             return None
     
     def _extract_pdf_content(self, file_path: str) -> Optional[str]:
-        """Extrai texto de arquivo PDF"""
+        """Extrai texto de arquivo PDF (páginas em paralelo para documentos longos)"""
         try:
-            content = ""
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    content += page.extract_text() + "\n"
-            
-            return content.strip()
+            return pdf_text_extractor.extract_text(file_path).strip()
             
         except Exception as e:
             logger.error(f"Erro ao extrair PDF: {str(e)}")
@@ -191,6 +407,7 @@ class AttachmentService:
     def _extract_docx_content(self, file_path: str) -> Optional[str]:
         """Extrai texto de arquivo DOCX"""
         try:
+            from docx import Document
             doc = Document(file_path)
             content = ""
             
@@ -204,37 +421,19 @@ class AttachmentService:
             return None
     
     def _extract_excel_content(self, file_path: str) -> Optional[str]:
-        """Extrai dados de arquivo Excel"""
+        """Extrai dados de arquivo Excel (tabelas grandes viram resumo por coluna + amostra)"""
         try:
-            # Lê todas as planilhas
-            excel_file = pd.ExcelFile(file_path)
-            content = ""
-            
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-                content += f"PLANILHA: {sheet_name}\n"
-                content += df.to_string(index=False) + "\n\n"
-            
-            return content.strip()
+            return tabular_extractor.extract_excel(file_path).strip()
             
         except Exception as e:
             logger.error(f"Erro ao extrair Excel: {str(e)}")
             return None
     
     def _extract_csv_content(self, file_path: str) -> Optional[str]:
-        """Extrai dados de arquivo CSV"""
+        """Extrai dados de arquivo CSV (lido em blocos)"""
         try:
-            df = pd.read_csv(file_path, encoding='utf-8')
-            return df.to_string(index=False)
+            return tabular_extractor.extract_csv(file_path)
             
-        except UnicodeDecodeError:
-            # Tenta com encoding latin-1
-            try:
-                df = pd.read_csv(file_path, encoding='latin-1')
-                return df.to_string(index=False)
-            except Exception as e:
-                logger.error(f"Erro ao extrair CSV: {str(e)}")
-                return None
         except Exception as e:
             logger.error(f"Erro ao extrair CSV: {str(e)}")
             return None
@@ -268,17 +467,10 @@ class AttachmentService:
             logger.error(f"Erro ao extrair JSON: {str(e)}")
             return None
     
-    def _classify_content(self, content: str) -> str:
-        """Classifica o tipo de conteúdo baseado em palavras-chave"""
-        content_lower = content.lower()
-        scores = {}
-        
-        # Calcula score para cada categoria
-        for category, keywords in self.content_classifiers.items():
-            score = 0
-            for keyword in keywords:
-                score += content_lower.count(keyword.lower())
-            scores[category] = score
+    def _classify_content(self, keyword_counts: Counter) -> str:
+        """Classifica o tipo de conteúdo pela contagem de palavras-chave (sem diferenciar acentos)"""
+        totals = self._keyword_matcher.group_totals(keyword_counts)
+        scores = {category: totals[category] for category in self.content_classifiers}
         
         # Retorna categoria com maior score
         if scores:
@@ -288,28 +480,25 @@ class AttachmentService:
         
         return 'geral'
     
-    def _process_specific_content(self, content: str, content_type: str) -> str:
+    def _process_specific_content(self, content: str, content_type: str, keyword_counts: Counter) -> str:
         """Processa conteúdo específico baseado no tipo"""
         
         if content_type == 'drivers_mentais':
-            return self._process_mental_drivers(content)
+            return self._process_mental_drivers(content, keyword_counts)
         elif content_type == 'provas_visuais':
             return self._process_visual_proofs(content)
         elif content_type == 'perfis_psicologicos':
-            return self._process_psychological_profiles(content)
+            return self._process_psychological_profiles(content, keyword_counts)
         elif content_type == 'dados_pesquisa':
             return self._process_research_data(content)
         else:
             return self._process_general_content(content)
     
-    def _process_mental_drivers(self, content: str) -> str:
+    def _process_mental_drivers(self, content: str, keyword_counts: Counter) -> str:
         """Processa conteúdo relacionado a gatilhos mentais"""
         processed = "DRIVERS MENTAIS IDENTIFICADOS:\n\n"
         
-        drivers_found = []
-        for driver in self.content_classifiers['drivers_mentais']:
-            if driver.lower() in content.lower():
-                drivers_found.append(driver)
+        drivers_found = self._keyword_matcher.found(keyword_counts, 'drivers_mentais')
         
         if drivers_found:
             processed += f"Gatilhos encontrados: {', '.join(drivers_found)}\n\n"
@@ -334,17 +523,12 @@ class AttachmentService:
         
         return processed
     
-    def _process_psychological_profiles(self, content: str) -> str:
+    def _process_psychological_profiles(self, content: str, keyword_counts: Counter) -> str:
         """Processa perfis psicológicos e personas"""
         processed = "PERFIS PSICOLÓGICOS IDENTIFICADOS:\n\n"
         
         # Busca por características de persona
-        characteristics = []
-        persona_keywords = ['idade', 'gênero', 'renda', 'comportamento', 'interesse']
-        
-        for keyword in persona_keywords:
-            if keyword in content.lower():
-                characteristics.append(keyword)
+        characteristics = self._keyword_matcher.found(keyword_counts, 'persona')
         
         if characteristics:
             processed += f"Características encontradas: {', '.join(characteristics)}\n\n"
@@ -391,31 +575,92 @@ class AttachmentService:
         except Exception as e:
             logger.error(f"Erro ao remover arquivo temporário: {str(e)}")
     
-    def get_session_attachments(self, session_id: str) -> List[Dict[str, Any]]:
-        """Retorna anexos de uma sessão específica"""
-        # Esta função seria implementada com um sistema de cache/banco
-        # Por enquanto retorna lista vazia
-        return []
+    def get_session_attachments(
+        self,
+        session_id: str,
+        include_content: bool = False,
+        attachment_ids: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Anexos ainda válidos de uma sessão, na ordem de envio; com include_content traz o texto processado.
+
+        Com attachment_ids, só os anexos listados (os que a interface ainda mostra)."""
+        if attachment_ids is not None and not attachment_ids:
+            return []
+        
+        content_column = ", t.processed_content" if include_content else ""
+        id_filter = ""
+        params: List[Any] = [session_id, time.time()]
+        if attachment_ids is not None:
+            id_filter = f" AND s.attachment_id IN ({', '.join('?' * len(attachment_ids))})"
+            params.extend(attachment_ids)
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT s.attachment_id, s.filename, s.mime_type, s.cache_key, s.created_at, s.expires_at, "
+                    f"t.content_type, t.content_length{content_column} "
+                    "FROM session_attachments s JOIN attachment_texts t ON t.cache_key = s.cache_key "
+                    f"WHERE s.session_id = ? AND s.expires_at >= ?{id_filter} ORDER BY s.created_at",
+                    params
+                ).fetchall()
+        except Exception as e:
+            logger.error(f"Erro ao consultar anexos da sessão {session_id}: {e}")
+            return []
+        
+        attachments = []
+        for row in rows:
+            attachment = {
+                'attachment_id': row[0],
+                'filename': row[1],
+                'mime_type': row[2],
+                'content_hash': row[3].split(':', 1)[0],
+                'created_at': datetime.fromtimestamp(row[4]).isoformat(),
+                'expires_at': datetime.fromtimestamp(row[5]).isoformat(),
+                'content_type': row[6],
+                'content_length': row[7]
+            }
+            if include_content:
+                attachment['content'] = row[8]
+            attachments.append(attachment)
+        return attachments
+    
+    def remove_session_attachment(self, session_id: str, attachment_id: str) -> bool:
+        """Tira um anexo da sessão; o texto continua no cache por hash"""
+        try:
+            with self._connect() as conn:
+                deleted = conn.execute(
+                    "DELETE FROM session_attachments WHERE session_id = ? AND attachment_id = ?",
+                    (session_id, attachment_id)
+                ).rowcount
+                conn.commit()
+            return deleted > 0
+        except Exception as e:
+            logger.error(f"Erro ao remover anexo {attachment_id}: {e}")
+            return False
     
     def process_text_file(self, file_path: str) -> Optional[str]:
         """Processa arquivo de texto simples"""
         return self._extract_text_content(file_path)
     
     def clear_session_attachments(self, session_id: str) -> bool:
-        """Remove anexos de uma sessão"""
+        """Remove anexos de uma sessão (consulta pelo índice da sessão; os uploads temporários já são
+        apagados ao fim do processamento)"""
         try:
-            # Remove arquivos temporários da sessão
-            for filename in os.listdir(self.upload_folder):
-                if filename.startswith(session_id):
-                    file_path = os.path.join(self.upload_folder, filename)
-                    os.remove(file_path)
+            with self._connect() as conn:
+                deleted = conn.execute("DELETE FROM session_attachments WHERE session_id = ?", (session_id,)).rowcount
+                conn.commit()
             
+            logger.info(f"🧹 {deleted} anexo(s) removido(s) da sessão {session_id}")
             return True
             
         except Exception as e:
             logger.error(f"Erro ao limpar anexos da sessão: {str(e)}")
             return False
 
+    def reset_after_fork(self):
+        self._connections.reset_after_fork()
+        self._init_lock = threading.Lock()
+
 # Instância global do serviço
 attachment_service = AttachmentService()
+register_after_fork('attachment_service', attachment_service.reset_after_fork)
 
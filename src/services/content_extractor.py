@@ -13,6 +13,9 @@ from typing import Optional, Dict, Any
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
 import re
+from services.stub_providers import resolve_url
+from services.metrics import extraction_attempts_total, extraction_seconds
+from services.tracing import begin_span, end_span
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +25,7 @@ class ContentExtractor:
     def __init__(self):
         """Inicializa o extrator de conteúdo"""
         self.jina_api_key = os.getenv('JINA_API_KEY')
-        self.jina_reader_url = "https://r.jina.ai/"
+        self.jina_reader_url = resolve_url("https://r.jina.ai/")
         
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -53,8 +56,14 @@ class ContentExtractor:
         
         # Tenta cada estratégia em ordem de prioridade
         for strategy in self.extraction_strategies:
+            if strategy == 'jina_reader' and not self.jina_api_key:
+                continue
+            
+            start = time.perf_counter()
+            result = 'empty'
+            span, span_token = begin_span('extract.strategy', strategy=strategy, url=url)
             try:
-                if strategy == 'jina_reader' and self.jina_api_key:
+                if strategy == 'jina_reader':
                     content = self._extract_with_jina(url)
                 elif strategy == 'direct_extraction':
                     content = self._extract_direct(url)
@@ -66,12 +75,20 @@ class ContentExtractor:
                     continue
                 
                 if content and len(content) > 100:  # Conteúdo substancial
+                    result = 'success'
                     logger.info(f"✅ Conteúdo extraído com {strategy}: {len(content)} caracteres")
                     return content
                     
             except Exception as e:
+                result = 'error'
+                span.set_error(str(e))
                 logger.warning(f"⚠️ Estratégia {strategy} falhou para {url}: {str(e)}")
                 continue
+            finally:
+                span.set_attribute('result', result)
+                end_span(span, span_token)
+                extraction_seconds.observe(time.perf_counter() - start, strategy=strategy)
+                extraction_attempts_total.inc(strategy=strategy, result=result)
         
         logger.error(f"❌ Todas as estratégias falharam para {url}")
         return None
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Context Packer
+Empacotamento do contexto de pesquisa dentro de um orçamento de tokens
+"""
+
+import os
+import re
+import math
+import logging
+import unicodedata
+from typing import Dict, List, Optional, Any, Set
+
+logger = logging.getLogger(__name__)
+
+# Palavras muito frequentes em português que não ajudam no ranking
+STOPWORDS = {
+    'que', 'para', 'com', 'uma', 'por', 'mais', 'como', 'dos', 'das', 'nos', 'nas',
+    'seu', 'sua', 'seus', 'suas', 'entre', 'sobre', 'quando', 'muito', 'tambem',
+    'pela', 'pelo', 'pelos', 'pelas', 'isso', 'esta', 'este', 'essa', 'esse', 'ser',
+    'tem', 'sao', 'foi', 'ate', 'nao', 'mas', 'ele', 'ela', 'eles', 'elas', 'aos',
+    'the', 'and', 'for', 'with', 'from', 'this', 'that'
+}
+
+class ContextPacker:
+    """Seleciona os trechos de pesquisa mais relevantes dentro de um orçamento de tokens"""
+
+    def __init__(self):
+        """Inicializa o empacotador de contexto"""
+        # Caracteres por token observados em textos em português por provedor
+        self.chars_per_token = {
+            'gemini': 3.6,
+            'openai': 3.2,
+            'huggingface': 3.0
+        }
+        self.default_chars_per_token = 3.2
+
+        # Orçamento de tokens do contexto de pesquisa por provedor
+        self.provider_budgets = {
+            'gemini': int(os.getenv('CONTEXT_TOKEN_BUDGET_GEMINI', os.getenv('CONTEXT_TOKEN_BUDGET', 3500))),
+            'openai': int(os.getenv('CONTEXT_TOKEN_BUDGET_OPENAI', 1800)),
+            'huggingface': int(os.getenv('CONTEXT_TOKEN_BUDGET_HUGGINGFACE', 600))
+        }
+        self.default_budget = int(os.getenv('CONTEXT_TOKEN_BUDGET', 3500))
+
+        # Fração do orçamento reservada aos anexos da sessão (o que sobrar volta para a pesquisa)
+        self.attachment_share = float(os.getenv('CONTEXT_ATTACHMENT_SHARE', 0.4))
+
+        self.passage_chars = int(os.getenv('CONTEXT_PASSAGE_CHARS', 700))
+        self.dedup_threshold = float(os.getenv('CONTEXT_DEDUP_THRESHOLD', 0.6))
+
+        # Peso de cada campo da requisição no ranking
+        self.field_weights = {
+            'segmento': 3.0,
+            'produto': 2.5,
+            'query': 2.0,
+            'publico': 2.0,
+            'concorrentes': 1.5,
+            'dados_adicionais': 1.0
+        }
+
+        logger.info("Context Packer inicializado")
+
+    def estimate_tokens(self, text: str, provider: Optional[str] = None) -> int:
+        """Estima número de tokens de um texto para o provedor"""
+        if not text:
+            return 0
+        ratio = self.chars_per_token.get(provider, self.default_chars_per_token)
+        return int(math.ceil(len(text) / ratio))
+
+    def get_budget(self, provider: Optional[str] = None) -> int:
+        """Retorna orçamento de tokens do contexto para o provedor"""
+        return self.provider_budgets.get(provider, self.default_budget)
+
+    def pack_research_context(
+        self,
+        data: Dict[str, Any],
+        extracted_content: List[Dict[str, Any]],
+        search_results: List[Any],
+        provider: Optional[str] = None,
+        token_budget: Optional[int] = None,
+        title: str = "PESQUISA MASSIVA REALIZADA"
+    ) -> str:
+        """Monta contexto de pesquisa com os trechos mais valiosos que cabem no orçamento"""
+
+        budget = token_budget or self.get_budget(provider)
+        query_terms = self._build_query_terms(data)
+
+        passages = self._build_passages(extracted_content, search_results)
+        if not passages:
+            return ""
+
+        self._score_passages(passages, query_terms)
+        selected = self._select_passages(passages, budget, provider)
+
+        context = self._render_context(selected, title, len(search_results or []))
+
+        logger.info(
+            f"📦 Contexto empacotado: {len(selected)}/{len(passages)} trechos, "
+            f"~{self.estimate_tokens(context, provider)} tokens (orçamento {budget}, provedor {provider or 'padrão'})"
+        )
+
+        return context
+
+    def pack_analysis_context(
+        self,
+        data: Dict[str, Any],
+        attachments: List[Dict[str, Any]],
+        extracted_content: List[Dict[str, Any]],
+        search_results: List[Any],
+        provider: Optional[str] = None,
+        title: str = "PESQUISA MASSIVA REALIZADA"
+    ) -> str:
+        """Anexos da sessão (até attachment_share do orçamento) seguidos da pesquisa no orçamento restante"""
+
+        budget = self.get_budget(provider)
+        attachment_context = ""
+
+        if attachments:
+            attachment_context = self.pack_research_context(
+                data,
+                [
+                    {'title': attachment['filename'], 'url': f"anexo://{attachment['filename']}", 'content': attachment['content']}
+                    for attachment in attachments
+                ],
+                [],
+                provider=provider,
+                token_budget=max(int(budget * self.attachment_share), 1),
+                title="ANEXOS ENVIADOS PELO USUÁRIO"
+            )
+            budget = max(budget - self.estimate_tokens(attachment_context, provider), 1)
+
+        research_context = self.pack_research_context(
+            data, extracted_content, search_results, provider=provider, token_budget=budget, title=title
+        )
+        return "\n\n".join(part for part in (attachment_context, research_context) if part)
+
+    def _normalize(self, text: str) -> str:
+        """Minúsculas sem acentos para comparação"""
+        text = unicodedata.normalize('NFKD', text.lower())
+        return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+    def _tokenize(self, text: str) -> List[str]:
+        """Quebra texto em termos relevantes"""
+        return [
+            word for word in re.findall(r'\w{3,}', self._normalize(text))
+            if word not in STOPWORDS
+        ]
+
+    def _build_query_terms(self, data: Dict[str, Any]) -> Dict[str, float]:
+        """Extrai termos ponderados dos campos da requisição"""
+        terms = {}
+        for field, weight in self.field_weights.items():
+            value = data.get(field)
+            if not value:
+                continue
+            for term in self._tokenize(str(value)):
+                terms[term] = max(terms.get(term, 0.0), weight)
+        return terms
+
+    def _split_text(self, text: str) -> List[str]:
+        """Divide texto em trechos de tamanho aproximado a passage_chars"""
+        chunks = []
+        current = ""
+
+        for paragraph in re.split(r'\n+', text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+
+            # Parágrafos enormes são quebrados por frases
+            while len(paragraph) > self.passage_chars:
+                cut = paragraph.rfind('. ', 0, self.passage_chars)
+                cut = cut + 1 if cut > self.passage_chars // 3 else self.passage_chars
+                if current:
+                    chunks.append(current)
+                    current = ""
+                chunks.append(paragraph[:cut].strip())
+                paragraph = paragraph[cut:].strip()
+
+            if current and len(current) + len(paragraph) + 1 > self.passage_chars:
+                chunks.append(current)
+                current = paragraph
+            else:
+                current = f"{current}\n{paragraph}" if current else paragraph
+
+        if current:
+            chunks.append(current)
+
+        return chunks
+
+    def _build_passages(
+        self,
+        extracted_content: List[Dict[str, Any]],
+        search_results: List[Any]
+    ) -> List[Dict[str, Any]]:
+        """Converte páginas extraídas e snippets em trechos candidatos"""
+        passages = []
+
+        for source_index, item in enumerate(extracted_content or []):
+            for position, chunk in enumerate(self._split_text(item.get('content') or '')):
+                passages.append({
+                    'kind': 'page',
+                    'source_index': source_index,
+                    'position': position,
+                    'title': item.get('title', ''),
+                    'url': item.get('url', ''),
+                    'query': item.get('query') or item.get('context_query'),
+                    'text': chunk
+                })
+
+        for result in search_results or []:
+            # Aceita dicts e objetos SearchResult
+            get = result.get if isinstance(result, dict) else lambda key, default='': getattr(result, key, default)
+            snippet = (get('snippet', '') or '').strip()
+            if not snippet:
+                continue
+            passages.append({
+                'kind': 'snippet',
+                'source_index': None,
+                'position': 0,
+                'title': get('title', ''),
+                'url': get('url', ''),
+                'query': None,
+                'text': snippet[:300]
+            })
+
+        return passages
+
+    def _score_passages(self, passages: List[Dict[str, Any]], query_terms: Dict[str, float]):
+        """Pontua trechos por relevância (TF-IDF ponderado pelos campos da requisição)"""
+        document_frequency = {}
+
+        for passage in passages:
+            terms = self._tokenize(f"{passage['title']} {passage['text']}")
+            passage['terms'] = terms
+            for term in set(terms):
+                if term in query_terms:
+                    document_frequency[term] = document_frequency.get(term, 0) + 1
+
+        total = len(passages)
+
+        for passage in passages:
+            counts = {}
+            for term in passage['terms']:
+                if term in query_terms:
+                    counts[term] = counts.get(term, 0) + 1
+
+            score = 0.0
+            for term, count in counts.items():
+                idf = math.log(1 + total / document_frequency[term])
+                score += query_terms[term] * idf * (1 + math.log(count))
+
+            # Normaliza pelo tamanho para não favorecer trechos longos
+            score /= math.sqrt(max(len(passage['terms']), 1))
+
+            # Cobertura: trechos que citam vários campos valem mais
+            score *= 1 + 0.25 * len(counts)
+
+            # Dados numéricos são evidência valiosa para a análise
+            if re.search(r'\d+(?:[.,]\d+)?\s*(?:%|mil|milh|bilh|R\$)', passage['text']):
+                score *= 1.2
+
+            passage['score'] = score
+
+    def _shingles(self, terms: List[str], size: int = 4) -> Set[int]:
+        """Conjunto de shingles de palavras para detectar quase-duplicatas"""
+        if len(terms) < size:
+            return {hash(' '.join(terms))}
+        return {hash(' '.join(terms[i:i + size])) for i in range(len(terms) - size + 1)}
+
+    def _select_passages(
+        self,
+        passages: List[Dict[str, Any]],
+        budget: int,
+        provider: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """Preenche o orçamento de forma gulosa, descartando quase-duplicatas"""
+        ranked = sorted(passages, key=lambda p: p['score'], reverse=True)
+        selected = []
+        selected_shingles = []
+        remaining = budget
+
+        for passage in ranked:
+            cost = self.estimate_tokens(passage['text'], provider) + 12  # cabeçalho da fonte
+            if cost > remaining:
+                continue
+
+            shingles = self._shingles(passage['terms'])
+            is_duplicate = any(
+                len(shingles & other) / len(shingles | other) >= self.dedup_threshold
+                for other in selected_shingles
+            )
+            if is_duplicate:
+                continue
+
+            selected.append(passage)
+            selected_shingles.append(shingles)
+            remaining -= cost
+
+            if remaining < 40:
+                break
+
+        return selected
+
+    def _render_context(self, selected: List[Dict[str, Any]], title: str, total_results: int) -> str:
+        """Formata trechos selecionados agrupando por fonte"""
+        pages = {}
+        page_order = []
+        snippets = []
+
+        for passage in selected:
+            if passage['kind'] == 'snippet':
+                snippets.append(passage)
+                continue
+            key = passage['source_index']
+            if key not in pages:
+                pages[key] = []
+                page_order.append(key)
+            pages[key].append(passage)
+
+        parts = [f"{title}:\n"]
+
+        for i, key in enumerate(page_order, 1):
+            source_passages = sorted(pages[key], key=lambda p: p['position'])
+            first = source_passages[0]
+            parts.append(f"--- FONTE {i}: {first['title']} ---")
+            parts.append(f"URL: {first['url']}")
+            if first.get('query'):
+                parts.append(f"Query: {first['query']}")
+            parts.append("Conteúdo: " + "\n[...]\n".join(p['text'] for p in source_passages))
+            parts.append("")
+
+        if snippets:
+            parts.append(f"RESUMO DOS RESULTADOS ({total_results} fontes):")
+            for passage in snippets:
+                parts.append(f"• {passage['title']} - {passage['text']}")
+
+        return "\n".join(parts).strip()
+
+# Instância global
+context_packer = ContextPacker()
@@ -15,6 +15,7 @@ import json
 from datetime import datetime
 from bs4 import BeautifulSoup
 import re
+from services.stub_providers import resolve_url, polite_delay
 
 logger = logging.getLogger(__name__)
 
@@ -28,8 +29,8 @@ class DeepSearchService:
         self.google_cse_id = os.getenv('GOOGLE_CSE_ID')
         
         # URLs das APIs REAIS
-        self.google_search_url = "https://www.googleapis.com/customsearch/v1"
-        self.jina_reader_url = "https://r.jina.ai/"
+        self.google_search_url = resolve_url("https://www.googleapis.com/customsearch/v1")
+        self.jina_reader_url = resolve_url("https://r.jina.ai/")
         
         # Headers REAIS para requisições
         self.headers = {
@@ -63,19 +64,19 @@ class DeepSearchService:
                 logger.info("🌐 Executando Google Custom Search REAL...")
                 google_results = self._google_search_real(query, max_results // 2)
                 search_results.extend(google_results)
-                time.sleep(1)  # Rate limiting
+                polite_delay(1)  # Rate limiting
             
             # 2. BUSCA REAL COM BING
             logger.info("🔍 Executando Bing Search REAL...")
             bing_results = self._bing_search_real(query, max_results // 3)
             search_results.extend(bing_results)
-            time.sleep(1)
+            polite_delay(1)
             
             # 3. BUSCA REAL COM DUCKDUCKGO
             logger.info("🦆 Executando DuckDuckGo Search REAL...")
             ddg_results = self._duckduckgo_search_real(query, max_results // 3)
             search_results.extend(ddg_results)
-            time.sleep(1)
+            polite_delay(1)
             
             # 4. EXTRAI CONTEÚDO REAL DAS PÁGINAS ENCONTRADAS
             content_results = []
@@ -92,7 +93,7 @@ class DeepSearchService:
                         'relevance_score': self._calculate_real_relevance(content, query, context_data),
                         'source_engine': result.get('source', 'unknown')
                     })
-                    time.sleep(0.5)  # Rate limiting
+                    polite_delay(0.5)  # Rate limiting
             
             # 5. PROCESSA COM ANÁLISE REAL
             processed_content = self._process_real_content(query, context_data, content_results)
@@ -158,7 +159,7 @@ class DeepSearchService:
         """Busca REAL usando Bing"""
         
         try:
-            search_url = f"https://www.bing.com/search?q={quote_plus(query)}&cc=br&setlang=pt-br&count={max_results}"
+            search_url = resolve_url(f"https://www.bing.com/search?q={quote_plus(query)}&cc=br&setlang=pt-br&count={max_results}")
             
             response = requests.get(
                 search_url,
@@ -203,7 +204,7 @@ class DeepSearchService:
         """Busca REAL usando DuckDuckGo"""
         
         try:
-            search_url = f"https://html.duckduckgo.com/html/?q={quote_plus(query)}"
+            search_url = resolve_url(f"https://html.duckduckgo.com/html/?q={quote_plus(query)}")
             
             response = requests.get(
                 search_url,
@@ -17,6 +17,11 @@ from services.content_extractor import content_extractor
 from services.ultra_detailed_analysis_engine import ultra_detailed_analysis_engine
 from services.mental_drivers_architect import mental_drivers_architect
 from services.future_prediction_engine import future_prediction_engine
+from services.context_packer import context_packer
+from services.attachment_service import attachment_service
+from services.phase_timing import record_phase
+from services.tracing import traced
+from services.metrics import timed, engine_method_seconds
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +39,8 @@ class EnhancedAnalysisEngine:
         
         logger.info(f"Enhanced Analysis Engine inicializado - Sistemas: {self.systems_enabled}")
     
+    @timed(engine_method_seconds, method='generate_comprehensive_analysis')
+    @traced('engine.generate_comprehensive_analysis')
     def generate_comprehensive_analysis(
         self, 
         data: Dict[str, Any],
@@ -55,19 +62,21 @@ class EnhancedAnalysisEngine:
             # Adiciona drivers mentais customizados
             logger.info("🧠 Gerando drivers mentais customizados...")
             if gigantic_analysis.get("avatar_ultra_detalhado"):
-                mental_drivers = mental_drivers_architect.generate_complete_drivers_system(
-                    gigantic_analysis["avatar_ultra_detalhado"], 
-                    data
-                )
+                with record_phase('drivers'):
+                    mental_drivers = mental_drivers_architect.generate_complete_drivers_system(
+                        gigantic_analysis["avatar_ultra_detalhado"], 
+                        data
+                    )
                 gigantic_analysis["drivers_mentais_sistema_completo"] = mental_drivers
             
             # Adiciona predições do futuro
             logger.info("🔮 Gerando predições do futuro...")
-            future_predictions = future_prediction_engine.predict_market_future(
-                data.get("segmento", "negócios"), 
-                data, 
-                horizon_months=60
-            )
+            with record_phase('predictions'):
+                future_predictions = future_prediction_engine.predict_market_future(
+                    data.get("segmento", "negócios"), 
+                    data, 
+                    horizon_months=60
+                )
             gigantic_analysis["predicoes_futuro_completas"] = future_predictions
             
             end_time = time.time()
@@ -97,6 +106,7 @@ class EnhancedAnalysisEngine:
             logger.error(f"❌ Erro na análise abrangente: {str(e)}", exc_info=True)
             return self._generate_fallback_analysis(data, str(e))
     
+    @timed(engine_method_seconds, method='_collect_comprehensive_data')
     def _collect_comprehensive_data(
         self, 
         data: Dict[str, Any], 
@@ -109,20 +119,29 @@ class EnhancedAnalysisEngine:
             "extracted_content": [],
             "market_intelligence": {},
             "sources": [],
+            "attachments": [],
             "total_content_length": 0
         }
         
+        # 0. Anexos processados da sessão, lidos direto do armazenamento de anexos
+        if session_id:
+            research_data["attachments"] = attachment_service.get_session_attachments(
+                session_id, include_content=True, attachment_ids=data.get('attachment_ids')
+            )
+        
         # 1. Pesquisa web com múltiplos provedores
         if self.systems_enabled['search_manager'] and data.get('query'):
             logger.info("🌐 Executando pesquisa web com múltiplos provedores...")
             try:
                 # Busca com múltiplos provedores
-                search_results = production_search_manager.search_with_fallback(data['query'], max_results=20)
+                with record_phase('search', query=data['query']):
+                    search_results = production_search_manager.search_with_fallback(data['query'], max_results=20)
                 research_data["search_results"] = search_results
                 
                 # Extrai conteúdo das páginas encontradas
                 for result in search_results[:15]:  # Top 15 resultados
-                    content = content_extractor.extract_content(result['url'])
+                    with record_phase('extraction', url=result['url']):
+                        content = content_extractor.extract_content(result['url'])
                     if content:
                         research_data["extracted_content"].append({
                             'url': result['url'],
@@ -150,12 +169,14 @@ class EnhancedAnalysisEngine:
                 ]
                 
                 for query in contextual_queries:
-                    context_results = production_search_manager.search_with_fallback(query, max_results=5)
+                    with record_phase('search', query=query):
+                        context_results = production_search_manager.search_with_fallback(query, max_results=5)
                     research_data["search_results"].extend(context_results)
                     
                     # Extrai conteúdo adicional
                     for result in context_results[:3]:
-                        content = content_extractor.extract_content(result['url'])
+                        with record_phase('extraction', url=result['url']):
+                            content = content_extractor.extract_content(result['url'])
                         if content:
                             research_data["extracted_content"].append({
                                 'url': result['url'],
@@ -172,6 +193,7 @@ class EnhancedAnalysisEngine:
         
         return research_data
     
+    @timed(engine_method_seconds, method='_perform_comprehensive_ai_analysis')
     def _perform_comprehensive_ai_analysis(
         self, 
         data: Dict[str, Any], 
@@ -183,34 +205,26 @@ class EnhancedAnalysisEngine:
             raise Exception("AI Manager não disponível - configure pelo menos uma API de IA")
         
         try:
-            # Prepara contexto de pesquisa
-            search_context = ""
-            
-            # Combina conteúdo extraído
-            if research_data.get("extracted_content"):
-                search_context += "PESQUISA PROFUNDA REALIZADA:\n\n"
-                
-                for i, content_item in enumerate(research_data["extracted_content"][:10], 1):
-                    search_context += f"--- FONTE {i}: {content_item['title']} ---\n"
-                    search_context += f"URL: {content_item['url']}\n"
-                    search_context += f"Conteúdo: {content_item['content'][:1500]}\n\n"
-            
-            # Adiciona informações dos resultados de busca
-            if research_data.get("search_results"):
-                search_context += f"RESULTADOS DE BUSCA ({len(research_data['search_results'])} fontes):\n"
-                for result in research_data["search_results"][:15]:
-                    search_context += f"• {result['title']} - {result['snippet'][:200]}\n"
-                search_context += "\n"
+            # Prepara contexto de pesquisa dentro do orçamento de tokens do provedor
+            search_context = context_packer.pack_analysis_context(
+                data,
+                research_data.get("attachments", []),
+                research_data.get("extracted_content", []),
+                research_data.get("search_results", []),
+                provider=ai_manager.get_best_provider(),
+                title="PESQUISA PROFUNDA REALIZADA"
+            )
             
             # Constrói prompt ultra-detalhado
             prompt = self._build_comprehensive_analysis_prompt(data, search_context)
             
             # Executa análise com AI Manager (sistema de fallback automático)
             logger.info("🤖 Executando análise com AI Manager...")
-            ai_response = ai_manager.generate_analysis(
-                prompt,
-                max_tokens=8192
-            )
+            with record_phase('llm'):
+                ai_response = ai_manager.generate_analysis(
+                    prompt,
+                    max_tokens=8192
+                )
             
             if ai_response:
                 # Processa resposta da IA
@@ -244,7 +258,7 @@ Você é o DIRETOR SUPREMO DE ANÁLISE DE MERCADO, um especialista de elite com
 - **Dados Adicionais**: {data.get('dados_adicionais', 'Não informado')}
 
 ## CONTEXTO DE PESQUISA REAL:
-{search_context[:12000] if search_context else "Nenhuma pesquisa realizada"}
+{search_context or "Nenhuma pesquisa realizada"}
 
 ## INSTRUÇÕES CRÍTICAS:
 
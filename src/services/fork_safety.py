@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Fork Safety
+Protocolo de reinicialização pós-fork para o preload do gunicorn
+"""
+
+import os
+import gc
+import socket
+import logging
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Processo em que os hooks pós-fork já rodaram (ou o que importou o módulo)
+_last_reset_pid = os.getpid()
+
+_after_fork_hooks: List[Tuple[str, Callable[[], None]]] = []
+_before_fork_hooks: List[Tuple[str, Callable[[], None]]] = []
+_worker_tasks: List[Tuple[str, Callable[[], None]]] = []
+
+def register_after_fork(name: str, callback: Callable[[], None]):
+    """Registra callback que recria locks, clientes e pools no processo filho"""
+    _after_fork_hooks.append((name, callback))
+
+def register_before_fork(name: str, callback: Callable[[], None]):
+    """Registra callback executado uma vez no master antes dos forks (ex.: materializar tabelas estáticas)"""
+    _before_fork_hooks.append((name, callback))
+
+def is_preloading_master() -> bool:
+    """True no master do gunicorn com preload_app (o gunicorn.conf.py exporta o pid do master)"""
+    return os.getenv('GUNICORN_PRELOAD_PID') == str(os.getpid())
+
+def call_in_worker(name: str, func: Callable[[], None]):
+    """Executa agora ou, no master com preload, adia para o início de cada worker"""
+    if is_preloading_master():
+        _worker_tasks.append((name, func))
+        logger.info(f"⏳ {name} adiado para depois do fork dos workers")
+        return
+    func()
+
+def process_owner() -> str:
+    """Dono (host:pid) gravado em jobs que só o processo atual pode concluir"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def owner_alive(owner: Optional[str]) -> bool:
+    """False só quando o dono é deste host e o processo já não existe; de outro host não dá para saber"""
+    if not owner:
+        return True
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # PermissionError: o processo existe, só pertence a outro usuário
+        return True
+    return True
+
+def reinit_after_fork():
+    """Executa os hooks pós-fork uma única vez por processo filho"""
+    global _last_reset_pid
+    pid = os.getpid()
+    if pid == _last_reset_pid:
+        return
+    _last_reset_pid = pid
+
+    for name, callback in _after_fork_hooks:
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"❌ Erro ao reinicializar {name} após fork: {e}")
+
+def prepare_for_fork():
+    """Chamado no master após o preload: materializa dados estáticos e congela o heap no GC"""
+    for name, callback in _before_fork_hooks:
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao preparar {name} para o fork: {e}")
+
+    # Objetos congelados não são varridos pelo GC nos workers, preservando o copy-on-write
+    gc.collect()
+    gc.freeze()
+    logger.info(f"🧊 Heap do master congelado para os forks ({gc.get_freeze_count()} objetos)")
+
+def start_worker():
+    """Chamado no post_fork do gunicorn: garante os hooks e executa as tarefas adiadas"""
+    reinit_after_fork()
+
+    for name, func in _worker_tasks:
+        try:
+            func()
+        except Exception as e:
+            logger.error(f"❌ Erro ao executar {name} no worker: {e}")
+
+# Cobre também forks fora do gunicorn (multiprocessing, pools de processos)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reinit_after_fork)
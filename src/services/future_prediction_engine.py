@@ -6,10 +6,13 @@ Sistema que praticamente prevê o futuro baseado em dados reais e IA avançada
 """
 
 import logging
+from functools import cached_property
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 import json
 import re
+from services.metrics import timed, engine_method_seconds
+from services.fork_safety import register_before_fork
 
 logger = logging.getLogger(__name__)
 
@@ -17,12 +20,21 @@ class FuturePredictionEngine:
     """Motor de Predição do Futuro - Análise Preditiva Ultra-Avançada"""
     
     def __init__(self):
-        """Inicializa o motor de predição"""
-        self.prediction_models = self._load_prediction_models()
-        self.market_indicators = self._load_market_indicators()
-        self.trend_patterns = self._load_trend_patterns()
+        """Inicializa o motor de predição (tabelas carregadas no primeiro uso)"""
         logger.info("Future Prediction Engine inicializado")
     
+    @cached_property
+    def prediction_models(self) -> Dict[str, Any]:
+        return self._load_prediction_models()
+    
+    @cached_property
+    def market_indicators(self) -> Dict[str, Any]:
+        return self._load_market_indicators()
+    
+    @cached_property
+    def trend_patterns(self) -> Dict[str, Any]:
+        return self._load_trend_patterns()
+    
     def _load_prediction_models(self) -> Dict[str, Any]:
         """Carrega modelos de predição"""
         return {
@@ -98,6 +110,7 @@ class FuturePredictionEngine:
             }
         }
     
+    @timed(engine_method_seconds, method='predict_market_future')
     def predict_market_future(
         self, 
         segmento: str, 
@@ -1010,5 +1023,10 @@ class FuturePredictionEngine:
             ]
         }
 
+    def load_static_tables(self):
+        """Carrega modelos de predição, indicadores e padrões de tendência de uma vez"""
+        return self.prediction_models, self.market_indicators, self.trend_patterns
+
 # Instância global
-future_prediction_engine = FuturePredictionEngine()
\ No newline at end of file
+future_prediction_engine = FuturePredictionEngine()
+register_before_fork('future_prediction_engine', future_prediction_engine.load_static_tables)
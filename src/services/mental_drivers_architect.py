@@ -6,8 +6,11 @@ Arquiteto de Drivers Mentais Ultra-Avançado
 """
 
 import logging
+from functools import cached_property
 from typing import Dict, List, Any, Optional
 from datetime import datetime
+from services.metrics import timed, engine_method_seconds
+from services.fork_safety import register_before_fork
 
 logger = logging.getLogger(__name__)
 
@@ -16,8 +19,12 @@ class MentalDriversArchitect:
     
     def __init__(self):
         """Inicializa o arquiteto de drivers mentais"""
-        self.universal_drivers = self._load_universal_drivers()
-        logger.info(f"Mental Drivers Architect inicializado com {len(self.universal_drivers)} drivers universais")
+        logger.info("Mental Drivers Architect inicializado (drivers universais carregados no primeiro uso)")
+    
+    @cached_property
+    def universal_drivers(self) -> Dict[str, Any]:
+        """Tabela de drivers universais, montada no primeiro acesso"""
+        return self._load_universal_drivers()
     
     def _load_universal_drivers(self) -> Dict[str, Any]:
         """Carrega drivers mentais universais"""
@@ -461,6 +468,7 @@ class MentalDriversArchitect:
             }
         }
     
+    @timed(engine_method_seconds, method='generate_complete_drivers_system')
     def generate_complete_drivers_system(
         self, 
         avatar_data: Dict[str, Any], 
@@ -775,5 +783,10 @@ class MentalDriversArchitect:
             }
         }
 
+    def load_static_tables(self):
+        """Carrega o catálogo de drivers universais (chamado no master antes do fork)"""
+        return self.universal_drivers
+
 # Instância global
-mental_drivers_architect = MentalDriversArchitect()
\ No newline at end of file
+mental_drivers_architect = MentalDriversArchitect()
+register_before_fork('mental_drivers_architect', mental_drivers_architect.load_static_tables)
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Metrics
+Contadores, histogramas e gauges no formato Prometheus agregados entre workers
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+import functools
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any, Tuple, Callable, Iterator
+from services.fork_safety import register_after_fork
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem flock; fora do gunicorn há um único processo
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+# Buckets em segundos: de chamadas de cache (ms) até análises completas (minutos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelKey = Tuple[str, ...]
+
+# Separador dos valores de labels nas chaves dos snapshots
+SEP = "\x1f"
+
+def _escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: List[str], values: LabelKey, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    """Base das métricas: valores por combinação de labels"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = list(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def clear(self):
+        """Zera os valores deste processo com um lock novo (usado após o fork)"""
+        self._lock = threading.Lock()
+        self._values = {}
+
+class Counter(_Metric):
+    """Contador monotônico"""
+
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {SEP.join(key): value for key, value in self._values.items()}
+
+    @staticmethod
+    def merge(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+        merged = {}
+        for snapshot in snapshots:
+            for key, value in snapshot.items():
+                merged[key] = merged.get(key, 0.0) + value
+        return merged
+
+    def render(self, merged: Dict[str, Any]) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, tuple(key.split(SEP)) if self.labelnames else ())} {_format_value(value)}"
+            for key, value in sorted(merged.items())
+        ]
+
+class Gauge(Counter):
+    """Valor instantâneo; entre workers os valores dos processos vivos são somados"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    """Histograma cumulativo com soma e contagem"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = list(buckets)
+        self._values: Dict[LabelKey, Dict[str, Any]] = {}
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['buckets'][i] += 1
+                    break
+            entry['sum'] += value
+            entry['count'] += 1
+
+    def time(self, **labels) -> '_Timer':
+        """Context manager que observa a duração do bloco"""
+        return _Timer(self, labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                SEP.join(key): {'buckets': list(entry['buckets']), 'sum': entry['sum'], 'count': entry['count']}
+                for key, entry in self._values.items()
+            }
+
+    @staticmethod
+    def merge(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+        merged = {}
+        for snapshot in snapshots:
+            for key, entry in snapshot.items():
+                target = merged.get(key)
+                if target is None:
+                    merged[key] = {'buckets': list(entry['buckets']), 'sum': entry['sum'], 'count': entry['count']}
+                    continue
+                target['buckets'] = [a + b for a, b in zip(target['buckets'], entry['buckets'])]
+                target['sum'] += entry['sum']
+                target['count'] += entry['count']
+        return merged
+
+    def render(self, merged: Dict[str, Any]) -> List[str]:
+        lines = []
+        for key, entry in sorted(merged.items()):
+            values = tuple(key.split(SEP)) if self.labelnames else ()
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry['buckets']):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, {'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, {'le': '+Inf'})} {entry['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, values)} {_format_value(entry['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, values)} {entry['count']}")
+        return lines
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+# Como consolidar valores de workers encerrados; gauges não sobrevivem ao processo
+RETIRED_MERGERS = {'counter': Counter.merge, 'histogram': Histogram.merge}
+
+class MetricsRegistry:
+    """Registro de métricas com snapshots por processo para agregação multi-worker.
+
+    Quando um worker termina, seus counters e histogramas são somados em retired.json e o
+    snapshot dele é apagado: os totais continuam e o diretório não cresce a cada reciclagem."""
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+        self.multiproc_dir = os.getenv('METRICS_MULTIPROC_DIR', os.path.join('cache', 'metrics'))
+        self.flush_interval = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado atual deste processo"""
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.multiproc_dir, f"worker_{pid}.json")
+
+    def _retired_path(self) -> str:
+        return os.path.join(self.multiproc_dir, "retired.json")
+
+    def _write_snapshot(self, path: str, snapshot: Dict[str, Any]):
+        """Escrita atômica (arquivo temporário + rename)"""
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.multiproc_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(snapshot))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_snapshot(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @contextmanager
+    def _dir_lock(self) -> Iterator[None]:
+        """Serializa a consolidação entre o master e os workers que renderizam /metrics"""
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        with open(os.path.join(self.multiproc_dir, '.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def flush(self):
+        """Grava snapshot deste worker (escrita atômica)"""
+        if not METRICS_ENABLED:
+            return
+        try:
+            self._write_snapshot(self._snapshot_path(os.getpid()), {
+                'pid': os.getpid(),
+                'written_at': time.time(),
+                'kinds': {name: metric.kind for name, metric in self.metrics.items()},
+                'metrics': self.snapshot()
+            })
+        except Exception as e:
+            logger.debug(f"Falha ao gravar snapshot de métricas: {e}")
+
+    def retire_worker(self, pid: int):
+        """Soma counters e histogramas de um worker encerrado em retired.json e apaga o snapshot dele
+        (chamado pelo child_exit do gunicorn; o render cobre workers que morreram sem o hook)"""
+        path = self._snapshot_path(pid)
+        try:
+            with self._dir_lock():
+                if not os.path.exists(path):
+                    return
+                snapshot = self._read_snapshot(path) or {}
+                retired = self._read_snapshot(self._retired_path()) or {'kinds': {}, 'metrics': {}}
+                kinds = snapshot.get('kinds', {})
+
+                for name, values in snapshot.get('metrics', {}).items():
+                    # Snapshots gravados antes do campo 'kinds' usam a definição local
+                    kind = kinds.get(name) or getattr(self.metrics.get(name), 'kind', None)
+                    if kind not in RETIRED_MERGERS:
+                        continue
+                    retired['kinds'][name] = kind
+                    retired['metrics'][name] = RETIRED_MERGERS[kind]([retired['metrics'].get(name, {}), values])
+
+                self._write_snapshot(self._retired_path(), retired)
+                os.remove(path)
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao consolidar métricas do worker {pid}: {e}")
+
+    def start_flusher(self):
+        """Inicia thread que grava snapshots periodicamente (uma por processo)"""
+        if not METRICS_ENABLED or self._flusher_pid == os.getpid():
+            return
+
+        def loop():
+            while True:
+                time.sleep(self.flush_interval)
+                self.flush()
+
+        self._flusher_pid = os.getpid()
+        self._flusher = threading.Thread(target=loop, name='metrics-flusher', daemon=True)
+        self._flusher.start()
+
+    def reset_multiproc_dir(self):
+        """Remove snapshots de execuções anteriores (chamado pelo master na inicialização)"""
+        if not os.path.isdir(self.multiproc_dir):
+            return
+        for filename in os.listdir(self.multiproc_dir):
+            if filename.startswith('worker_') or filename.endswith('.tmp') or filename == 'retired.json':
+                try:
+                    os.remove(os.path.join(self.multiproc_dir, filename))
+                except OSError:
+                    pass
+
+    def _load_snapshots(self) -> List[Dict[str, Any]]:
+        snapshots = []
+        if not os.path.isdir(self.multiproc_dir):
+            return snapshots
+        for filename in os.listdir(self.multiproc_dir):
+            if not (filename.startswith('worker_') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.multiproc_dir, filename), 'r', encoding='utf-8') as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+    def render(self) -> str:
+        """Exposição Prometheus agregando todos os workers"""
+        self.flush()
+        snapshots = self._load_snapshots()
+        dead = [s['pid'] for s in snapshots if s['pid'] != os.getpid() and not self._pid_alive(s['pid'])]
+        if dead:
+            for pid in dead:
+                self.retire_worker(pid)
+            snapshots = self._load_snapshots()
+        snapshots = snapshots or [{'pid': os.getpid(), 'metrics': self.snapshot()}]
+        alive = {s['pid']: s['pid'] == os.getpid() or self._pid_alive(s['pid']) for s in snapshots}
+
+        retired = self._read_snapshot(self._retired_path())
+        if retired:
+            # Só counters e histogramas; o pid None nunca conta como vivo para gauges
+            snapshots.append(dict(retired, pid=None))
+            alive[None] = False
+
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            per_worker = [
+                s['metrics'].get(name, {})
+                for s in snapshots
+                # Gauges de workers mortos não representam mais o estado atual
+                if metric.kind != 'gauge' or alive[s['pid']]
+            ]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(metric.merge(per_worker)))
+
+        return '\n'.join(lines) + '\n'
+
+    def reset_after_fork(self):
+        """Zera no worker os valores herdados do master para que não sejam somados uma vez por worker"""
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._flusher_pid = None
+        for metric in self.metrics.values():
+            metric.clear()
+
+registry = MetricsRegistry()
+register_after_fork('metrics', registry.reset_after_fork)
+
+# Métricas da aplicação
+http_request_seconds = registry.histogram(
+    'arqv30_http_request_seconds', 'Duração das requisições HTTP', ('endpoint', 'method', 'status')
+)
+http_requests_in_progress = registry.gauge(
+    'arqv30_http_requests_in_progress', 'Requisições HTTP em andamento', ('endpoint',)
+)
+pipeline_phase_seconds = registry.histogram(
+    'arqv30_pipeline_phase_seconds', 'Duração de cada fase do pipeline de análise', ('phase',)
+)
+engine_method_seconds = registry.histogram(
+    'arqv30_engine_method_seconds', 'Duração dos métodos dos motores de análise', ('method',)
+)
+search_requests_total = registry.counter(
+    'arqv30_search_requests_total', 'Chamadas aos provedores de busca', ('provider', 'status')
+)
+search_request_seconds = registry.histogram(
+    'arqv30_search_request_seconds', 'Latência das chamadas aos provedores de busca', ('provider',)
+)
+extraction_attempts_total = registry.counter(
+    'arqv30_extraction_attempts_total', 'Tentativas de extração por estratégia', ('strategy', 'result')
+)
+extraction_seconds = registry.histogram(
+    'arqv30_extraction_seconds', 'Latência de cada estratégia de extração', ('strategy',)
+)
+llm_requests_total = registry.counter(
+    'arqv30_llm_requests_total', 'Chamadas aos provedores de IA', ('provider', 'status')
+)
+llm_request_seconds = registry.histogram(
+    'arqv30_llm_request_seconds', 'Latência das chamadas aos provedores de IA', ('provider',)
+)
+llm_tokens_total = registry.counter(
+    'arqv30_llm_tokens_total', 'Tokens estimados enviados e recebidos', ('provider', 'kind')
+)
+cache_requests_total = registry.counter(
+    'arqv30_cache_requests_total', 'Consultas aos caches', ('cache', 'result')
+)
+db_operation_seconds = registry.histogram(
+    'arqv30_db_operation_seconds', 'Latência das operações de banco de dados', ('operation', 'status')
+)
+pdf_render_seconds = registry.histogram(
+    'arqv30_pdf_render_seconds', 'Tempo de renderização dos relatórios PDF'
+)
+
+def timed(histogram: Histogram, **labels) -> Callable:
+    """Decorator que observa a duração da função no histograma"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+def timed_db_operation(operation: str) -> Callable:
+    """Decorator para operações de banco com status ok/error"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            status = 'error'
+            try:
+                result = func(*args, **kwargs)
+                status = 'ok'
+                return result
+            finally:
+                db_operation_seconds.observe(time.perf_counter() - start, operation=operation, status=status)
+        return wrapper
+    return decorator
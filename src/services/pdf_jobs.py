@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - PDF Jobs
+Renderização de PDFs em background, em um pool de processos fora dos workers web
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from contextlib import closing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, BinaryIO, Dict, Optional, ContextManager
+from services.pdf_render_cache import pdf_render_cache
+from services.metrics import registry
+from services.fork_safety import register_after_fork, process_owner, owner_alive
+from utils.sqlite_utils import ThreadLocalConnections, add_missing_columns
+
+logger = logging.getLogger(__name__)
+
+pdf_jobs_total = registry.counter(
+    'arqv30_pdf_jobs_total', 'Jobs de PDF em background por resultado', ('result',)
+)
+
+# Estados em que o job ainda depende do worker que o agendou
+PENDING_STATES = ('queued', 'running')
+
+# Gerador reaproveitado entre jobs dentro de cada processo do pool
+_subprocess_generator = None
+
+def _mark_running(db_path: str, job_id: str, render_timeout: int) -> bool:
+    """No processo do pool: queued -> running; False se o job já foi encerrado (ex.: expirou na fila)"""
+    now = time.time()
+    try:
+        with closing(sqlite3.connect(db_path, timeout=10)) as conn:
+            updated = conn.execute(
+                "UPDATE pdf_jobs SET status = 'running', deadline = ?, updated_at = ? WHERE job_id = ? AND status = 'queued'",
+                (now + render_timeout, now, job_id)
+            ).rowcount
+            conn.commit()
+        return updated > 0
+    except Exception as e:
+        # Sem o status 'running' o job ainda é válido: renderiza mesmo assim
+        logger.warning(f"⚠️ Erro ao marcar job de PDF {job_id} como em execução: {e}")
+        return True
+
+def _render_in_subprocess(job_id: str, db_path: str, output_path: str, render_timeout: int,
+                          analysis_data: Dict[str, Any]) -> Optional[int]:
+    """Executado no processo do pool: o reportlab roda fora do GIL dos workers web e o PDF vai direto
+    para o arquivo do job (sem voltar pelo pipe); retorna o tamanho, ou None se o job não está mais na fila"""
+    global _subprocess_generator
+    if not _mark_running(db_path, job_id, render_timeout):
+        return None
+
+    if _subprocess_generator is None:
+        from services.pdf_report_generator import PDFGenerator
+        _subprocess_generator = PDFGenerator()
+    pdf = _subprocess_generator.generate_analysis_report(analysis_data)
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(pdf.getbuffer())
+    os.replace(tmp_path, output_path)
+    return os.path.getsize(output_path)
+
+class PDFJobManager:
+    """Enfileira renderizações no pool e guarda o status em SQLite, visível a todos os workers.
+
+    O PDF de cada job fica em cache/pdf_jobs (independente do cache de renderização, que é opcional)
+    até a retenção expirar. Jobs 'queued'/'running' cujo worker morreu ou cujo prazo passou são
+    reportados como 'failed'."""
+
+    def __init__(self, cache_dir: str = "cache"):
+        self.max_workers = int(os.getenv('PDF_JOB_WORKERS', 2))
+        self.start_method = os.getenv('PDF_JOB_START_METHOD', 'spawn')
+        self.retention_seconds = int(os.getenv('PDF_JOB_RETENTION_HOURS', 24)) * 3600
+        self.queue_timeout = int(os.getenv('PDF_JOB_QUEUE_TIMEOUT', 600))
+        self.render_timeout = int(os.getenv('PDF_JOB_TIMEOUT', 300))
+
+        self.cache_dir = cache_dir
+        self.output_dir = os.path.join(cache_dir, "pdf_jobs")
+        self.db_path = os.path.join(cache_dir, "pdf_jobs.db")
+        self._connections = ThreadLocalConnections(self.db_path)
+        self._db_ready = False
+        self._init_lock = threading.Lock()
+        self._last_prune = 0.0
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        if not self._db_ready:
+            self._init_database()
+        return self._connections.transaction()
+
+    def _init_database(self):
+        """Cria a tabela de jobs e descarta os antigos"""
+        with self._init_lock:
+            if self._db_ready:
+                return
+            try:
+                os.makedirs(self.output_dir, exist_ok=True)
+                with self._connections.transaction() as conn:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS pdf_jobs (
+                            job_id TEXT PRIMARY KEY,
+                            status TEXT NOT NULL,
+                            cache_key TEXT NOT NULL,
+                            size_bytes INTEGER,
+                            error TEXT,
+                            created_at REAL NOT NULL,
+                            updated_at REAL NOT NULL
+                        )
+                    """)
+                    add_missing_columns(conn, 'pdf_jobs', {'owner': 'TEXT', 'deadline': 'REAL'})
+                    self._prune(conn)
+                self._db_ready = True
+            except Exception as e:
+                logger.error(f"Erro ao inicializar tabela de jobs de PDF: {e}")
+
+    def _prune(self, conn: sqlite3.Connection):
+        """Remove jobs (e seus PDFs) além da retenção"""
+        cutoff = time.time() - self.retention_seconds
+        expired = [row[0] for row in conn.execute("SELECT job_id FROM pdf_jobs WHERE updated_at < ?", (cutoff,))]
+        for job_id in expired:
+            self._remove_output(job_id)
+        conn.execute("DELETE FROM pdf_jobs WHERE updated_at < ?", (cutoff,))
+        conn.commit()
+        self._last_prune = time.time()
+
+    def _output_path(self, job_id: str) -> str:
+        return os.path.join(self.output_dir, f"{job_id}.pdf")
+
+    def _remove_output(self, job_id: str):
+        try:
+            os.remove(self._output_path(job_id))
+        except OSError:
+            pass
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Pool criado no primeiro job de cada worker (processos do pool não são herdados no fork)"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    context = multiprocessing.get_context(self.start_method)
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+                    logger.info(f"🖨️ Pool de renderização de PDF iniciado ({self.max_workers} processos, {self.start_method})")
+        return self._executor
+
+    def _discard_executor(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            logger.warning("⚠️ Pool de renderização de PDF quebrado, será recriado")
+
+    def _finish(self, job_id: str, status: str, size_bytes: Optional[int] = None, error: Optional[str] = None) -> bool:
+        """Encerra um job pendente; False se ele já tinha sido encerrado (ex.: por tempo esgotado)"""
+        try:
+            with self._connect() as conn:
+                updated = conn.execute(
+                    "UPDATE pdf_jobs SET status = ?, size_bytes = ?, error = ?, updated_at = ? "
+                    "WHERE job_id = ? AND status IN ('queued', 'running')",
+                    (status, size_bytes, error, time.time(), job_id)
+                ).rowcount
+                conn.commit()
+            return updated > 0
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao atualizar job de PDF {job_id}: {e}")
+            return False
+
+    def _copy_from_cache(self, cache_key: str, output_path: str) -> Optional[int]:
+        """Copia um PDF já renderizado do cache para o arquivo do job; None se não estiver em cache"""
+        if not pdf_render_cache.contains(cache_key):
+            return None
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            found = pdf_render_cache.get(cache_key, f)
+        if not found:
+            os.remove(tmp_path)
+            return None
+        os.replace(tmp_path, output_path)
+        return os.path.getsize(output_path)
+
+    def submit(self, analysis_data: Dict[str, Any], variant: str = '') -> Dict[str, Any]:
+        """Cria o job; se o mesmo conteúdo já foi renderizado, ele nasce concluído"""
+        job_id = uuid.uuid4().hex
+        # O processo do pool renderiza a mesma visão que entra na chave do cache
+        analysis_data = pdf_render_cache.render_view(analysis_data)
+        cache_key = pdf_render_cache.key_for(analysis_data, variant)
+        output_path = self._output_path(job_id)
+        now = time.time()
+
+        with self._connect() as conn:
+            if now - self._last_prune > 3600:
+                self._prune(conn)
+
+        cached_size = self._copy_from_cache(cache_key, output_path)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO pdf_jobs (job_id, status, cache_key, size_bytes, owner, deadline, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, 'queued' if cached_size is None else 'done', cache_key, cached_size,
+                     process_owner(), now + self.queue_timeout, now, now)
+                )
+                conn.commit()
+        except Exception:
+            self._remove_output(job_id)
+            raise
+
+        if cached_size is not None:
+            pdf_jobs_total.inc(result='cached')
+            return self.get_status(job_id)
+
+        args = (_render_in_subprocess, job_id, self.db_path, output_path, self.render_timeout, analysis_data)
+        try:
+            try:
+                future = self._get_executor().submit(*args)
+            except BrokenProcessPool:
+                # Um processo do pool morreu (OOM, segfault do reportlab): recria o pool uma vez
+                self._discard_executor()
+                future = self._get_executor().submit(*args)
+        except Exception as e:
+            logger.error(f"❌ Job de PDF {job_id} não pôde ser agendado: {e}")
+            pdf_jobs_total.inc(result='failed')
+            self._finish(job_id, 'failed', error=str(e))
+            return self.get_status(job_id)
+
+        future.add_done_callback(lambda f: self._on_done(job_id, cache_key, f))
+        logger.info(f"🖨️ Job de PDF {job_id} enfileirado")
+        return self.get_status(job_id)
+
+    def _on_done(self, job_id: str, cache_key: str, future: Future):
+        """Callback no worker web: marca o job e alimenta o cache de renderização (opcional)"""
+        try:
+            size_bytes = future.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._discard_executor()
+            logger.error(f"❌ Job de PDF {job_id} falhou: {e}")
+            pdf_jobs_total.inc(result='failed')
+            self._finish(job_id, 'failed', error=str(e))
+            self._remove_output(job_id)
+            return
+
+        if size_bytes is None:
+            logger.info(f"⏭️ Job de PDF {job_id} já estava encerrado, renderização ignorada")
+            return
+
+        if not self._finish(job_id, 'done', size_bytes=size_bytes):
+            # Expirou enquanto renderizava: o cliente já recebeu 'failed'
+            self._remove_output(job_id)
+            return
+
+        if pdf_render_cache.enabled:
+            with open(self._output_path(job_id), 'rb') as f:
+                pdf_render_cache.put(cache_key, f)
+
+        pdf_jobs_total.inc(result='done')
+        logger.info(f"✅ Job de PDF {job_id} concluído ({size_bytes / 1024:.0f} KB)")
+
+    def _stale_reason(self, owner: Optional[str], deadline: Optional[float], status: str, updated_at: float) -> Optional[str]:
+        if deadline is None:
+            # Jobs gravados antes da coluna existir
+            deadline = updated_at + self.queue_timeout + self.render_timeout
+        if time.time() > deadline:
+            if status == 'queued':
+                return 'Tempo limite na fila excedido'
+            return 'Tempo limite de renderização excedido'
+        if not owner_alive(owner):
+            return 'Worker que agendou o job foi encerrado'
+        return None
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status do job (queued, running, done ou failed)"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT status, size_bytes, error, created_at, updated_at, owner, deadline FROM pdf_jobs WHERE job_id = ?",
+                    (job_id,)
+                ).fetchone()
+        except Exception as e:
+            logger.error(f"Erro ao consultar job de PDF {job_id}: {e}")
+            return None
+
+        if not row:
+            return None
+
+        status, size_bytes, error, created_at, updated_at, owner, deadline = row
+        if status in PENDING_STATES:
+            reason = self._stale_reason(owner, deadline, status, updated_at)
+            if reason and self._finish(job_id, 'failed', error=reason):
+                logger.warning(f"⚠️ Job de PDF {job_id} encerrado: {reason}")
+                pdf_jobs_total.inc(result='expired')
+                status, error, updated_at = 'failed', reason, time.time()
+
+        return {
+            'job_id': job_id,
+            'status': status,
+            'size_bytes': size_bytes,
+            'error': error,
+            'created_at': created_at,
+            'updated_at': updated_at
+        }
+
+    def open_output(self, job_id: str) -> Optional[BinaryIO]:
+        """PDF de um job concluído (quem chama fecha o arquivo); None se já foi removido pela retenção"""
+        try:
+            return open(self._output_path(job_id), 'rb')
+        except FileNotFoundError:
+            return None
+
+    def reset_after_fork(self):
+        """O pool pertence ao processo que o criou"""
+        self._connections.reset_after_fork()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._init_lock = threading.Lock()
+
+# Instância global
+pdf_job_manager = PDFJobManager()
+register_after_fork('pdf_job_manager', pdf_job_manager.reset_after_fork)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - PDF Render Cache
+Cache em disco dos PDFs renderizados, por hash do conteúdo da análise
+"""
+
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Optional
+from services.metrics import cache_requests_total
+
+logger = logging.getLogger(__name__)
+
+# Únicos campos de `metadata` que aparecem no PDF (capa); o resto muda a cada execução
+RENDERED_METADATA_KEYS = ('generated_at', 'model', 'processing_time')
+
+GENERATOR_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pdf_report_generator.py')
+
+def _template_version() -> str:
+    """Versão do layout: PDF_TEMPLATE_VERSION ou o hash do código do gerador (qualquer mudança invalida o cache)"""
+    configured = os.getenv('PDF_TEMPLATE_VERSION')
+    if configured:
+        return configured
+    try:
+        with open(GENERATOR_SOURCE, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()[:12]
+    except OSError:
+        return 'unknown'
+
+class PDFRenderCache:
+    """PDFs comprimidos em cache/pdf, com despejo dos menos usados quando o tamanho total passa do limite"""
+
+    def __init__(self, cache_dir: str = os.path.join("cache", "pdf")):
+        self.cache_dir = cache_dir
+        self.enabled = os.getenv('PDF_CACHE_ENABLED', 'true').lower() == 'true'
+        self.max_bytes = int(os.getenv('PDF_CACHE_MAX_MB', 256)) * 1024 * 1024
+        self.template_version = _template_version()
+
+    @staticmethod
+    def render_view(analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Cópia rasa da análise com o que o PDF mostra: `metadata` reduzido aos campos da capa e a data
+        de geração fixada (dia da requisição se a análise não tiver) para que a chave a inclua"""
+        metadata = analysis_data.get('metadata') or {}
+        rendered = {key: metadata[key] for key in RENDERED_METADATA_KEYS if key in metadata}
+        rendered['generated_at'] = str(metadata.get('generated_at') or datetime.now().isoformat())[:10]
+        return dict(analysis_data, metadata=rendered)
+
+    def key_for(self, analysis_data: Dict[str, Any], variant: str = '') -> str:
+        """Hash estável do JSON do que o PDF mostra (render_view, chaves ordenadas) + versão do template"""
+        canonical = json.dumps(self.render_view(analysis_data), sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+        digest = hashlib.sha256()
+        digest.update(f"{self.template_version}|{variant}|".encode('utf-8'))
+        digest.update(canonical.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pdf.gz")
+
+    def contains(self, key: str) -> bool:
+        """True se o PDF desta chave já está em cache"""
+        return self.enabled and os.path.exists(self._path(key))
+
+    def get(self, key: str, output: BinaryIO) -> bool:
+        """Descomprime o PDF em `output`; False se não estiver em cache"""
+        if not self.enabled:
+            return False
+
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rb') as f:
+                shutil.copyfileobj(f, output)
+        except FileNotFoundError:
+            cache_requests_total.inc(cache='pdf', result='miss')
+            return False
+        except Exception as e:
+            logger.warning(f"⚠️ Entrada corrompida no cache de PDF {key}: {e}")
+            self._remove(path)
+            output.seek(0)
+            output.truncate()
+            cache_requests_total.inc(cache='pdf', result='miss')
+            return False
+
+        # mtime marca o último uso para o despejo LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        cache_requests_total.inc(cache='pdf', result='hit')
+        return True
+
+    def put(self, key: str, pdf_file: BinaryIO):
+        """Grava o PDF comprimido (escrita atômica) e despeja entradas antigas se preciso"""
+        if not self.enabled:
+            return
+
+        position = pdf_file.tell()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            pdf_file.seek(0)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0) as f:
+                    shutil.copyfileobj(pdf_file, f)
+                os.replace(tmp_path, self._path(key))
+            except Exception:
+                self._remove(tmp_path)
+                raise
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao gravar PDF no cache: {e}")
+            return
+        finally:
+            pdf_file.seek(position)
+
+        self._evict()
+
+    def _evict(self):
+        """Remove os PDFs usados há mais tempo até o cache voltar a 90% do limite"""
+        try:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.pdf.gz'):
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                    entries.append((stat.st_mtime, stat.st_size, name))
+        except OSError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, name in sorted(entries):
+            if total <= target:
+                break
+            self._remove(os.path.join(self.cache_dir, name))
+            total -= size
+            removed += 1
+        logger.info(f"🗑️ Cache de PDF: {removed} entrada(s) despejadas")
+
+    def clear(self):
+        """Remove todos os PDFs em cache"""
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                self._remove(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+# Instância global
+pdf_render_cache = PDFRenderCache()
@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - PDF Report Generator
+Montagem do relatório PDF da análise com reportlab
+"""
+
+import copy
+import logging
+from functools import lru_cache
+from datetime import datetime
+from typing import BinaryIO, Optional
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle, StyleSheet1
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.platypus.paragraph import cleanBlockQuotedText
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
+from io import BytesIO
+from services.metrics import timed, pdf_render_seconds
+
+logger = logging.getLogger(__name__)
+
+def _build_styles() -> StyleSheet1:
+    """Estilos do relatório (montados uma vez por processo; somente leitura durante a renderização)"""
+    styles = getSampleStyleSheet()
+    
+    # Título principal
+    styles.add(ParagraphStyle(
+        name='CustomTitle',
+        parent=styles['Title'],
+        fontSize=24,
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        textColor=colors.HexColor('#1a365d')
+    ))
+    
+    # Subtítulo
+    styles.add(ParagraphStyle(
+        name='CustomSubtitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=20,
+        textColor=colors.HexColor('#2d3748')
+    ))
+    
+    # Seção
+    styles.add(ParagraphStyle(
+        name='SectionHeader',
+        parent=styles['Heading2'],
+        fontSize=14,
+        spaceAfter=15,
+        spaceBefore=20,
+        textColor=colors.HexColor('#4a5568'),
+        borderWidth=1,
+        borderColor=colors.HexColor('#e2e8f0'),
+        borderPadding=5
+    ))
+    
+    # Texto normal
+    styles.add(ParagraphStyle(
+        name='CustomNormal',
+        parent=styles['Normal'],
+        fontSize=11,
+        spaceAfter=12,
+        alignment=TA_JUSTIFY,
+        leading=14
+    ))
+    
+    # Lista
+    styles.add(ParagraphStyle(
+        name='BulletList',
+        parent=styles['Normal'],
+        fontSize=10,
+        spaceAfter=8,
+        leftIndent=20,
+        bulletIndent=10
+    ))
+    
+    return styles
+
+STYLES = _build_styles()
+
+# Estilos de tabela compartilhados (Table.setStyle só lê os comandos)
+INFO_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey)
+])
+
+DEMO_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+])
+
+PROJECTIONS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+@lru_cache(maxsize=256)
+def _paragraph_prototype(text: str, style_name: str) -> Paragraph:
+    return Paragraph(text, STYLES[style_name])
+
+def static_paragraph(text: str, style_name: str) -> Paragraph:
+    """Parágrafo de texto fixo (títulos, cabeçalhos de seção): o markup é analisado uma única vez
+    e cada relatório recebe uma cópia rasa, já que wrap/draw gravam largura e linhas na instância"""
+    return copy.copy(_paragraph_prototype(text, style_name))
+
+def text_paragraph(text: str, style_name: str) -> Paragraph:
+    """Parágrafo de conteúdo da análise; texto sem markup nem entidades pula o parser XML do reportlab
+    e recebe o mesmo fragmento que o parser produziria"""
+    if not isinstance(text, str) or '<' in text or '&' in text:
+        return Paragraph(text, STYLES[style_name])
+    cleaned = cleanBlockQuotedText(text)
+    if not cleaned:
+        return Paragraph(text, STYLES[style_name])
+    
+    frag = copy.copy(_paragraph_prototype('x', style_name).frags[0])
+    frag.link, frag.us_lines = [], []
+    frag.text = cleaned
+    return Paragraph(cleaned, STYLES[style_name], frags=[frag])
+
+class PDFGenerator:
+    """Gerador de relatórios PDF profissionais"""
+    
+    def __init__(self):
+        """Inicializa gerador de PDF"""
+        self.styles = STYLES
+    
+    def warm_up(self):
+        """Renderiza um relatório mínimo para carregar métricas das fontes e os parágrafos fixos antes do fork"""
+        self.generate_analysis_report({'segmento': 'warm-up', 'insights_exclusivos': ['warm-up']})
+        logger.info("🖨️ Gerador de PDF pré-aquecido")
+    
+    @timed(pdf_render_seconds)
+    def generate_analysis_report(self, analysis_data: dict, output: Optional[BinaryIO] = None) -> BinaryIO:
+        """Gera relatório completo da análise em `output` (ou em um BytesIO novo), já rebobinado"""
+        
+        buffer = output if output is not None else BytesIO()
+        
+        # Cria documento PDF
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=A4,
+            rightMargin=72,
+            leftMargin=72,
+            topMargin=72,
+            bottomMargin=18
+        )
+        
+        # Constrói conteúdo
+        story = []
+        
+        # Capa
+        story.extend(self._build_cover_page(analysis_data))
+        story.append(PageBreak())
+        
+        # Sumário executivo
+        story.extend(self._build_executive_summary(analysis_data))
+        story.append(PageBreak())
+        
+        # Avatar detalhado
+        if 'avatar_ultra_detalhado' in analysis_data:
+            story.extend(self._build_avatar_section(analysis_data['avatar_ultra_detalhado']))
+            story.append(PageBreak())
+        
+        # Posicionamento
+        if 'escopo' in analysis_data:
+            story.extend(self._build_positioning_section(analysis_data['escopo']))
+            story.append(PageBreak())
+        
+        # Análise de concorrência
+        if 'analise_concorrencia_detalhada' in analysis_data:
+            story.extend(self._build_competition_section(analysis_data['analise_concorrencia_detalhada']))
+            story.append(PageBreak())
+        
+        # Estratégia de marketing
+        if 'estrategia_palavras_chave' in analysis_data:
+            story.extend(self._build_marketing_section(analysis_data['estrategia_palavras_chave']))
+            story.append(PageBreak())
+        
+        # Métricas e KPIs
+        if 'metricas_performance_detalhadas' in analysis_data:
+            story.extend(self._build_metrics_section(analysis_data['metricas_performance_detalhadas']))
+            story.append(PageBreak())
+        
+        # Projeções
+        if 'projecoes_cenarios' in analysis_data:
+            story.extend(self._build_projections_section(analysis_data['projecoes_cenarios']))
+            story.append(PageBreak())
+        
+        # Plano de ação
+        if 'plano_acao_detalhado' in analysis_data:
+            story.extend(self._build_action_plan_section(analysis_data['plano_acao_detalhado']))
+            story.append(PageBreak())
+        
+        # Insights exclusivos
+        if 'insights_exclusivos' in analysis_data:
+            story.extend(self._build_insights_section(analysis_data['insights_exclusivos']))
+        
+        # Gera PDF
+        doc.build(story)
+        buffer.seek(0)
+        
+        return buffer
+    
+    def _build_cover_page(self, data: dict) -> list:
+        """Constrói página de capa"""
+        story = []
+        
+        # Título principal
+        story.append(static_paragraph("ANÁLISE ULTRA-DETALHADA DE MERCADO", 'CustomTitle'))
+        story.append(Spacer(1, 0.5*inch))
+        
+        # Subtítulo
+        segmento = data.get('segmento', 'Não informado')
+        produto = data.get('produto', 'Não informado')
+        
+        story.append(text_paragraph(f"Segmento: {segmento}", 'CustomSubtitle'))
+        if produto != 'Não informado':
+            story.append(text_paragraph(f"Produto: {produto}", 'CustomSubtitle'))
+        
+        story.append(Spacer(1, 1*inch))
+        
+        # Informações do relatório
+        metadata = data.get('metadata', {})
+        generated_at = metadata.get('generated_at', datetime.now().isoformat())
+        
+        info_data = [
+            ['Data de Geração:', generated_at[:10]],
+            ['Versão:', '2.0.0'],
+            ['Modelo IA:', metadata.get('model', 'Gemini Pro')],
+            ['Tempo de Processamento:', f"{metadata.get('processing_time', 0)} segundos"]
+        ]
+        
+        info_table = Table(info_data, colWidths=[2*inch, 3*inch])
+        info_table.setStyle(INFO_TABLE_STYLE)
+        
+        story.append(info_table)
+        story.append(Spacer(1, 1*inch))
+        
+        # Rodapé da capa
+        story.append(static_paragraph("ARQV30 Enhanced v2.0", 'CustomNormal'))
+        story.append(static_paragraph("Powered by Artificial Intelligence", 'CustomNormal'))
+        
+        return story
+    
+    def _build_executive_summary(self, data: dict) -> list:
+        """Constrói sumário executivo"""
+        story = []
+        
+        story.append(static_paragraph("SUMÁRIO EXECUTIVO", 'CustomTitle'))
+        story.append(Spacer(1, 0.3*inch))
+        
+        # Resumo dos principais pontos
+        summary_points = [
+            f"Segmento analisado: {data.get('segmento', 'N/A')}",
+            f"Público-alvo: {data.get('publico', 'N/A')}",
+            f"Preço: R$ {data.get('preco', 'N/A')}",
+            f"Objetivo de receita: R$ {data.get('objetivo_receita', 'N/A')}"
+        ]
+        
+        for point in summary_points:
+            story.append(text_paragraph(f"• {point}", 'BulletList'))
+        
+        story.append(Spacer(1, 0.2*inch))
+        
+        # Principais insights
+        insights = data.get('insights_exclusivos', [])
+        if insights:
+            story.append(static_paragraph("Principais Insights:", 'SectionHeader'))
+            for insight in insights[:5]:  # Primeiros 5 insights
+                story.append(text_paragraph(f"• {insight}", 'BulletList'))
+        
+        return story
+    
+    def _build_avatar_section(self, avatar_data: dict) -> list:
+        """Constrói seção do avatar"""
+        story = []
+        
+        story.append(static_paragraph("AVATAR ULTRA-DETALHADO", 'CustomTitle'))
+        story.append(Spacer(1, 0.3*inch))
+        
+        # Perfil demográfico
+        demo = avatar_data.get('perfil_demografico', {})
+        if demo:
+            story.append(static_paragraph("Perfil Demográfico", 'SectionHeader'))
+            
+            demo_data = [
+                ['Idade:', demo.get('idade', 'N/A')],
+                ['Gênero:', demo.get('genero', 'N/A')],
+                ['Renda:', demo.get('renda', 'N/A')],
+                ['Escolaridade:', demo.get('escolaridade', 'N/A')],
+                ['Localização:', demo.get('localizacao', 'N/A')]
+            ]
+            
+            demo_table = Table(demo_data, colWidths=[1.5*inch, 4*inch])
+            demo_table.setStyle(DEMO_TABLE_STYLE)
+            
+            story.append(demo_table)
+            story.append(Spacer(1, 0.2*inch))
+        
+        # Perfil psicográfico
+        psico = avatar_data.get('perfil_psicografico', {})
+        if psico:
+            story.append(static_paragraph("Perfil Psicográfico", 'SectionHeader'))
+            
+            for key, value in psico.items():
+                if value:
+                    story.append(Paragraph(f"<b>{key.replace('_', ' ').title()}:</b> {value}", self.styles['CustomNormal']))
+        
+        # Dores específicas
+        dores = avatar_data.get('dores_especificas', [])
+        if dores:
+            story.append(static_paragraph("Dores Específicas", 'SectionHeader'))
+            for dor in dores:
+                story.append(text_paragraph(f"• {dor}", 'BulletList'))
+        
+        # Desejos profundos
+        desejos = avatar_data.get('desejos_profundos', [])
+        if desejos:
+            story.append(static_paragraph("Desejos Profundos", 'SectionHeader'))
+            for desejo in desejos:
+                story.append(text_paragraph(f"• {desejo}", 'BulletList'))
+        
+        return story
+    
+    def _build_positioning_section(self, escopo_data: dict) -> list:
+        """Constrói seção de posicionamento"""
+        story = []
+        
+        story.append(static_paragraph("ESCOPO E POSICIONAMENTO", 'CustomTitle'))
+        story.append(Spacer(1, 0.3*inch))
+        
+        # Posicionamento no mercado
+        posicionamento = escopo_data.get('posicionamento_mercado', '')
+        if posicionamento:
+            story.append(static_paragraph("Posicionamento no Mercado", 'SectionHeader'))
+            story.append(text_paragraph(posicionamento, 'CustomNormal'))
+        
+        # Proposta de valor
+        proposta = escopo_data.get('proposta_valor', '')
+        if proposta:
+            story.append(static_paragraph("Proposta de Valor", 'SectionHeader'))
+            story.append(text_paragraph(proposta, 'CustomNormal'))
+        
+        # Diferenciais competitivos
+        diferenciais = escopo_data.get('diferenciais_competitivos', [])
+        if diferenciais:
+            story.append(static_paragraph("Diferenciais Competitivos", 'SectionHeader'))
+            for diferencial in diferenciais:
+                story.append(text_paragraph(f"• {diferencial}", 'BulletList'))
+        
+        return story
+    
+    def _build_competition_section(self, competition_data: dict) -> list:
+        """Constrói seção de análise de concorrência"""
+        story = []
+        
+        story.append(static_paragraph("ANÁLISE DE CONCORRÊNCIA", 'CustomTitle'))
+        story.append(Spacer(1, 0.3*inch))
+        
+        # Concorrentes diretos
+        diretos = competition_data.get('concorrentes_diretos', [])
+        if diretos:
+            story.append(static_paragraph("Concorrentes Diretos", 'SectionHeader'))
+            
+            for i, concorrente in enumerate(diretos, 1):
+                if isinstance(concorrente, dict):
+                    nome = concorrente.get('nome', f'Concorrente {i}')
+                    story.append(Paragraph(f"<b>{nome}</b>", self.styles['CustomNormal']))
+                    
+                    pontos_fortes = concorrente.get('pontos_fortes', [])
+                    if pontos_fortes:
+                        story.append(static_paragraph("Pontos Fortes:", 'CustomNormal'))
+                        for ponto in pontos_fortes:
+                            story.append(text_paragraph(f"• {ponto}", 'BulletList'))
+                    
+                    pontos_fracos = concorrente.get('pontos_fracos', [])
+                    if pontos_fracos:
+                        story.append(static_paragraph("Pontos Fracos:", 'CustomNormal'))
+                        for ponto in pontos_fracos:
+                            story.append(text_paragraph(f"• {ponto}", 'BulletList'))
+                    
+                    story.append(Spacer(1, 0.1*inch))
+        
+        # Gaps de oportunidade
+        gaps = competition_data.get('gaps_oportunidade', [])
+        if gaps:
+            story.append(static_paragraph("Oportunidades Identificadas", 'SectionHeader'))
+            for gap in gaps:
+                story.append(text_paragraph(f"• {gap}", 'BulletList'))
+        
+        return story
+    
+    def _build_marketing_section(self, marketing_data: dict) -> list:
+        """Constrói seção de estratégia de marketing"""
+        story = []
+        
+        story.append(static_paragraph("ESTRATÉGIA DE MARKETING", 'CustomTitle'))
+        story.append(Spacer(1, 0.3*inch))
+        
+        # Palavras-chave primárias
+        primarias = marketing_data.get('palavras_primarias', [])
+        if primarias:
+            story.append(static_paragraph("Palavras-Chave Primárias", 'SectionHeader'))
+            story.append(text_paragraph(", ".join(primarias), 'CustomNormal'))
+        
+        # Palavras-chave secundárias
+        secundarias = marketing_data.get('palavras_secundarias', [])
+        if secundarias:
+            story.append(static_paragraph("Palavras-Chave Secundárias", 'SectionHeader'))
+            story.append(text_paragraph(", ".join(secundarias[:15]), 'CustomNormal'))
+        
+        # Long tail
+        long_tail = marketing_data.get('long_tail', [])
+        if long_tail:
+            story.append(static_paragraph("Palavras-Chave Long Tail", 'SectionHeader'))
+            story.append(text_paragraph(", ".join(long_tail[:10]), 'CustomNormal'))
+        
+        return story
+    
+    def _build_metrics_section(self, metrics_data: dict) -> list:
+        """Constrói seção de métricas"""
+        story = []
+        
+        story.append(static_paragraph("MÉTRICAS DE PERFORMANCE", 'CustomTitle'))
+        story.append(Spacer(1, 0.3*inch))
+        
+        # KPIs principais
+        kpis = metrics_data.get('kpis_principais', [])
+        if kpis:
+            story.append(static_paragraph("KPIs Principais", 'SectionHeader'))
+            
+            for kpi in kpis:
+                if isinstance(kpi, dict):
+                    metrica = kpi.get('metrica', 'N/A')
+                    objetivo = kpi.get('objetivo', 'N/A')
+                    story.append(Paragraph(f"<b>{metrica}:</b> {objetivo}", self.styles['CustomNormal']))
+        
+        # ROI esperado
+        roi = metrics_data.get('roi_esperado', '')
+        if roi:
+            story.append(static_paragraph("ROI Esperado", 'SectionHeader'))
+            story.append(text_paragraph(roi, 'CustomNormal'))
+        
+        return story
+    
+    def _build_projections_section(self, projections_data: dict) -> list:
+        """Constrói seção de projeções"""
+        story = []
+        
+        story.append(static_paragraph("PROJEÇÕES E CENÁRIOS", 'CustomTitle'))
+        story.append(Spacer(1, 0.3*inch))
+        
+        # Tabela de cenários
+        cenarios = ['conservador', 'realista', 'otimista']
+        table_data = [['Cenário', 'Receita Mensal', 'Clientes/Mês', 'Ticket Médio']]
+        
+        for cenario in cenarios:
+            cenario_data = projections_data.get(cenario, {})
+            if cenario_data:
+                table_data.append([
+                    cenario.title(),
+                    cenario_data.get('receita_mensal', 'N/A'),
+                    cenario_data.get('clientes_mes', 'N/A'),
+                    cenario_data.get('ticket_medio', 'N/A')
+                ])
+        
+        if len(table_data) > 1:
+            projections_table = Table(table_data, colWidths=[1.5*inch, 1.5*inch, 1.5*inch, 1.5*inch])
+            projections_table.setStyle(PROJECTIONS_TABLE_STYLE)
+            
+            story.append(projections_table)
+        
+        return story
+    
+    def _build_action_plan_section(self, action_data: dict) -> list:
+        """Constrói seção do plano de ação"""
+        story = []
+        
+        story.append(static_paragraph("PLANO DE AÇÃO DETALHADO", 'CustomTitle'))
+        story.append(Spacer(1, 0.3*inch))
+        
+        # Fases do plano
+        fases = ['fase_1_preparacao', 'fase_2_lancamento', 'fase_3_crescimento']
+        
+        for fase in fases:
+            fase_data = action_data.get(fase, {})
+            if fase_data:
+                fase_nome = fase.replace('_', ' ').title()
+                story.append(static_paragraph(fase_nome, 'SectionHeader'))
+                
+                duracao = fase_data.get('duracao', 'N/A')
+                story.append(Paragraph(f"<b>Duração:</b> {duracao}", self.styles['CustomNormal']))
+                
+                atividades = fase_data.get('atividades', [])
+                if atividades:
+                    story.append(static_paragraph("<b>Atividades:</b>", 'CustomNormal'))
+                    for atividade in atividades:
+                        story.append(text_paragraph(f"• {atividade}", 'BulletList'))
+                
+                story.append(Spacer(1, 0.1*inch))
+        
+        return story
+    
+    def _build_insights_section(self, insights: list) -> list:
+        """Constrói seção de insights exclusivos"""
+        story = []
+        
+        story.append(static_paragraph("INSIGHTS EXCLUSIVOS", 'CustomTitle'))
+        story.append(Spacer(1, 0.3*inch))
+        
+        for i, insight in enumerate(insights, 1):
+            story.append(text_paragraph(f"{i}. {insight}", 'CustomNormal'))
+            story.append(Spacer(1, 0.1*inch))
+        
+        return story
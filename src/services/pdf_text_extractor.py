@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - PDF Text Extractor
+Extração de texto de PDFs anexados, página a página, com pool de processos
+para documentos longos, limite de páginas e orçamento de tempo
+"""
+
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional
+from services.metrics import registry
+from services.fork_safety import register_after_fork
+
+logger = logging.getLogger(__name__)
+
+# PyPDF2 3.0 extrai mais rápido que pypdf 3.5 (bench_pdf_extraction); pdfplumber preserva melhor o layout, a ~40x o custo
+BACKENDS = ('PyPDF2', 'pypdf', 'pdfplumber')
+
+pdf_extract_truncated_total = registry.counter(
+    'arqv30_pdf_extract_truncated_total', 'Extrações de PDF interrompidas antes do fim', ('reason',)
+)
+
+def count_pages(file_path: str, backend: str) -> int:
+    if backend == 'pdfplumber':
+        import pdfplumber
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages)
+    return len(_open_reader(file_path, backend).pages)
+
+def _open_reader(file_path: str, backend: str):
+    if backend == 'PyPDF2':
+        from PyPDF2 import PdfReader
+    else:
+        from pypdf import PdfReader
+    return PdfReader(file_path)
+
+def iter_page_range(file_path: str, backend: str, start: int, stop: int) -> Iterator[str]:
+    """Texto das páginas [start, stop), abrindo o documento uma vez"""
+    if backend == 'pdfplumber':
+        import pdfplumber
+        with pdfplumber.open(file_path) as pdf:
+            for page_num in range(start, stop):
+                yield pdf.pages[page_num].extract_text() or ''
+        return
+
+    reader = _open_reader(file_path, backend)
+    for page_num in range(start, stop):
+        yield reader.pages[page_num].extract_text() or ''
+
+def extract_page_range(file_path: str, backend: str, start: int, stop: int) -> List[str]:
+    """Executado no pool: cada processo abre o próprio arquivo, só o texto volta pelo pipe"""
+    return list(iter_page_range(file_path, backend, start, stop))
+
+class PDFTextExtractor:
+    """Extrai o texto como um gerador de páginas; acima de PDF_EXTRACT_PARALLEL_MIN_PAGES as faixas
+    de páginas vão para um pool de processos e são devolvidas na ordem original"""
+
+    def __init__(self):
+        self.backend = os.getenv('PDF_EXTRACT_BACKEND', 'PyPDF2')
+        if self.backend not in BACKENDS:
+            logger.warning(f"⚠️ PDF_EXTRACT_BACKEND inválido ({self.backend}), usando PyPDF2")
+            self.backend = 'PyPDF2'
+        self.max_pages = int(os.getenv('PDF_EXTRACT_MAX_PAGES', 500))
+        self.time_budget = float(os.getenv('PDF_EXTRACT_TIME_BUDGET', 60))
+        # Com um único núcleo o pool só acrescenta spawn e pickling: a extração fica sequencial
+        self.max_workers = int(os.getenv('PDF_EXTRACT_WORKERS', min(4, os.cpu_count() or 1)))
+        self.parallel_min_pages = int(os.getenv('PDF_EXTRACT_PARALLEL_MIN_PAGES', 40))
+        self.chunk_pages = int(os.getenv('PDF_EXTRACT_CHUNK_PAGES', 16))
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Pool criado no primeiro PDF longo de cada worker"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    context = multiprocessing.get_context('spawn')
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+                    logger.info(f"📄 Pool de extração de PDF iniciado ({self.max_workers} processos)")
+        return self._executor
+
+    def _discard_executor(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def iter_pages(self, file_path: str, backend: Optional[str] = None) -> Iterator[str]:
+        """Texto de cada página, em ordem, até o limite de páginas ou o fim do orçamento de tempo"""
+        backend = backend or self.backend
+        deadline = time.monotonic() + self.time_budget
+
+        total = count_pages(file_path, backend)
+        pages = min(total, self.max_pages)
+        if pages < total:
+            logger.warning(f"⚠️ PDF com {total} páginas: extraindo só as primeiras {pages}")
+            pdf_extract_truncated_total.inc(reason='page_cap')
+
+        if pages < self.parallel_min_pages or self.max_workers < 2:
+            yield from self._iter_sequential(file_path, backend, pages, deadline)
+        else:
+            yield from self._iter_parallel(file_path, backend, pages, deadline)
+
+    def _iter_sequential(self, file_path: str, backend: str, pages: int, deadline: float) -> Iterator[str]:
+        for page_num, text in enumerate(iter_page_range(file_path, backend, 0, pages)):
+            yield text
+            if page_num + 1 < pages and time.monotonic() > deadline:
+                self._budget_exceeded(page_num + 1, pages)
+                return
+
+    def _iter_parallel(self, file_path: str, backend: str, pages: int, deadline: float) -> Iterator[str]:
+        ranges = [(start, min(start + self.chunk_pages, pages)) for start in range(0, pages, self.chunk_pages)]
+        try:
+            executor = self._get_executor()
+            futures = [executor.submit(extract_page_range, file_path, backend, start, stop) for start, stop in ranges]
+        except BrokenProcessPool:
+            self._discard_executor()
+            raise
+
+        try:
+            for (start, _), future in zip(ranges, futures):
+                try:
+                    yield from future.result(timeout=max(0.0, deadline - time.monotonic()))
+                except FutureTimeoutError:
+                    self._budget_exceeded(start, pages)
+                    return
+                except BrokenProcessPool:
+                    self._discard_executor()
+                    raise
+        finally:
+            # Gerador abandonado ou orçamento estourado: faixas ainda na fila não são processadas
+            for future in futures:
+                future.cancel()
+
+    def _budget_exceeded(self, page_num: int, pages: int):
+        logger.warning(f"⚠️ Orçamento de {self.time_budget:g}s da extração de PDF esgotado na página {page_num + 1} de {pages}")
+        pdf_extract_truncated_total.inc(reason='time_budget')
+
+    def extract_text(self, file_path: str, backend: Optional[str] = None) -> str:
+        """Texto completo, unido uma única vez"""
+        return "\n".join(self.iter_pages(file_path, backend))
+
+    def reset_after_fork(self):
+        """O pool pertence ao processo que o criou"""
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+# Instância global
+pdf_text_extractor = PDFTextExtractor()
+register_after_fork('pdf_text_extractor', pdf_text_extractor.reset_after_fork)
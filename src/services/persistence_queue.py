@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Persistence Queue
+Persistência write-behind das análises no Supabase, em lotes e com retry
+"""
+
+import os
+import copy
+import time
+import uuid
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Any, Tuple, ContextManager
+from database import db_manager
+from services.metrics import registry
+from services.fork_safety import register_after_fork
+from utils.sqlite_utils import ThreadLocalConnections
+
+logger = logging.getLogger(__name__)
+
+persistence_writes_total = registry.counter(
+    'arqv30_persistence_writes_total', 'Análises processadas pela fila de persistência', ('result',)
+)
+persistence_queue_depth = registry.gauge(
+    'arqv30_persistence_queue_depth', 'Análises aguardando gravação no banco'
+)
+
+class AnalysisPersistenceQueue:
+    """Fila em background que grava análises em lote; o status de cada uma fica em SQLite, visível a todos os workers"""
+
+    def __init__(self, cache_dir: str = "cache"):
+        self.batch_size = int(os.getenv('PERSISTENCE_BATCH_SIZE', 20))
+        self.flush_interval = float(os.getenv('PERSISTENCE_FLUSH_INTERVAL', 1.0))
+        self.max_retries = int(os.getenv('PERSISTENCE_MAX_RETRIES', 5))
+        self.retry_base_delay = float(os.getenv('PERSISTENCE_RETRY_BASE_DELAY', 0.5))
+        self.retry_max_delay = float(os.getenv('PERSISTENCE_RETRY_MAX_DELAY', 30.0))
+        self.shutdown_timeout = float(os.getenv('PERSISTENCE_SHUTDOWN_TIMEOUT', 20.0))
+
+        self.cache_dir = cache_dir
+        self.db_path = os.path.join(cache_dir, "persistence_jobs.db")
+        self._connections = ThreadLocalConnections(self.db_path)
+        self._db_ready = False
+        self._init_lock = threading.Lock()
+
+        self._queue: 'queue.Queue[Tuple[str, Dict[str, Any]]]' = queue.Queue(maxsize=int(os.getenv('PERSISTENCE_QUEUE_SIZE', 1000)))
+        # Enfileiradas + em gravação; só volta a zero quando o lote termina
+        self._outstanding = 0
+        self._lock = threading.Lock()
+        self._draining = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        if not self._db_ready:
+            self._init_database()
+        return self._connections.transaction()
+
+    def _init_database(self):
+        """Cria a tabela de status das gravações pendentes"""
+        with self._init_lock:
+            if self._db_ready:
+                return
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with self._connections.transaction() as conn:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS persistence_jobs (
+                            pending_id TEXT PRIMARY KEY,
+                            status TEXT NOT NULL,
+                            database_id INTEGER,
+                            attempts INTEGER NOT NULL DEFAULT 0,
+                            error TEXT,
+                            updated_at REAL NOT NULL
+                        )
+                    """)
+                    # Status só interessa por algumas horas após a análise
+                    conn.execute("DELETE FROM persistence_jobs WHERE updated_at < ?", (time.time() - 86400,))
+                    conn.commit()
+                self._db_ready = True
+            except Exception as e:
+                logger.error(f"Erro ao inicializar status da fila de persistência: {e}")
+
+    def _set_status(self, pending_ids: List[str], status: str, attempts: int = 0, error: Optional[str] = None, database_ids: Optional[List[int]] = None):
+        try:
+            now = time.time()
+            ids = database_ids or [None] * len(pending_ids)
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO persistence_jobs (pending_id, status, database_id, attempts, error, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(pending_id, status, database_id, attempts, error, now) for pending_id, database_id in zip(pending_ids, ids)]
+                )
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao registrar status de persistência: {e}")
+
+    def enqueue(self, analysis_data: Dict[str, Any]) -> Optional[str]:
+        """Agenda a gravação e retorna o ID pendente (None se o banco estiver indisponível ou a fila cheia)"""
+        if not db_manager.available:
+            return None
+
+        self._ensure_worker()
+        pending_id = uuid.uuid4().hex
+        # Registrado antes de enfileirar para não sobrescrever um 'saved' já gravado pela thread
+        self._set_status([pending_id], 'pending')
+        with self._lock:
+            self._outstanding += 1
+        # Cópia profunda: mudanças posteriores do chamador (inclusive em dicts aninhados) não chegam à linha enfileirada
+        try:
+            self._queue.put_nowait((pending_id, copy.deepcopy(analysis_data)))
+        except queue.Full:
+            logger.error("❌ Fila de persistência cheia - análise não será salva")
+            persistence_writes_total.inc(result='dropped')
+            with self._lock:
+                self._outstanding -= 1
+            self._set_status([pending_id], 'failed', error='Fila de persistência cheia')
+            return None
+
+        persistence_queue_depth.inc()
+        return pending_id
+
+    def get_status(self, pending_id: str) -> Optional[Dict[str, Any]]:
+        """Status de uma gravação pendente, consultável de qualquer worker"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT status, database_id, attempts, error, updated_at FROM persistence_jobs WHERE pending_id = ?",
+                    (pending_id,)
+                ).fetchone()
+        except Exception as e:
+            logger.error(f"Erro ao consultar status de persistência: {e}")
+            return None
+
+        if not row:
+            return None
+        return {
+            'pending_id': pending_id,
+            'status': row[0],
+            'database_id': row[1],
+            'attempts': row[2],
+            'error': row[3],
+            'updated_at': row[4]
+        }
+
+    def _ensure_worker(self):
+        if self._worker_pid == os.getpid() and self._worker and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid() and self._worker and self._worker.is_alive():
+                return
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name='persistence-writer', daemon=True)
+            self._worker.start()
+
+    def _next_batch(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Bloqueia até a primeira análise e agrupa as que chegarem até flush_interval"""
+        batch = [self._queue.get()]
+        deadline = time.time() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            remaining = 0 if self._draining.is_set() else deadline - time.time()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                logger.error(f"❌ Erro inesperado na fila de persistência: {e}")
+                self._set_status([pending_id for pending_id, _ in batch], 'failed', error=str(e))
+            finally:
+                with self._lock:
+                    self._outstanding -= len(batch)
+                persistence_queue_depth.dec(len(batch))
+
+    def _write_batch(self, batch: List[Tuple[str, Dict[str, Any]]]):
+        """Grava o lote com backoff exponencial entre tentativas; se ele nunca passar, grava linha a linha"""
+        pending_ids, rows = [], []
+        for pending_id, analysis_data in batch:
+            try:
+                rows.append(db_manager.build_analysis_row(analysis_data))
+                pending_ids.append(pending_id)
+            except Exception as e:
+                logger.error(f"❌ Análise {pending_id} não pôde ser convertida em linha: {e}")
+                persistence_writes_total.inc(result='failed')
+                self._set_status([pending_id], 'failed', error=str(e))
+        if not rows:
+            return
+
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                saved = db_manager.insert_analyses(rows)
+            except Exception as e:
+                if attempt == self.max_retries and len(rows) > 1:
+                    # Uma linha rejeitada (JSONB inválido, payload grande demais) derruba o lote inteiro
+                    logger.warning(f"⚠️ Lote de {len(rows)} análises rejeitado após {attempt} tentativas: {e} - gravando uma a uma")
+                    self._write_rows_individually(pending_ids, rows, attempt)
+                    return
+                if attempt == self.max_retries:
+                    logger.error(f"❌ Lote de {len(rows)} análises descartado após {attempt} tentativas: {e}")
+                    persistence_writes_total.inc(len(rows), result='failed')
+                    self._set_status(pending_ids, 'failed', attempts=attempt, error=str(e))
+                    return
+
+                delay = min(self.retry_base_delay * (2 ** (attempt - 1)), self.retry_max_delay)
+                logger.warning(f"⚠️ Falha ao gravar lote de {len(rows)} análises (tentativa {attempt}): {e} - nova tentativa em {delay:.1f}s")
+                persistence_writes_total.inc(len(rows), result='retry')
+                self._set_status(pending_ids, 'retrying', attempts=attempt, error=str(e))
+                # Durante o encerramento o backoff fica limitado a 1s
+                if self._draining.wait(delay):
+                    time.sleep(min(delay, 1.0))
+                continue
+
+            database_ids = [row['id'] for row in saved]
+            self._set_status(pending_ids, 'saved', attempts=attempt, database_ids=database_ids)
+            persistence_writes_total.inc(len(rows), result='saved')
+            logger.info(f"✅ {len(rows)} análise(s) gravadas no banco: {database_ids}")
+            return
+
+    def _write_rows_individually(self, pending_ids: List[str], rows: List[Dict[str, Any]], attempts: int):
+        """Última tentativa de um lote rejeitado: só as linhas recusadas pelo banco ficam como 'failed'"""
+        for pending_id, row in zip(pending_ids, rows):
+            try:
+                saved = db_manager.insert_analyses([row])
+            except Exception as e:
+                logger.error(f"❌ Análise {pending_id} rejeitada pelo banco: {e}")
+                persistence_writes_total.inc(result='failed')
+                self._set_status([pending_id], 'failed', attempts=attempts + 1, error=str(e))
+                continue
+
+            self._set_status([pending_id], 'saved', attempts=attempts + 1, database_ids=[saved[0]['id']])
+            persistence_writes_total.inc(result='saved')
+            logger.info(f"✅ Análise gravada individualmente no banco: {saved[0]['id']}")
+
+    def pending_count(self) -> int:
+        """Análises enfileiradas ou sendo gravadas neste worker"""
+        with self._lock:
+            return self._outstanding
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Grava o que estiver pendente (chamado no encerramento); retorna False se o prazo estourar"""
+        if self._worker_pid != os.getpid() or not self.pending_count():
+            return True
+
+        timeout = self.shutdown_timeout if timeout is None else timeout
+        self._draining.set()
+        deadline = time.time() + timeout
+        try:
+            while self.pending_count() and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            self._draining.clear()
+
+        remaining = self.pending_count()
+        if remaining:
+            logger.error(f"❌ {remaining} análise(s) não gravadas antes do encerramento")
+            return False
+        logger.info("💾 Fila de persistência esvaziada")
+        return True
+
+    def reset_after_fork(self):
+        """Fila, thread e locks são por worker"""
+        self._connections.reset_after_fork()
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._outstanding = 0
+        self._lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        self._draining = threading.Event()
+        self._worker = None
+        self._worker_pid = None
+
+# Instância global
+persistence_queue = AnalysisPersistenceQueue()
+register_after_fork('persistence_queue', persistence_queue.reset_after_fork)
+atexit.register(persistence_queue.flush)
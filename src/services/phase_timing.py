@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Phase Timing
+Medição do tempo gasto em cada fase do pipeline de análise
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Optional, Any, Iterator, Tuple
+from services.metrics import pipeline_phase_seconds
+from services.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+# Fases conhecidas do pipeline, na ordem em que são executadas
+PIPELINE_PHASES = ['search', 'extraction', 'llm', 'drivers', 'predictions', 'db_save', 'pdf']
+
+_current_recorder: ContextVar[Optional['PhaseRecorder']] = ContextVar('phase_recorder', default=None)
+
+class PhaseRecorder:
+    """Acumula duração e número de chamadas de cada fase de uma requisição"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float):
+        """Soma duração a uma fase"""
+        with self._lock:
+            self.durations[phase] = self.durations.get(phase, 0.0) + seconds
+            self.calls[phase] = self.calls.get(phase, 0) + 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Durações em milissegundos, com total e tempo não atribuído a nenhuma fase"""
+        total_ms = (time.perf_counter() - self.started_at) * 1000
+        with self._lock:
+            phases = {
+                phase: {'ms': round(seconds * 1000, 2), 'calls': self.calls[phase]}
+                for phase, seconds in self.durations.items()
+            }
+            attributed_ms = sum(seconds for seconds in self.durations.values()) * 1000
+
+        return {
+            'phases': phases,
+            'total_ms': round(total_ms, 2),
+            'other_ms': round(max(total_ms - attributed_ms, 0.0), 2)
+        }
+
+    def server_timing_header(self) -> str:
+        """Valor do cabeçalho Server-Timing para a resposta HTTP"""
+        timings = self.as_dict()
+        entries = [f"{phase};dur={data['ms']}" for phase, data in timings['phases'].items()]
+        entries.append(f"total;dur={timings['total_ms']}")
+        return ', '.join(entries)
+
+def get_current_recorder() -> Optional[PhaseRecorder]:
+    """Retorna o recorder ativo no contexto atual"""
+    return _current_recorder.get()
+
+def start_recording() -> Tuple[PhaseRecorder, Token]:
+    """Ativa um novo recorder no contexto atual (usado pelos hooks do Flask)"""
+    recorder = PhaseRecorder()
+    return recorder, _current_recorder.set(recorder)
+
+def stop_recording(token: Token):
+    """Restaura o recorder anterior"""
+    _current_recorder.reset(token)
+
+@contextmanager
+def phase_recording() -> Iterator[PhaseRecorder]:
+    """Ativa um recorder para o bloco (normalmente uma requisição inteira)"""
+    recorder, token = start_recording()
+    try:
+        yield recorder
+    finally:
+        stop_recording(token)
+
+@contextmanager
+def record_phase(phase: str, **attributes) -> Iterator[Any]:
+    """Mede o bloco, soma ao recorder ativo, alimenta o histograma e abre um span da fase"""
+    start = time.perf_counter()
+    try:
+        with start_span(phase, **attributes) as span:
+            yield span
+    finally:
+        elapsed = time.perf_counter() - start
+        pipeline_phase_seconds.observe(elapsed, phase=phase)
+        recorder = _current_recorder.get()
+        if recorder is not None:
+            recorder.add(phase, elapsed)
@@ -11,14 +11,20 @@ import time
 import requests
 import hashlib
 import sqlite3
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, ContextManager
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
 import re
 from datetime import datetime
 import random
+import threading
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
 import chardet
+from services.stub_providers import resolve_url, polite_delay
+from services.metrics import extraction_attempts_total, extraction_seconds, cache_requests_total
+from services.tracing import begin_span, end_span, set_attribute, wrap_context
+from services.fork_safety import register_after_fork
+from utils.sqlite_utils import ThreadLocalConnections
 
 logger = logging.getLogger(__name__)
 
@@ -28,14 +34,17 @@ class ProductionContentExtractor:
     def __init__(self):
         """Inicializa o extrator de conteúdo para produção"""
         self.jina_api_key = os.getenv('JINA_API_KEY')
-        self.jina_reader_url = "https://r.jina.ai/"
+        self.jina_reader_url = resolve_url("https://r.jina.ai/")
         self.request_timeout = int(os.getenv('REQUEST_TIMEOUT', 30))
         
         # Cache para conteúdo extraído
         self.cache_dir = "cache"
-        os.makedirs(self.cache_dir, exist_ok=True)
         self.cache_db = os.path.join(self.cache_dir, "content_cache.db")
-        self._init_cache_db()
+        self._connections = ThreadLocalConnections(self.cache_db)
+        
+        # Banco criado no primeiro acesso, não no import
+        self._db_ready = False
+        self._init_lock = threading.Lock()
         
         # User agents rotativos
         self.user_agents = [
@@ -55,26 +64,38 @@ class ProductionContentExtractor:
         
         logger.info("🚀 Production Content Extractor inicializado")
     
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        """Conexão da thread (reaproveitada), com timeout para acesso concorrente entre threads e workers"""
+        if not self._db_ready:
+            self._init_cache_db()
+        return self._connections.transaction()
+    
     def _init_cache_db(self):
         """Inicializa banco de dados para cache de conteúdo"""
-        try:
-            with sqlite3.connect(self.cache_db) as conn:
-                conn.execute("""
-                    CREATE TABLE IF NOT EXISTS content_cache (
-                        url_hash TEXT PRIMARY KEY,
-                        url TEXT NOT NULL,
-                        content TEXT NOT NULL,
-                        metadata TEXT,
-                        timestamp REAL NOT NULL,
-                        ttl INTEGER DEFAULT 3600
-                    )
-                """)
-                conn.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_content_timestamp ON content_cache(timestamp)
-                """)
-                conn.commit()
-        except Exception as e:
-            logger.error(f"Erro ao inicializar cache de conteúdo: {e}")
+        with self._init_lock:
+            if self._db_ready:
+                return
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with self._connections.transaction() as conn:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS content_cache (
+                            url_hash TEXT PRIMARY KEY,
+                            url TEXT NOT NULL,
+                            content TEXT NOT NULL,
+                            metadata TEXT,
+                            timestamp REAL NOT NULL,
+                            ttl INTEGER DEFAULT 3600
+                        )
+                    """)
+                    conn.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_content_timestamp ON content_cache(timestamp)
+                    """)
+                    conn.commit()
+                self._db_ready = True
+            except Exception as e:
+                logger.error(f"Erro ao inicializar cache de conteúdo: {e}")
     
     def _get_url_hash(self, url: str) -> str:
         """Gera hash único para URL"""
@@ -88,7 +109,7 @@ class ProductionContentExtractor:
         try:
             url_hash = self._get_url_hash(url)
             
-            with sqlite3.connect(self.cache_db) as conn:
+            with self._connect() as conn:
                 cursor = conn.execute(
                     "SELECT content, timestamp, ttl FROM content_cache WHERE url_hash = ?",
                     (url_hash,)
@@ -101,12 +122,16 @@ class ProductionContentExtractor:
                     # Verifica se não expirou
                     if time.time() - timestamp < ttl:
                         logger.info(f"📦 Cache hit para URL: {url[:50]}...")
+                        cache_requests_total.inc(cache='content', result='hit')
+                        set_attribute('cache.hit', True)
                         return content
                     else:
                         # Remove entrada expirada
                         conn.execute("DELETE FROM content_cache WHERE url_hash = ?", (url_hash,))
                         conn.commit()
                 
+                cache_requests_total.inc(cache='content', result='miss')
+                set_attribute('cache.hit', False)
                 return None
                 
         except Exception as e:
@@ -124,7 +149,7 @@ class ProductionContentExtractor:
             ttl = int(os.getenv('CACHE_TTL', 3600))
             metadata_str = str(metadata) if metadata else ""
             
-            with sqlite3.connect(self.cache_db) as conn:
+            with self._connect() as conn:
                 conn.execute("""
                     INSERT OR REPLACE INTO content_cache 
                     (url_hash, url, content, metadata, timestamp, ttl) 
@@ -171,10 +196,16 @@ class ProductionContentExtractor:
         
         # Tenta cada estratégia em ordem de prioridade
         for strategy in self.extraction_strategies:
+            if strategy == 'jina_reader_api' and not self.jina_api_key:
+                continue
+            
+            start = time.perf_counter()
+            result = 'empty'
+            span, span_token = begin_span('extract.strategy', strategy=strategy, url=url)
             try:
                 logger.debug(f"🔧 Tentando estratégia: {strategy}")
                 
-                if strategy == 'jina_reader_api' and self.jina_api_key:
+                if strategy == 'jina_reader_api':
                     content = self._extract_with_jina_api(url)
                 elif strategy == 'readability_extraction':
                     content = self._extract_with_readability(url)
@@ -186,6 +217,7 @@ class ProductionContentExtractor:
                     continue
                 
                 if content and len(content.strip()) > 100:  # Conteúdo substancial
+                    result = 'success'
                     logger.info(f"✅ Conteúdo extraído com {strategy}: {len(content)} caracteres")
                     
                     # Salva no cache
@@ -194,8 +226,15 @@ class ProductionContentExtractor:
                     return content
                     
             except Exception as e:
+                result = 'error'
+                span.set_error(str(e))
                 logger.warning(f"⚠️ Estratégia {strategy} falhou para {url}: {str(e)}")
                 continue
+            finally:
+                span.set_attribute('result', result)
+                end_span(span, span_token)
+                extraction_seconds.observe(time.perf_counter() - start, strategy=strategy)
+                extraction_attempts_total.inc(strategy=strategy, result=result)
         
         logger.error(f"❌ Todas as estratégias falharam para {url}")
         return None
@@ -247,7 +286,7 @@ class ProductionContentExtractor:
             headers = self._get_headers()
             
             # Delay anti-detecção
-            time.sleep(random.uniform(0.5, 1.5))
+            polite_delay(random.uniform(0.5, 1.5))
             
             response = requests.get(
                 url,
@@ -682,7 +721,7 @@ class ProductionContentExtractor:
         results = {}
         
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_url = {executor.submit(self.extract_content, url): url for url in urls}
+            future_to_url = {executor.submit(wrap_context(self.extract_content), url): url for url in urls}
             
             for future in as_completed(future_to_url, timeout=120):
                 url = future_to_url[future]
@@ -699,12 +738,18 @@ class ProductionContentExtractor:
         """Limpa cache de conteúdo"""
         try:
             if os.path.exists(self.cache_db):
-                with sqlite3.connect(self.cache_db) as conn:
+                with self._connect() as conn:
                     conn.execute("DELETE FROM content_cache")
                     conn.commit()
                 logger.info("🗑️ Cache de conteúdo limpo")
         except Exception as e:
             logger.error(f"Erro ao limpar cache de conteúdo: {e}")
+    
+    def reset_after_fork(self):
+        """Recria o lock de inicialização do cache herdado do master"""
+        self._connections.reset_after_fork()
+        self._init_lock = threading.Lock()
 
 # Instância global para produção
-production_content_extractor = ProductionContentExtractor()
\ No newline at end of file
+production_content_extractor = ProductionContentExtractor()
+register_after_fork('production_content_extractor', production_content_extractor.reset_after_fork)
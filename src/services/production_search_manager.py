@@ -12,7 +12,7 @@ import requests
 import json
 import hashlib
 import random
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, ContextManager
 from urllib.parse import quote_plus, urljoin
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
@@ -21,6 +21,12 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import pickle
 import sqlite3
 from dataclasses import dataclass
+from services.quota_ledger import quota_ledger
+from services.stub_providers import resolve_url, polite_delay
+from services.metrics import search_requests_total, search_request_seconds, cache_requests_total
+from services.tracing import start_span, set_attribute, wrap_context
+from services.fork_safety import register_after_fork
+from utils.sqlite_utils import ThreadLocalConnections
 
 logger = logging.getLogger(__name__)
 
@@ -45,28 +51,43 @@ class ProductionSearchCache:
         self.cache_dir = cache_dir
         self.ttl = ttl
         self.db_path = os.path.join(cache_dir, "search_cache.db")
-        os.makedirs(cache_dir, exist_ok=True)
-        self._init_database()
+        self._connections = ThreadLocalConnections(self.db_path)
+        
+        # Banco criado no primeiro acesso, não no import
+        self._db_ready = False
+        self._init_lock = threading.Lock()
+    
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        """Conexão da thread (reaproveitada), com timeout para acesso concorrente entre threads e workers"""
+        if not self._db_ready:
+            self._init_database()
+        return self._connections.transaction()
     
     def _init_database(self):
         """Inicializa banco de dados SQLite para cache"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    CREATE TABLE IF NOT EXISTS search_cache (
-                        query_hash TEXT PRIMARY KEY,
-                        query TEXT NOT NULL,
-                        results BLOB NOT NULL,
-                        timestamp REAL NOT NULL,
-                        ttl INTEGER NOT NULL
-                    )
-                """)
-                conn.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_timestamp ON search_cache(timestamp)
-                """)
-                conn.commit()
-        except Exception as e:
-            logger.error(f"Erro ao inicializar cache: {e}")
+        with self._init_lock:
+            if self._db_ready:
+                return
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with self._connections.transaction() as conn:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS search_cache (
+                            query_hash TEXT PRIMARY KEY,
+                            query TEXT NOT NULL,
+                            results BLOB NOT NULL,
+                            timestamp REAL NOT NULL,
+                            ttl INTEGER NOT NULL
+                        )
+                    """)
+                    conn.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_timestamp ON search_cache(timestamp)
+                    """)
+                    conn.commit()
+                self._db_ready = True
+            except Exception as e:
+                logger.error(f"Erro ao inicializar cache: {e}")
     
     def _get_query_hash(self, query: str, provider: str = "") -> str:
         """Gera hash único para query"""
@@ -81,7 +102,7 @@ class ProductionSearchCache:
         try:
             query_hash = self._get_query_hash(query, provider)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.execute(
                     "SELECT results, timestamp, ttl FROM search_cache WHERE query_hash = ?",
                     (query_hash,)
@@ -95,6 +116,8 @@ class ProductionSearchCache:
                     if time.time() - timestamp < ttl:
                         results = pickle.loads(results_blob)
                         logger.info(f"✅ Cache hit para query: {query[:50]}...")
+                        cache_requests_total.inc(cache='search', result='hit')
+                        set_attribute('cache.hit', True)
                         return results
                     else:
                         # Remove entrada expirada
@@ -102,6 +125,8 @@ class ProductionSearchCache:
                         conn.commit()
                         logger.info(f"🗑️ Cache expirado removido para: {query[:50]}...")
                 
+                cache_requests_total.inc(cache='search', result='miss')
+                set_attribute('cache.hit', False)
                 return None
                 
         except Exception as e:
@@ -119,7 +144,7 @@ class ProductionSearchCache:
             timestamp = time.time()
             ttl = int(os.getenv('SEARCH_CACHE_TTL', self.ttl))
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 conn.execute("""
                     INSERT OR REPLACE INTO search_cache 
                     (query_hash, query, results, timestamp, ttl) 
@@ -137,7 +162,7 @@ class ProductionSearchCache:
         try:
             current_time = time.time()
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.execute(
                     "SELECT COUNT(*) FROM search_cache WHERE ? - timestamp > ttl",
                     (current_time,)
@@ -158,10 +183,12 @@ class ProductionSearchManager:
     def __init__(self):
         """Inicializa o gerenciador de busca para produção"""
         self.cache = ProductionSearchCache()
-        self.rate_limiter = {}
         self.error_counts = {}
         self.last_cleanup = time.time()
         
+        # Protege contadores de erro e estado dos provedores entre threads
+        self._lock = threading.Lock()
+        
         # Configurações de produção
         self.max_retries = int(os.getenv('SEARCH_MAX_RETRIES', 3))
         self.retry_delay = float(os.getenv('SEARCH_RETRY_DELAY', 2.0))
@@ -267,56 +294,42 @@ class ProductionSearchManager:
         return base_headers
     
     def _check_rate_limit(self, provider: str) -> bool:
-        """Verifica rate limiting"""
-        current_time = time.time()
-        
-        if provider not in self.rate_limiter:
-            self.rate_limiter[provider] = []
-        
-        # Remove requisições antigas (última hora)
-        self.rate_limiter[provider] = [
-            req_time for req_time in self.rate_limiter[provider]
-            if current_time - req_time < 3600
-        ]
-        
-        # Verifica limite
-        limit = self.providers[provider]['rate_limit']
-        if len(self.rate_limiter[provider]) >= limit:
+        """Verifica se o provedor ainda tem quota (dia/mês/hora) para mais uma requisição"""
+        if not quota_ledger.has_capacity(provider):
             logger.warning(f"⚠️ Rate limit atingido para {provider}")
             return False
         
         return True
     
     def _record_request(self, provider: str):
-        """Registra requisição para rate limiting"""
-        if provider not in self.rate_limiter:
-            self.rate_limiter[provider] = []
-        
-        self.rate_limiter[provider].append(time.time())
+        """Registra requisição no ledger de quotas"""
+        quota_ledger.record(provider)
     
     def _handle_provider_error(self, provider: str, error: Exception):
         """Gerencia erros de provedores"""
-        self.error_counts[provider] = self.error_counts.get(provider, 0) + 1
-        self.providers[provider]['error_count'] = self.error_counts[provider]
-        self.providers[provider]['last_error'] = str(error)
-        
-        # Desabilita temporariamente se muitos erros
-        if self.error_counts[provider] >= 5:
-            logger.error(f"❌ Provedor {provider} desabilitado temporariamente (muitos erros)")
-            self.providers[provider]['enabled'] = False
-            # Reabilita após 1 hora
-            self.providers[provider]['quota_reset'] = time.time() + 3600
+        with self._lock:
+            self.error_counts[provider] = self.error_counts.get(provider, 0) + 1
+            self.providers[provider]['error_count'] = self.error_counts[provider]
+            self.providers[provider]['last_error'] = str(error)
+            
+            # Desabilita temporariamente se muitos erros
+            if self.error_counts[provider] >= 5:
+                logger.error(f"❌ Provedor {provider} desabilitado temporariamente (muitos erros)")
+                self.providers[provider]['enabled'] = False
+                # Reabilita após 1 hora
+                self.providers[provider]['quota_reset'] = time.time() + 3600
     
     def _reset_provider_if_needed(self, provider: str):
         """Reabilita provedor se tempo de reset passou"""
-        if (not self.providers[provider]['enabled'] and 
-            self.providers[provider]['quota_reset'] and
-            time.time() > self.providers[provider]['quota_reset']):
-            
-            logger.info(f"🔄 Reabilitando provedor {provider}")
-            self.providers[provider]['enabled'] = True
-            self.providers[provider]['quota_reset'] = None
-            self.error_counts[provider] = 0
+        with self._lock:
+            if (not self.providers[provider]['enabled'] and 
+                self.providers[provider]['quota_reset'] and
+                time.time() > self.providers[provider]['quota_reset']):
+                
+                logger.info(f"🔄 Reabilitando provedor {provider}")
+                self.providers[provider]['enabled'] = True
+                self.providers[provider]['quota_reset'] = None
+                self.error_counts[provider] = 0
     
     def search_google_custom(self, query: str, max_results: int = 10) -> List[SearchResult]:
         """Busca usando Google Custom Search API com validação robusta"""
@@ -346,7 +359,7 @@ class ProductionSearchManager:
             if len(cse_id) < 10:
                 logger.warning("⚠️ GOOGLE_CSE_ID pode estar incorreto")
             
-            url = "https://www.googleapis.com/customsearch/v1"
+            url = resolve_url("https://www.googleapis.com/customsearch/v1")
             params = {
                 'key': api_key,
                 'cx': cse_id,
@@ -456,7 +469,7 @@ class ProductionSearchManager:
                 self.providers[provider]['enabled'] = False
                 return []
             
-            url = "https://google.serper.dev/search"
+            url = resolve_url("https://google.serper.dev/search")
             headers = {
                 **self._get_headers('serper'),
                 'X-API-KEY': api_key,
@@ -522,9 +535,12 @@ class ProductionSearchManager:
             if not self.providers[provider]['enabled']:
                 return []
         
+        if not self._check_rate_limit(provider):
+            return []
+        
         try:
             # URL com parâmetros otimizados
-            search_url = f"https://www.bing.com/search"
+            search_url = resolve_url("https://www.bing.com/search")
             params = {
                 'q': query,
                 'cc': 'br',
@@ -537,7 +553,7 @@ class ProductionSearchManager:
             headers = self._get_headers('bing')
             
             # Adiciona delay para evitar detecção
-            time.sleep(random.uniform(1.0, 2.0))
+            polite_delay(random.uniform(1.0, 2.0))
             
             self._record_request(provider)
             
@@ -611,7 +627,7 @@ class ProductionSearchManager:
                 
             elif response.status_code == 429:
                 logger.warning("⚠️ Bing: Rate limit detectado")
-                time.sleep(5)
+                polite_delay(5)
                 return []
                 
             else:
@@ -632,6 +648,9 @@ class ProductionSearchManager:
             if not self.providers[provider]['enabled']:
                 return []
         
+        if not self._check_rate_limit(provider):
+            return []
+        
         try:
             # DuckDuckGo requer abordagem em duas etapas
             # 1. Primeira requisição para obter token
@@ -639,14 +658,14 @@ class ProductionSearchManager:
             session.headers.update(self._get_headers('duckduckgo'))
             
             # Delay anti-detecção
-            time.sleep(random.uniform(1.5, 3.0))
+            polite_delay(random.uniform(1.5, 3.0))
             
             # Primeira requisição
-            initial_url = "https://duckduckgo.com/"
+            initial_url = resolve_url("https://duckduckgo.com/")
             session.get(initial_url, timeout=self.request_timeout)
             
             # Segunda requisição com busca
-            search_url = "https://html.duckduckgo.com/html/"
+            search_url = resolve_url("https://html.duckduckgo.com/html/")
             params = {
                 'q': query,
                 'b': '',
@@ -742,6 +761,20 @@ class ProductionSearchManager:
             self._handle_provider_error(provider, e)
             return []
     
+    def _run_provider_search(self, provider_name: str, search_func, query: str, max_results: int) -> List[SearchResult]:
+        """Executa busca do provedor registrando latência e resultado nas métricas"""
+        start = time.perf_counter()
+        status = 'error'
+        with start_span('search.provider', provider=provider_name, query=query) as span:
+            try:
+                results = search_func(query, max_results)
+                status = 'ok' if results else 'empty'
+                span.set_attribute('results', len(results))
+                return results
+            finally:
+                search_request_seconds.observe(time.perf_counter() - start, provider=provider_name)
+                search_requests_total.inc(provider=provider_name, status=status)
+    
     def search_with_fallback(self, query: str, max_results: int = 10) -> List[SearchResult]:
         """Busca com sistema de fallback robusto"""
         
@@ -754,10 +787,10 @@ class ProductionSearchManager:
         all_results = []
         successful_providers = []
         
-        # Ordena provedores por prioridade e disponibilidade
+        # Ordena provedores por prioridade e disponibilidade, desviando dos que estão perto da quota
         available_providers = [
             (name, config) for name, config in self.providers.items()
-            if config['enabled'] and config['error_count'] < 5
+            if config['enabled'] and config['error_count'] < 5 and quota_ledger.has_capacity(name)
         ]
         available_providers.sort(key=lambda x: x[1]['priority'])
         
@@ -767,13 +800,13 @@ class ProductionSearchManager:
             
             for provider_name, config in available_providers:
                 if provider_name == 'google':
-                    future = executor.submit(self.search_google_custom, query, max_results // 2)
+                    future = executor.submit(wrap_context(self._run_provider_search), provider_name, self.search_google_custom, query, max_results // 2)
                 elif provider_name == 'serper':
-                    future = executor.submit(self.search_serper, query, max_results // 2)
+                    future = executor.submit(wrap_context(self._run_provider_search), provider_name, self.search_serper, query, max_results // 2)
                 elif provider_name == 'bing':
-                    future = executor.submit(self.search_bing_scraping, query, max_results // 2)
+                    future = executor.submit(wrap_context(self._run_provider_search), provider_name, self.search_bing_scraping, query, max_results // 2)
                 elif provider_name == 'duckduckgo':
-                    future = executor.submit(self.search_duckduckgo_scraping, query, max_results // 3)
+                    future = executor.submit(wrap_context(self._run_provider_search), provider_name, self.search_duckduckgo_scraping, query, max_results // 3)
                 else:
                     continue
                 
@@ -828,45 +861,54 @@ class ProductionSearchManager:
         status = {}
         
         for name, config in self.providers.items():
+            quota = quota_ledger.get_remaining(name).get(name, {})
             status[name] = {
                 'enabled': config['enabled'],
                 'priority': config['priority'],
                 'error_count': config['error_count'],
                 'last_error': config.get('last_error'),
                 'rate_limited': bool(config.get('quota_reset')) and config.get('quota_reset', 0) > time.time(),
-                'requests_today': len(self.rate_limiter.get(name, [])),
-                'rate_limit': config['rate_limit']
+                'rate_limit': config['rate_limit'],
+                'quota': quota
             }
         
         return status
     
     def reset_provider_errors(self, provider_name: str = None):
         """Reset contadores de erro"""
-        if provider_name:
-            if provider_name in self.providers:
-                self.providers[provider_name]['error_count'] = 0
-                self.providers[provider_name]['enabled'] = True
-                self.providers[provider_name]['quota_reset'] = None
-                self.error_counts[provider_name] = 0
-                logger.info(f"🔄 Reset erros do provedor: {provider_name}")
-        else:
-            for name in self.providers:
-                self.providers[name]['error_count'] = 0
-                self.providers[name]['enabled'] = True
-                self.providers[name]['quota_reset'] = None
-                self.error_counts[name] = 0
-            logger.info("🔄 Reset erros de todos os provedores")
+        with self._lock:
+            if provider_name:
+                if provider_name in self.providers:
+                    self.providers[provider_name]['error_count'] = 0
+                    self.providers[provider_name]['enabled'] = True
+                    self.providers[provider_name]['quota_reset'] = None
+                    self.error_counts[provider_name] = 0
+                    logger.info(f"🔄 Reset erros do provedor: {provider_name}")
+            else:
+                for name in self.providers:
+                    self.providers[name]['error_count'] = 0
+                    self.providers[name]['enabled'] = True
+                    self.providers[name]['quota_reset'] = None
+                    self.error_counts[name] = 0
+                logger.info("🔄 Reset erros de todos os provedores")
     
     def clear_cache(self):
         """Limpa todo o cache"""
         try:
             if os.path.exists(self.cache.db_path):
-                with sqlite3.connect(self.cache.db_path) as conn:
+                with self.cache._connect() as conn:
                     conn.execute("DELETE FROM search_cache")
                     conn.commit()
                 logger.info("🗑️ Cache limpo completamente")
         except Exception as e:
             logger.error(f"Erro ao limpar cache: {e}")
+    
+    def reset_after_fork(self):
+        """Descarta as conexões SQLite do cache e recria os locks herdados do master"""
+        self.cache._connections.reset_after_fork()
+        self._lock = threading.Lock()
+        self.cache._init_lock = threading.Lock()
 
 # Instância global para produção
-production_search_manager = ProductionSearchManager()
\ No newline at end of file
+production_search_manager = ProductionSearchManager()
+register_after_fork('production_search_manager', production_search_manager.reset_after_fork)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Profiler
+Captura de perfis sob demanda (cProfile ou amostragem) nos workers de produção
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import signal
+import cProfile
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Set
+from services.fork_safety import register_after_fork
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'sampling')
+
+class _SamplingSession:
+    """Amostra periodicamente a pilha de todas as threads do worker (formato collapsed)"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f'thread-{ident}'))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def dump(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+class ProfileHandle:
+    """Perfil em andamento de uma requisição"""
+
+    def __init__(self, label: str, mode: str, session_id: Optional[str]):
+        self.label = label
+        self.mode = mode
+        self.session_id = session_id
+        self.started_at = time.perf_counter()
+        self.collector: Any = None
+
+class RequestProfiler:
+    """Arma a captura de perfis para as próximas N requisições ou para sessões específicas"""
+
+    def __init__(self):
+        self.output_dir = os.getenv('PROFILE_DIR', os.path.join('logs', 'profiles'))
+        self.default_mode = os.getenv('PROFILE_MODE', 'cprofile')
+        self.default_requests = int(os.getenv('PROFILE_SIGNAL_REQUESTS', 5))
+        self.sample_interval = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 5)) / 1000
+        self.session_ttl = float(os.getenv('PROFILE_SESSION_TTL', 3600))
+
+        # Único atributo lido no caminho da requisição quando nada está armado
+        self.armed = False
+        self.mode = self.default_mode
+        self.remaining = 0
+        self.session_ids: Set[str] = set()
+        self.route: Optional[str] = None
+        self.expires_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def arm(
+        self,
+        requests: int = 0,
+        session_id: Optional[str] = None,
+        mode: Optional[str] = None,
+        route: Optional[str] = None,
+        ttl_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Arma o profiler neste worker; sem lock porque também é chamado pelo handler de sinal"""
+        mode = mode or self.default_mode
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Modo de perfil inválido: {mode} (use {', '.join(PROFILE_MODES)})")
+        if not requests and not session_id:
+            requests = self.default_requests
+        if session_id and not ttl_seconds:
+            ttl_seconds = self.session_ttl
+
+        self.mode = mode
+        self.route = route
+        self.remaining = max(int(requests), 0)
+        self.session_ids = {session_id} if session_id else set()
+        self.expires_at = time.time() + ttl_seconds if ttl_seconds else None
+        self.armed = True
+
+        logger.info(
+            f"📈 Profiler armado no worker {os.getpid()}: modo={mode} "
+            f"requisições={self.remaining} sessão={session_id or '-'} rota={route or '*'}"
+        )
+        return self.status()
+
+    def disarm(self):
+        """Desarma o profiler neste worker"""
+        self.armed = False
+        self.remaining = 0
+        self.session_ids = set()
+        self.route = None
+        self.expires_at = None
+
+    def begin(self, label: str, route: Optional[str] = None, session_id: Optional[str] = None) -> Optional[ProfileHandle]:
+        """Inicia a captura se a requisição se encaixa no que foi armado"""
+        if not self.armed:
+            return None
+
+        with self._lock:
+            if self.expires_at is not None and time.time() > self.expires_at:
+                logger.info("📈 Profiler expirado - desarmando")
+                self.disarm()
+                return None
+            if self.route and route != self.route:
+                return None
+
+            if self.session_ids:
+                if session_id not in self.session_ids:
+                    return None
+            elif self.remaining > 0:
+                self.remaining -= 1
+                if self.remaining == 0:
+                    self.armed = False
+            else:
+                self.armed = False
+                return None
+
+            handle = ProfileHandle(label, self.mode, session_id)
+
+        if handle.mode == 'sampling':
+            handle.collector = _SamplingSession(self.sample_interval)
+            handle.collector.start()
+        else:
+            handle.collector = cProfile.Profile()
+            handle.collector.enable()
+        return handle
+
+    def finish(self, handle: ProfileHandle) -> Optional[str]:
+        """Encerra a captura e grava o arquivo do perfil no diretório do worker"""
+        elapsed_ms = (time.perf_counter() - handle.started_at) * 1000
+
+        if handle.mode == 'sampling':
+            handle.collector.stop()
+            extension = 'collapsed'
+        else:
+            handle.collector.disable()
+            extension = 'prof'
+
+        directory = os.path.join(self.output_dir, str(os.getpid()))
+        parts = [datetime.now().strftime('%Y%m%d-%H%M%S-%f'), _safe_name(handle.label)]
+        if handle.session_id:
+            parts.append(_safe_name(handle.session_id))
+        path = os.path.join(directory, f"{'-'.join(parts)}.{extension}")
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if handle.mode == 'sampling':
+                handle.collector.dump(path)
+            else:
+                handle.collector.dump_stats(path)
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar perfil {path}: {e}")
+            return None
+
+        logger.info(f"📈 Perfil salvo em {path} ({elapsed_ms:.0f} ms)")
+        return path
+
+    def status(self) -> Dict[str, Any]:
+        """Estado do profiler neste worker"""
+        return {
+            'pid': os.getpid(),
+            'armed': self.armed,
+            'mode': self.mode,
+            'remaining_requests': self.remaining,
+            'session_ids': sorted(self.session_ids),
+            'route': self.route,
+            'expires_at': datetime.fromtimestamp(self.expires_at).isoformat() if self.expires_at else None,
+            'output_dir': self.output_dir
+        }
+
+    def list_profiles(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Perfis gravados por todos os workers, mais recentes primeiro"""
+        profiles = []
+        if not os.path.isdir(self.output_dir):
+            return profiles
+
+        for pid in os.listdir(self.output_dir):
+            directory = os.path.join(self.output_dir, pid)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                profiles.append({
+                    'pid': pid,
+                    'file': path,
+                    'size_bytes': os.path.getsize(path),
+                    'modified_at': os.path.getmtime(path)
+                })
+
+        profiles.sort(key=lambda item: item['modified_at'], reverse=True)
+        for item in profiles:
+            item['modified_at'] = datetime.fromtimestamp(item['modified_at']).isoformat()
+        return profiles[:limit]
+
+    def install_signal_handler(self, signum: int = signal.SIGUSR2):
+        """Arma o profiler ao receber o sinal (nos workers, nunca no master do gunicorn)"""
+        signal.signal(signum, self._handle_signal)
+
+    def _handle_signal(self, signum, frame):
+        # Parâmetros opcionais em PROFILE_DIR/arm.json, ex.: {"requests": 3, "mode": "sampling"}
+        options: Dict[str, Any] = {}
+        arm_file = os.path.join(self.output_dir, 'arm.json')
+        if os.path.exists(arm_file):
+            try:
+                with open(arm_file, 'r', encoding='utf-8') as f:
+                    options = json.load(f)
+            except Exception as e:
+                logger.warning(f"⚠️ Arquivo {arm_file} inválido: {e}")
+
+        try:
+            self.arm(
+                requests=options.get('requests', self.default_requests),
+                session_id=options.get('session_id'),
+                mode=options.get('mode'),
+                route=options.get('route'),
+                ttl_seconds=options.get('ttl_seconds')
+            )
+        except ValueError as e:
+            logger.warning(f"⚠️ {e}")
+
+    def reset_after_fork(self):
+        """Cada worker começa desarmado e com lock próprio"""
+        self._lock = threading.Lock()
+        self.disarm()
+
+def _safe_name(value: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.]+', '_', value).strip('_')[:80]
+
+# Instância global
+profiler = RequestProfiler()
+register_after_fork('profiler', profiler.reset_after_fork)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Quota Ledger
+Contabilidade persistente de requisições e tokens por provedor
+"""
+
+import os
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Any, ContextManager
+from services.fork_safety import register_after_fork
+from utils.sqlite_utils import ThreadLocalConnections
+
+logger = logging.getLogger(__name__)
+
+# Formato do bucket de cada janela (calendário UTC)
+WINDOW_FORMATS = {
+    'minute': '%Y-%m-%dT%H:%M',
+    'hour': '%Y-%m-%dT%H',
+    'day': '%Y-%m-%d',
+    'month': '%Y-%m'
+}
+
+# Quotas conhecidas dos provedores (sobrescritas por QUOTA_<PROVEDOR>_<JANELA>_<TIPO>)
+DEFAULT_LIMITS = {
+    'google': {'day': {'requests': 100}},
+    'serper': {'month': {'requests': 2500}},
+    'bing': {'hour': {'requests': 1000}},
+    'duckduckgo': {'hour': {'requests': 500}},
+    'gemini': {
+        'minute': {'requests': 15, 'tokens': 1000000},
+        'day': {'requests': 1500}
+    },
+    'openai': {'minute': {'requests': 3500, 'tokens': 60000}},
+    'huggingface': {'hour': {'requests': 300}}
+}
+
+class QuotaLedger:
+    """Ledger de quotas por provedor com janelas de minuto/hora/dia/mês"""
+
+    def __init__(self, cache_dir: str = "cache"):
+        """Inicializa o ledger de quotas"""
+        self.cache_dir = cache_dir
+        self.db_path = os.path.join(cache_dir, "quota_ledger.db")
+        self._connections = ThreadLocalConnections(self.db_path)
+
+        # Fração da quota a partir da qual o provedor deixa de receber tráfego
+        self.safety_margin = float(os.getenv('QUOTA_SAFETY_MARGIN', 0.95))
+        self.retention_days = int(os.getenv('QUOTA_RETENTION_DAYS', 40))
+
+        self.limits = self._load_limits()
+        self._lock = threading.Lock()
+
+        # Provedores hoje sem capacidade: o aviso sai só na transição, não a cada seleção
+        self._throttled: Dict[str, str] = {}
+        self._throttled_lock = threading.Lock()
+        
+        # Banco criado no primeiro acesso, não no import
+        self._db_ready = False
+        self._init_lock = threading.Lock()
+
+        logger.info(f"Quota Ledger inicializado com {len(self.limits)} provedores monitorados")
+
+    def _load_limits(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """Carrega limites padrão aplicando overrides do ambiente"""
+        limits = {}
+
+        for provider, windows in DEFAULT_LIMITS.items():
+            limits[provider] = {}
+            for window, kinds in windows.items():
+                limits[provider][window] = {}
+                for kind, value in kinds.items():
+                    env_name = f"QUOTA_{provider.upper()}_{window.upper()}_{kind.upper()}"
+                    limits[provider][window][kind] = int(os.getenv(env_name, value))
+
+        return limits
+
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        """Conexão da thread (reaproveitada), com timeout para acesso concorrente entre workers"""
+        if not self._db_ready:
+            self._init_database()
+        return self._connections.transaction()
+
+    def _init_database(self):
+        """Inicializa tabela de consumo e descarta buckets antigos"""
+        with self._init_lock:
+            if self._db_ready:
+                return
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with self._connections.transaction() as conn:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS quota_usage (
+                            provider TEXT NOT NULL,
+                            window TEXT NOT NULL,
+                            bucket TEXT NOT NULL,
+                            requests INTEGER NOT NULL DEFAULT 0,
+                            tokens INTEGER NOT NULL DEFAULT 0,
+                            updated_at REAL NOT NULL,
+                            PRIMARY KEY (provider, window, bucket)
+                        )
+                    """)
+                    conn.commit()
+                    self._purge_old_buckets(conn)
+                self._db_ready = True
+            except Exception as e:
+                logger.error(f"Erro ao inicializar ledger de quotas: {e}")
+
+    def _purge_old_buckets(self, conn: sqlite3.Connection):
+        """Remove buckets antigos que não influenciam mais nenhuma janela"""
+        try:
+            cutoff = time.time() - self.retention_days * 86400
+            conn.execute("DELETE FROM quota_usage WHERE updated_at < ?", (cutoff,))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Erro ao limpar ledger de quotas: {e}")
+
+    def _bucket(self, window: str, now: Optional[datetime] = None) -> str:
+        """Retorna identificador do bucket atual da janela"""
+        now = now or datetime.now(timezone.utc)
+        return now.strftime(WINDOW_FORMATS[window])
+
+    def _window_reset(self, window: str, now: datetime) -> datetime:
+        """Calcula quando a janela atual termina"""
+        if window == 'minute':
+            return now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        if window == 'hour':
+            return now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        if window == 'day':
+            return now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        # Mês
+        first = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        return (first + timedelta(days=32)).replace(day=1)
+
+    def record(self, provider: str, requests: int = 1, tokens: int = 0):
+        """Registra consumo de um provedor em todas as janelas monitoradas"""
+        windows = self.limits.get(provider)
+        if not windows:
+            return
+
+        now = datetime.now(timezone.utc)
+
+        try:
+            with self._lock, self._connect() as conn:
+                for window in windows:
+                    conn.execute("""
+                        INSERT INTO quota_usage (provider, window, bucket, requests, tokens, updated_at)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(provider, window, bucket) DO UPDATE SET
+                            requests = requests + excluded.requests,
+                            tokens = tokens + excluded.tokens,
+                            updated_at = excluded.updated_at
+                    """, (provider, window, self._bucket(window, now), requests, tokens, time.time()))
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Erro ao registrar consumo de {provider}: {e}")
+
+    def get_usage(self, provider: str) -> Dict[str, Dict[str, int]]:
+        """Retorna consumo atual do provedor por janela"""
+        usage = {}
+        windows = self.limits.get(provider, {})
+        if not windows:
+            return usage
+
+        now = datetime.now(timezone.utc)
+
+        try:
+            with self._connect() as conn:
+                for window in windows:
+                    row = conn.execute(
+                        "SELECT requests, tokens FROM quota_usage WHERE provider = ? AND window = ? AND bucket = ?",
+                        (provider, window, self._bucket(window, now))
+                    ).fetchone()
+                    usage[window] = {
+                        'requests': row[0] if row else 0,
+                        'tokens': row[1] if row else 0
+                    }
+        except Exception as e:
+            logger.error(f"Erro ao consultar consumo de {provider}: {e}")
+
+        return usage
+
+    def has_capacity(self, provider: str, requests: int = 1, tokens: int = 0) -> bool:
+        """Verifica se o provedor comporta a chamada sem se aproximar do limite"""
+        windows = self.limits.get(provider)
+        if not windows:
+            return True
+
+        usage = self.get_usage(provider)
+        planned = {'requests': requests, 'tokens': tokens}
+
+        for window, kinds in windows.items():
+            for kind, limit in kinds.items():
+                used = usage.get(window, {}).get(kind, 0)
+                if used + planned[kind] > limit * self.safety_margin:
+                    reason = f"{kind}/{window}"
+                    with self._throttled_lock:
+                        changed = self._throttled.get(provider) != reason
+                        self._throttled[provider] = reason
+                    if changed:
+                        logger.warning(f"⚠️ Quota de {provider} próxima do limite ({reason}: {used}/{limit})")
+                    else:
+                        logger.debug(f"Quota de {provider} ainda próxima do limite ({reason}: {used}/{limit})")
+                    return False
+
+        with self._throttled_lock:
+            recovered = self._throttled.pop(provider, None)
+        if recovered:
+            logger.info(f"✅ Quota de {provider} liberada, provedor volta a receber tráfego")
+        return True
+
+    def get_usage_ratio(self, provider: str) -> float:
+        """Maior fração de quota consumida entre as janelas do provedor"""
+        windows = self.limits.get(provider)
+        if not windows:
+            return 0.0
+
+        usage = self.get_usage(provider)
+        ratios = [
+            usage.get(window, {}).get(kind, 0) / limit
+            for window, kinds in windows.items()
+            for kind, limit in kinds.items()
+            if limit > 0
+        ]
+        return max(ratios) if ratios else 0.0
+
+    def get_remaining(self, provider: Optional[str] = None) -> Dict[str, Any]:
+        """Retorna quota restante por provedor e janela"""
+        providers = [provider] if provider else list(self.limits.keys())
+        now = datetime.now(timezone.utc)
+        report = {}
+
+        for name in providers:
+            windows = self.limits.get(name, {})
+            usage = self.get_usage(name)
+            report[name] = {}
+
+            for window, kinds in windows.items():
+                entry = {'resets_at': self._window_reset(window, now).isoformat()}
+                for kind, limit in kinds.items():
+                    used = usage.get(window, {}).get(kind, 0)
+                    entry[kind] = {
+                        'limit': limit,
+                        'used': used,
+                        'remaining': max(limit - used, 0)
+                    }
+                report[name][window] = entry
+
+        return report
+
+    def reset_after_fork(self):
+        """Recria locks herdados do master; os contadores ficam no SQLite, compartilhado entre workers"""
+        self._connections.reset_after_fork()
+        self._lock = threading.Lock()
+        self._throttled_lock = threading.Lock()
+        self._init_lock = threading.Lock()
+
+# Instância global
+quota_ledger = QuotaLedger()
+register_after_fork('quota_ledger', quota_ledger.reset_after_fork)
+
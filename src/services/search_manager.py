@@ -8,11 +8,17 @@ Gerenciador inteligente de múltiplos serviços de busca com fallback automátic
 import os
 import logging
 import time
+import threading
 import requests
 from typing import Dict, List, Optional, Any
 from urllib.parse import quote_plus
 from bs4 import BeautifulSoup
 import json
+from services.quota_ledger import quota_ledger
+from services.stub_providers import resolve_url, polite_delay
+from services.metrics import search_requests_total, search_request_seconds
+from services.tracing import start_span
+from services.fork_safety import register_after_fork
 
 logger = logging.getLogger(__name__)
 
@@ -60,6 +66,9 @@ class SearchManager:
             'Connection': 'keep-alive'
         }
         
+        # Protege contadores de erro entre threads
+        self._lock = threading.Lock()
+        
         self.initialize_providers()
         logger.info(f"Search Manager inicializado com {len([p for p in self.providers.values() if p['available']])} provedores disponíveis")
     
@@ -79,21 +88,19 @@ class SearchManager:
         logger.info("✅ Bing e DuckDuckGo sempre disponíveis (scraping)")
     
     def get_best_provider(self) -> Optional[str]:
-        """Retorna o melhor provedor disponível"""
-        available_providers = [
+        """Retorna o melhor provedor disponível; None se nenhum tiver quota"""
+        with_capacity = [
             (name, provider) for name, provider in self.providers.items() 
-            if provider['available'] and provider['error_count'] < 3
+            if provider['available'] and quota_ledger.has_capacity(name)
         ]
+        available_providers = [(name, provider) for name, provider in with_capacity if provider['error_count'] < 3]
         
-        if not available_providers:
-            # Reset error counts se todos falharam
-            for provider in self.providers.values():
-                if provider['available']:
+        if not available_providers and with_capacity:
+            # Reset error counts se todos falharam, só entre os que ainda têm quota
+            with self._lock:
+                for _, provider in with_capacity:
                     provider['error_count'] = 0
-            available_providers = [
-                (name, provider) for name, provider in self.providers.items() 
-                if provider['available']
-            ]
+            available_providers = with_capacity
         
         if available_providers:
             # Ordena por prioridade e menor número de erros
@@ -113,27 +120,53 @@ class SearchManager:
         logger.info(f"🔍 Usando provedor de busca: {provider_name}")
         
         try:
-            if provider_name == 'google':
-                return self._search_google(query, max_results)
-            elif provider_name == 'serper':
-                return self._search_serper(query, max_results)
-            elif provider_name == 'bing':
-                return self._search_bing(query, max_results)
-            elif provider_name == 'duckduckgo':
-                return self._search_duckduckgo(query, max_results)
+            return self._dispatch_search(provider_name, query, max_results)
         except Exception as e:
             logger.error(f"❌ Erro no provedor {provider_name}: {str(e)}")
-            self.providers[provider_name]['error_count'] += 1
+            self._increment_error(provider_name)
             
             # Tenta próximo provedor
             return self._try_fallback_search(query, max_results, exclude=[provider_name])
         
         return []
     
+    def _increment_error(self, provider_name: str):
+        """Incrementa contador de erros do provedor de forma thread-safe"""
+        with self._lock:
+            self.providers[provider_name]['error_count'] += 1
+    
+    def _dispatch_search(self, provider_name: str, query: str, max_results: int) -> List[Dict[str, Any]]:
+        """Executa busca no provedor contabilizando quota, latência e resultado"""
+        quota_ledger.record(provider_name)
+        start = time.perf_counter()
+        status = 'error'
+        
+        with start_span('search.provider', provider=provider_name, query=query) as span:
+            try:
+                results = self._call_search_provider(provider_name, query, max_results)
+                status = 'ok' if results else 'empty'
+                span.set_attribute('results', len(results))
+                return results
+            finally:
+                search_request_seconds.observe(time.perf_counter() - start, provider=provider_name)
+                search_requests_total.inc(provider=provider_name, status=status)
+    
+    def _call_search_provider(self, provider_name: str, query: str, max_results: int) -> List[Dict[str, Any]]:
+        """Encaminha a busca para a implementação do provedor"""
+        if provider_name == 'google':
+            return self._search_google(query, max_results)
+        elif provider_name == 'serper':
+            return self._search_serper(query, max_results)
+        elif provider_name == 'bing':
+            return self._search_bing(query, max_results)
+        elif provider_name == 'duckduckgo':
+            return self._search_duckduckgo(query, max_results)
+        return []
+    
     def _search_google(self, query: str, max_results: int) -> List[Dict[str, Any]]:
         """Busca usando Google Custom Search API"""
         try:
-            url = "https://www.googleapis.com/customsearch/v1"
+            url = resolve_url("https://www.googleapis.com/customsearch/v1")
             params = {
                 'key': self.providers['google']['api_key'],
                 'cx': self.providers['google']['cse_id'],
@@ -183,7 +216,7 @@ class SearchManager:
     def _search_serper(self, query: str, max_results: int) -> List[Dict[str, Any]]:
         """Busca usando Serper API"""
         try:
-            url = "https://google.serper.dev/search"
+            url = resolve_url("https://google.serper.dev/search")
             headers = {
                 **self.headers,
                 'X-API-KEY': self.providers['serper']['api_key'],
@@ -225,7 +258,7 @@ class SearchManager:
     def _search_bing(self, query: str, max_results: int) -> List[Dict[str, Any]]:
         """Busca usando Bing (scraping)"""
         try:
-            search_url = f"https://www.bing.com/search?q={quote_plus(query)}&cc=br&setlang=pt-br&count={max_results}"
+            search_url = resolve_url(f"https://www.bing.com/search?q={quote_plus(query)}&cc=br&setlang=pt-br&count={max_results}")
             
             response = requests.get(search_url, headers=self.headers, timeout=15)
             
@@ -265,7 +298,7 @@ class SearchManager:
     def _search_duckduckgo(self, query: str, max_results: int) -> List[Dict[str, Any]]:
         """Busca usando DuckDuckGo (scraping)"""
         try:
-            search_url = f"https://html.duckduckgo.com/html/?q={quote_plus(query)}"
+            search_url = resolve_url(f"https://html.duckduckgo.com/html/?q={quote_plus(query)}")
             
             response = requests.get(search_url, headers=self.headers, timeout=15)
             
@@ -330,20 +363,16 @@ class SearchManager:
             if self.providers[provider_name]['error_count'] >= 3:
                 continue
             
+            if not quota_ledger.has_capacity(provider_name):
+                continue
+            
             logger.info(f"🔄 Tentando fallback de busca para: {provider_name}")
             
             try:
-                if provider_name == 'google':
-                    return self._search_google(query, max_results)
-                elif provider_name == 'serper':
-                    return self._search_serper(query, max_results)
-                elif provider_name == 'bing':
-                    return self._search_bing(query, max_results)
-                elif provider_name == 'duckduckgo':
-                    return self._search_duckduckgo(query, max_results)
+                return self._dispatch_search(provider_name, query, max_results)
             except Exception as e:
                 logger.warning(f"⚠️ Fallback de busca {provider_name} falhou: {str(e)}")
-                self.providers[provider_name]['error_count'] += 1
+                self._increment_error(provider_name)
                 continue
         
         logger.error("❌ Todos os provedores de busca de fallback falharam")
@@ -360,26 +389,19 @@ class SearchManager:
             if self.providers[provider_name]['error_count'] >= 3:
                 continue
             
+            if not quota_ledger.has_capacity(provider_name):
+                continue
+            
             try:
                 logger.info(f"🔍 Buscando em {provider_name}...")
-                
-                if provider_name == 'google':
-                    results = self._search_google(query, max_results_per_provider)
-                elif provider_name == 'serper':
-                    results = self._search_serper(query, max_results_per_provider)
-                elif provider_name == 'bing':
-                    results = self._search_bing(query, max_results_per_provider)
-                elif provider_name == 'duckduckgo':
-                    results = self._search_duckduckgo(query, max_results_per_provider)
-                else:
-                    continue
+                results = self._dispatch_search(provider_name, query, max_results_per_provider)
                 
                 all_results.extend(results)
-                time.sleep(1)  # Rate limiting
+                polite_delay(1)  # Rate limiting
                 
             except Exception as e:
                 logger.warning(f"⚠️ Erro em {provider_name}: {str(e)}")
-                self.providers[provider_name]['error_count'] += 1
+                self._increment_error(provider_name)
                 continue
         
         # Remove duplicatas baseado na URL
@@ -410,14 +432,21 @@ class SearchManager:
     
     def reset_provider_errors(self, provider_name: str = None):
         """Reset contadores de erro"""
-        if provider_name:
-            if provider_name in self.providers:
-                self.providers[provider_name]['error_count'] = 0
-                logger.info(f"🔄 Reset erros do provedor de busca: {provider_name}")
-        else:
-            for provider in self.providers.values():
-                provider['error_count'] = 0
-            logger.info("🔄 Reset erros de todos os provedores de busca")
+        with self._lock:
+            if provider_name:
+                if provider_name in self.providers:
+                    self.providers[provider_name]['error_count'] = 0
+                    logger.info(f"🔄 Reset erros do provedor de busca: {provider_name}")
+            else:
+                for provider in self.providers.values():
+                    provider['error_count'] = 0
+                logger.info("🔄 Reset erros de todos os provedores de busca")
+    
+    def reset_after_fork(self):
+        """Recria o lock herdado do master"""
+        self._lock = threading.Lock()
 
 # Instância global
 search_manager = SearchManager()
+register_after_fork('search_manager', search_manager.reset_after_fork)
+
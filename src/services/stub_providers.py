@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Stub Providers
+Provedores locais determinísticos (IA, busca e páginas) para benchmarks offline
+"""
+
+import os
+import re
+import json
+import time
+import math
+import random
+import hashlib
+import logging
+import threading
+from html import escape
+from typing import Dict, List, Optional, Any, Tuple
+from urllib.parse import urlsplit, parse_qs, quote_plus, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+STUB_ENABLED = os.getenv('STUB_PROVIDERS_ENABLED', 'false').lower() == 'true'
+STUB_BASE_URL = os.getenv('STUB_PROVIDERS_URL', 'http://127.0.0.1:8765').rstrip('/')
+
+# Credenciais fictícias para que todos os provedores sejam habilitados em modo stub
+STUB_CREDENTIALS = {
+    'GEMINI_API_KEY': 'stub-gemini-key-000000000000000000000000',
+    'OPENAI_API_KEY': 'stub-openai-key-000000000000000000000000',
+    'HUGGINGFACE_API_KEY': 'stub-huggingface-key-0000000000000000000',
+    'GOOGLE_SEARCH_KEY': 'stub-google-search-key-00000000000000000',
+    'GOOGLE_CSE_ID': 'stub-google-cse-id-00',
+    'SERPER_API_KEY': 'stub-serper-key-000000000000000000000000',
+    'JINA_API_KEY': 'stub-jina-key-00000000000000000000000000'
+}
+
+# Latência padrão por rota do servidor stub (milissegundos)
+DEFAULT_LATENCIES = {
+    'gemini': 'lognormal:1800:0.35',
+    'openai': 'lognormal:2200:0.4',
+    'huggingface': 'lognormal:3000:0.5',
+    'google': 'lognormal:350:0.3',
+    'serper': 'lognormal:300:0.3',
+    'bing': 'lognormal:600:0.4',
+    'duckduckgo': 'lognormal:700:0.4',
+    'yahoo': 'lognormal:600:0.4',
+    'jina': 'lognormal:900:0.5',
+    'pages': 'lognormal:250:0.6'
+}
+
+# Host real -> rota do servidor stub
+HOST_ROUTES = {
+    'generativelanguage.googleapis.com': 'gemini',
+    'api.openai.com': 'openai',
+    'api-inference.huggingface.co': 'huggingface',
+    'www.googleapis.com': 'google',
+    'google.serper.dev': 'serper',
+    'www.bing.com': 'bing',
+    'html.duckduckgo.com': 'duckduckgo',
+    'duckduckgo.com': 'duckduckgo',
+    'br.search.yahoo.com': 'yahoo',
+    'r.jina.ai': 'jina',
+    'pages': 'pages'
+}
+
+def is_stub_mode() -> bool:
+    """Indica se os serviços devem usar os provedores stub"""
+    return STUB_ENABLED
+
+def resolve_url(url: str) -> str:
+    """Reescreve URL de provedor real para o servidor stub quando o modo stub está ativo"""
+    if not STUB_ENABLED:
+        return url
+
+    parts = urlsplit(url)
+    if not parts.netloc or f"{parts.scheme}://{parts.netloc}" == STUB_BASE_URL:
+        return url
+
+    resolved = f"{STUB_BASE_URL}/{parts.netloc}{parts.path}"
+    if parts.query:
+        resolved += f"?{parts.query}"
+    return resolved
+
+def polite_delay(seconds: float):
+    """Pausa anti-detecção/rate limiting, ignorada contra provedores stub"""
+    if STUB_ENABLED:
+        return
+    time.sleep(seconds)
+
+def configure_stub_environment():
+    """Preenche credenciais fictícias ausentes para habilitar todos os provedores"""
+    for name, value in STUB_CREDENTIALS.items():
+        os.environ.setdefault(name, value)
+
+class StubGenerateContentResponse:
+    """Resposta mínima compatível com google.generativeai"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+class StubGenerativeModel:
+    """Substituto do genai.GenerativeModel que fala com o servidor stub via REST"""
+
+    def __init__(self, model_name: str, session=None, timeout: int = 60):
+        from utils.http_utils import create_pooled_session
+
+        self.model_name = model_name
+        self.session = session or create_pooled_session()
+        self.timeout = timeout
+        self.url = resolve_url(
+            f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent"
+        )
+
+    def generate_content(self, prompt: str, generation_config=None, safety_settings=None):
+        """Gera conteúdo com a mesma assinatura usada pelo AIManager"""
+        payload = {
+            'contents': [{'parts': [{'text': prompt}]}],
+            'generationConfig': generation_config or {},
+            'safetySettings': safety_settings or []
+        }
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+
+        candidates = response.json().get('candidates', [])
+        text = candidates[0]['content']['parts'][0]['text'] if candidates else ''
+        return StubGenerateContentResponse(text)
+
+class LatencyModel:
+    """Distribuição de latência configurável: fixed, uniform, normal ou lognormal"""
+
+    def __init__(self, spec: str, scale: float = 1.0):
+        parts = spec.split(':')
+        self.distribution = parts[0]
+        self.params = [float(p) for p in parts[1:]]
+        self.scale = scale
+
+        if self.distribution not in ('fixed', 'uniform', 'normal', 'lognormal'):
+            raise ValueError(f"Distribuição de latência desconhecida: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        """Sorteia latência em segundos"""
+        if self.distribution == 'fixed':
+            value = self.params[0]
+        elif self.distribution == 'uniform':
+            value = rng.uniform(self.params[0], self.params[1])
+        elif self.distribution == 'normal':
+            value = rng.gauss(self.params[0], self.params[1])
+        else:
+            # Mediana e sigma do logaritmo
+            value = rng.lognormvariate(math.log(self.params[0]), self.params[1])
+
+        return max(value, 0.0) * self.scale / 1000.0
+
+class StubCorpus:
+    """Corpus de páginas determinístico (gerado por semente ou carregado de HTML gravado)"""
+
+    SENTENCES = [
+        "O mercado de {termo} cresceu {pct}% no último ano, segundo levantamento setorial com {n} empresas.",
+        "Consumidores de {termo} citam preço e confiança como os principais fatores de decisão em {pct}% dos casos.",
+        "A demanda por {termo} concentra-se nas regiões Sudeste e Sul, que somam {pct}% do faturamento nacional.",
+        "Empresas que investiram em {termo} relatam ticket médio de R$ {valor} e recompra de {pct}% em seis meses.",
+        "O público de {termo} tem entre 25 e 44 anos e consome conteúdo principalmente em redes sociais e vídeo.",
+        "Especialistas apontam que {termo} deve movimentar R$ {valor} milhões até 2027 no Brasil.",
+        "A principal objeção ao {termo} é a falta de tempo, mencionada por {pct}% dos entrevistados.",
+        "Concorrentes diretos em {termo} apostam em assinatura mensal e comunidades exclusivas.",
+        "Pesquisas qualitativas mostram frustração com soluções genéricas de {termo} e desejo por personalização.",
+        "O custo de aquisição de clientes em {termo} subiu {pct}% com o aumento da concorrência em anúncios."
+    ]
+
+    def __init__(self, seed: int = 42, size: int = 200, paragraphs: int = 12, corpus_dir: Optional[str] = None):
+        self.seed = seed
+        self.size = size
+        self.paragraphs = paragraphs
+        self.recorded_pages: Dict[str, Tuple[str, str]] = {}
+        self.recorded_search: Dict[str, str] = {}
+
+        if corpus_dir:
+            self._load_recorded(corpus_dir)
+
+    def _load_recorded(self, corpus_dir: str):
+        """Carrega páginas (pages/*.html) e resultados de busca (search/<rota>.html) gravados"""
+        pages_dir = os.path.join(corpus_dir, 'pages')
+        if os.path.isdir(pages_dir):
+            for filename in sorted(os.listdir(pages_dir)):
+                if not filename.endswith('.html'):
+                    continue
+                with open(os.path.join(pages_dir, filename), 'r', encoding='utf-8') as f:
+                    html = f.read()
+                match = re.search(r'<title>(.*?)</title>', html, re.IGNORECASE | re.DOTALL)
+                title = match.group(1).strip() if match else filename[:-5]
+                self.recorded_pages[filename[:-5]] = (title, html)
+
+        search_dir = os.path.join(corpus_dir, 'search')
+        if os.path.isdir(search_dir):
+            for filename in os.listdir(search_dir):
+                if filename.endswith('.html'):
+                    with open(os.path.join(search_dir, filename), 'r', encoding='utf-8') as f:
+                        self.recorded_search[filename[:-5]] = f.read()
+
+        logger.info(f"📚 Corpus gravado: {len(self.recorded_pages)} páginas, {len(self.recorded_search)} buscas")
+
+    def _rng(self, *keys: str) -> random.Random:
+        digest = hashlib.sha256(':'.join((str(self.seed),) + keys).encode('utf-8')).hexdigest()
+        return random.Random(int(digest[:16], 16))
+
+    def search(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        """Retorna resultados determinísticos para a query"""
+        rng = self._rng('search', query)
+        topic = query.strip() or 'mercado'
+
+        if self.recorded_pages:
+            page_ids = sorted(self.recorded_pages)
+            chosen = rng.sample(page_ids, min(max_results, len(page_ids)))
+            return [{
+                'id': page_id,
+                'title': self.recorded_pages[page_id][0],
+                'snippet': re.sub(r'<[^>]+>', ' ', self.recorded_pages[page_id][1])[:200].strip(),
+                'query': ''
+            } for page_id in chosen]
+
+        chosen = rng.sample(range(self.size), min(max_results, self.size))
+        return [{
+            'id': str(page_id),
+            'title': f"{topic.title()} - estudo de mercado {page_id}",
+            'snippet': self._sentence(self._rng('snippet', str(page_id), query), topic),
+            'query': query
+        } for page_id in chosen]
+
+    def _sentence(self, rng: random.Random, topic: str) -> str:
+        return rng.choice(self.SENTENCES).format(
+            termo=topic,
+            pct=rng.randint(5, 85),
+            n=rng.randint(50, 2000),
+            valor=rng.randint(30, 900)
+        )
+
+    def page_html(self, page_id: str, query: str = '') -> Optional[str]:
+        """HTML de uma página do corpus"""
+        if page_id in self.recorded_pages:
+            return self.recorded_pages[page_id][1]
+        if self.recorded_pages or not page_id.isdigit():
+            return None
+
+        rng = self._rng('page', page_id, query)
+        topic = query.strip() or 'mercado'
+        paragraphs = [
+            ' '.join(self._sentence(rng, topic) for _ in range(rng.randint(3, 6)))
+            for _ in range(self.paragraphs)
+        ]
+        body = '\n'.join(f"<p>{escape(p)}</p>" for p in paragraphs)
+        title = escape(f"{topic.title()} - estudo de mercado {page_id}")
+
+        return (
+            f"<!DOCTYPE html><html lang=\"pt-BR\"><head><meta charset=\"utf-8\"><title>{title}</title>"
+            f"<meta name=\"description\" content=\"{escape(paragraphs[0][:150])}\"></head>"
+            f"<body><nav><a href=\"/pages/{(int(page_id) + 1) % self.size}\">Próximo</a></nav>"
+            f"<main><article><h1>{title}</h1>\n{body}\n</article></main>"
+            f"<footer>Corpus stub ARQV30</footer></body></html>"
+        )
+
+    def page_text(self, page_id: str, query: str = '') -> Optional[str]:
+        """Texto limpo da página (formato Jina Reader)"""
+        html = self.page_html(page_id, query)
+        if html is None:
+            return None
+        text = re.sub(r'<(script|style)[^>]*>.*?</\1>', ' ', html, flags=re.DOTALL)
+        text = re.sub(r'</p>|<br\s*/?>', '\n', text)
+        return re.sub(r'[ \t]+', ' ', re.sub(r'<[^>]+>', ' ', text)).strip()
+
+class StubProviderServer:
+    """Servidor HTTP local que imita Gemini, OpenAI, HuggingFace, buscadores e páginas"""
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 8765,
+        seed: int = 42,
+        corpus_dir: Optional[str] = None,
+        latencies: Optional[Dict[str, str]] = None,
+        latency_scale: Optional[float] = None,
+        llm_response_file: Optional[str] = None
+    ):
+        self.host = host
+        self.port = port
+        self.corpus = StubCorpus(
+            seed=seed,
+            size=int(os.getenv('STUB_CORPUS_SIZE', 200)),
+            paragraphs=int(os.getenv('STUB_PAGE_PARAGRAPHS', 12)),
+            corpus_dir=corpus_dir or os.getenv('STUB_CORPUS_DIR')
+        )
+
+        scale = latency_scale if latency_scale is not None else float(os.getenv('STUB_LATENCY_SCALE', 1.0))
+        specs = dict(DEFAULT_LATENCIES)
+        for route in specs:
+            specs[route] = os.getenv(f"STUB_LATENCY_{route.upper()}", specs[route])
+        specs.update(latencies or {})
+        self.latencies = {route: LatencyModel(spec, scale) for route, spec in specs.items()}
+
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+        response_file = llm_response_file or os.getenv('STUB_LLM_RESPONSE_FILE')
+        self.llm_response = None
+        if response_file:
+            with open(response_file, 'r', encoding='utf-8') as f:
+                self.llm_response = f.read()
+
+        self.request_counts: Dict[str, int] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> 'StubProviderServer':
+        """Inicia o servidor em thread daemon"""
+        handler = type('StubHandler', (_StubRequestHandler,), {'stub': self})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"🧪 Servidor stub de provedores em {self.url}")
+        return self
+
+    def stop(self):
+        """Encerra o servidor"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def simulate_latency(self, route: str):
+        """Aplica latência sorteada da rota"""
+        model = self.latencies.get(route)
+        if not model:
+            return
+        with self._rng_lock:
+            delay = model.sample(self._rng)
+            self.request_counts[route] = self.request_counts.get(route, 0) + 1
+        if delay > 0:
+            time.sleep(delay)
+
+    def llm_text(self, prompt: str) -> str:
+        """Resposta canônica de IA: arquivo configurado ou o próprio esquema JSON pedido no prompt"""
+        if self.llm_response is not None:
+            return self.llm_response
+
+        match = re.search(r'```json\s*(.*?)```', prompt, re.DOTALL)
+        if match:
+            try:
+                schema = json.loads(match.group(1))
+                return f"```json\n{json.dumps(schema, ensure_ascii=False, indent=2)}\n```"
+            except ValueError:
+                pass
+
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+        return f"Análise stub {digest}: resposta determinística gerada para benchmark offline."
+
+    def search_results(self, route: str, query: str, max_results: int) -> List[Dict[str, str]]:
+        """Resultados de busca com URLs apontando para as páginas do servidor stub"""
+        results = self.corpus.search(query, max_results)
+        for result in results:
+            suffix = f"?q={quote_plus(result['query'])}" if result['query'] else ''
+            result['url'] = f"{self.url}/pages/{result['id']}{suffix}"
+        return results
+
+class _StubRequestHandler(BaseHTTPRequestHandler):
+    """Roteia requisições pelo host original embutido no caminho (/<host>/<caminho>)"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    stub: StubProviderServer = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _route(self) -> Tuple[str, str, Dict[str, List[str]]]:
+        parts = urlsplit(self.path)
+        segments = parts.path.lstrip('/').split('/', 1)
+        route = HOST_ROUTES.get(segments[0], '')
+        rest = '/' + (segments[1] if len(segments) > 1 else '')
+        return route, rest, parse_qs(parts.query)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length', 0))
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length).decode('utf-8'))
+        except ValueError:
+            return {}
+
+    def _send(self, status: int, body: Any, content_type: str = 'application/json'):
+        if not isinstance(body, (bytes, str)):
+            body = json.dumps(body, ensure_ascii=False)
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f"{content_type}; charset=utf-8")
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._send(200, b'')
+
+    def do_GET(self):
+        route, rest, params = self._route()
+        if not route:
+            return self._send(404, {'error': 'rota stub desconhecida'})
+
+        self.stub.simulate_latency(route)
+        query = params.get('q', params.get('p', ['']))[0]
+        max_results = int(params.get('num', params.get('count', ['10']))[0])
+
+        if route == 'openai' and rest.endswith('/models'):
+            return self._send(200, {'object': 'list', 'data': [{'id': 'gpt-3.5-turbo', 'object': 'model'}]})
+
+        if route == 'google':
+            items = [
+                {'title': r['title'], 'link': r['url'], 'snippet': r['snippet']}
+                for r in self.stub.search_results(route, query, max_results)
+            ]
+            return self._send(200, {'items': items})
+
+        if route in ('bing', 'duckduckgo', 'yahoo'):
+            return self._send(200, self._search_html(route, query, max_results), 'text/html')
+
+        if route == 'jina':
+            target = unquote(rest.lstrip('/'))
+            page_id, page_query = self._page_from_url(target)
+            text = self.stub.corpus.page_text(page_id, page_query) if page_id else None
+            if text is None:
+                return self._send(404, 'Error: página fora do corpus stub', 'text/plain')
+            return self._send(200, text, 'text/plain')
+
+        if route == 'pages':
+            html = self.stub.corpus.page_html(rest.strip('/'), query)
+            if html is None:
+                return self._send(404, '<html><body>Não encontrado</body></html>', 'text/html')
+            return self._send(200, html, 'text/html')
+
+        return self._send(200, {})
+
+    def do_POST(self):
+        route, rest, params = self._route()
+        payload = self._read_json()
+        if not route:
+            return self._send(404, {'error': 'rota stub desconhecida'})
+
+        self.stub.simulate_latency(route)
+
+        if route == 'gemini':
+            prompt = ''.join(
+                part.get('text', '')
+                for content in payload.get('contents', [])
+                for part in content.get('parts', [])
+            )
+            return self._send(200, {
+                'candidates': [{
+                    'content': {'role': 'model', 'parts': [{'text': self.stub.llm_text(prompt)}]},
+                    'finishReason': 'STOP'
+                }]
+            })
+
+        if route == 'openai':
+            prompt = '\n'.join(m.get('content', '') for m in payload.get('messages', []))
+            text = self.stub.llm_text(prompt)
+            return self._send(200, {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': payload.get('model', 'gpt-3.5-turbo'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': text},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {
+                    'prompt_tokens': len(prompt) // 4,
+                    'completion_tokens': len(text) // 4,
+                    'total_tokens': (len(prompt) + len(text)) // 4
+                }
+            })
+
+        if route == 'huggingface':
+            return self._send(200, [{'generated_text': self.stub.llm_text(payload.get('inputs', ''))}])
+
+        if route == 'serper':
+            organic = [
+                {'title': r['title'], 'link': r['url'], 'snippet': r['snippet'], 'position': i}
+                for i, r in enumerate(self.stub.search_results(route, payload.get('q', ''), int(payload.get('num', 10))), 1)
+            ]
+            return self._send(200, {'organic': organic})
+
+        return self._send(200, {})
+
+    def _page_from_url(self, url: str) -> Tuple[Optional[str], str]:
+        parts = urlsplit(url)
+        match = re.search(r'/pages/([^/?]+)', parts.path)
+        if not match:
+            return None, ''
+        return match.group(1), parse_qs(parts.query).get('q', [''])[0]
+
+    def _search_html(self, route: str, query: str, max_results: int) -> str:
+        """HTML no formato que os scrapers de cada buscador esperam"""
+        recorded = self.stub.corpus.recorded_search.get(route)
+        if recorded is not None:
+            return recorded.replace('{{STUB_URL}}', self.stub.url)
+
+        items = []
+        for r in self.stub.search_results(route, query, max_results):
+            title, url, snippet = escape(r['title']), escape(r['url']), escape(r['snippet'])
+            if route == 'bing':
+                items.append(
+                    f'<li class="b_algo"><h2><a href="{url}">{title}</a></h2>'
+                    f'<div class="b_caption"><p>{snippet}</p></div></li>'
+                )
+            elif route == 'duckduckgo':
+                items.append(
+                    f'<div class="result results_links"><h2 class="result__title">'
+                    f'<a class="result__a" href="{url}">{title}</a></h2>'
+                    f'<a class="result__snippet" href="{url}">{snippet}</a></div>'
+                )
+            else:
+                items.append(
+                    f'<div class="Sr"><h3><a href="{url}">{title}</a></h3>'
+                    f'<span class="fz-ms">{snippet}</span></div>'
+                )
+
+        wrapper = '<ol id="b_results">{}</ol>' if route == 'bing' else '<div id="results">{}</div>'
+        return f"<html><body>{wrapper.format(''.join(items))}</body></html>"
+
+if STUB_ENABLED:
+    configure_stub_environment()
+    logger.info(f"🧪 Modo stub ativo: provedores externos redirecionados para {STUB_BASE_URL}")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Tabular Extractor
+Leitura em streaming de planilhas e CSVs anexados: tabelas pequenas viram texto
+completo, tabelas grandes viram um resumo com estatísticas por coluna e uma
+amostra uniforme de linhas, com memória limitada ao tamanho do bloco
+"""
+
+import os
+import logging
+import zipfile
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional
+
+# pandas, numpy e openpyxl só são importados quando chega uma planilha
+
+logger = logging.getLogger(__name__)
+
+def _fmt(value: Any) -> str:
+    if isinstance(value, float):
+        if abs(value) >= 1e15:
+            return f"{value:.3e}"
+        if value.is_integer():
+            return f"{int(value):,}"
+        return f"{value:,.1f}" if abs(value) >= 1000 else f"{value:.4g}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+def _column_kind(series) -> str:
+    """Tipo da coluna pelo primeiro bloco; texto em ISO 8601 (comum em CSV) conta como data"""
+    import pandas as pd
+
+    if pd.api.types.is_bool_dtype(series):
+        return 'texto'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'numérico'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'data'
+    probe = series.dropna().head(50)
+    if len(probe) and probe.map(lambda value: isinstance(value, str)).all():
+        if pd.to_datetime(probe, errors='coerce', format='ISO8601').notna().all():
+            return 'data'
+    return 'texto'
+
+class _ColumnStats:
+    """Agregados de uma coluna, atualizados bloco a bloco"""
+
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.top = Counter()
+
+    def add(self, series, top_values: int):
+        import pandas as pd
+
+        if self.kind == 'numérico':
+            values = pd.to_numeric(series, errors='coerce').dropna().to_numpy(dtype='float64')
+            if values.size:
+                self.count += int(values.size)
+                self.total += float(values.sum())
+                self.total_sq += float((values * values).sum())
+                low, high = float(values.min()), float(values.max())
+                self.minimum = low if self.minimum is None else min(self.minimum, low)
+                self.maximum = high if self.maximum is None else max(self.maximum, high)
+        elif self.kind == 'data':
+            values = pd.to_datetime(series, errors='coerce', format='ISO8601').dropna()
+            if len(values):
+                self.count += len(values)
+                low, high = values.min(), values.max()
+                self.minimum = low if self.minimum is None else min(self.minimum, low)
+                self.maximum = high if self.maximum is None else max(self.maximum, high)
+        else:
+            values = series.dropna()
+            self.count += len(values)
+            self.top.update(values.astype(str).value_counts().to_dict())
+            # Mantém só os mais frequentes: contagem aproximada, memória constante
+            if len(self.top) > top_values * 20:
+                self.top = Counter(dict(self.top.most_common(top_values * 10)))
+
+    def describe(self, top_values: int) -> str:
+        line = f"- {self.name} ({self.kind}): {_fmt(self.count)} valores"
+        if self.kind == 'numérico' and self.count:
+            mean = self.total / self.count
+            variance = max(self.total_sq / self.count - mean * mean, 0.0)
+            line += (f", mín {_fmt(self.minimum)}, máx {_fmt(self.maximum)},"
+                     f" média {_fmt(mean)}, desvio {_fmt(variance ** 0.5)}")
+        elif self.kind == 'data' and self.count:
+            line += f", de {self.minimum.date()} a {self.maximum.date()}"
+        elif self.top and self.top.most_common(1)[0][1] == 1:
+            examples = ', '.join(value[:40] for value in list(self.top)[:3])
+            line += f", sem repetição entre os mais frequentes (ex.: {examples})"
+        elif self.top:
+            frequent = ', '.join(f"{value[:40]} ({_fmt(count)})" for value, count in self.top.most_common(top_values))
+            line += f", mais frequentes: {frequent}"
+        return line
+
+class _TableAccumulator:
+    """Consome blocos (DataFrames) de uma tabela e gera o texto final"""
+
+    def __init__(self, extractor: 'TabularExtractor', title: Optional[str] = None):
+        import numpy as np
+
+        self.extractor = extractor
+        self.title = title
+        self.rows = 0
+        self.total_columns = 0
+        self.columns: List[_ColumnStats] = []
+        self.head = None
+        self.sample = None
+        self.sample_keys = np.empty(0)
+        self.rng = np.random.default_rng(extractor.sample_seed)
+
+    def add(self, chunk):
+        import numpy as np
+        import pandas as pd
+
+        size = len(chunk)
+        if not size:
+            return
+        chunk.index = pd.RangeIndex(self.rows, self.rows + size)
+
+        if not self.columns:
+            self.total_columns = len(chunk.columns)
+            for position, name in enumerate(list(chunk.columns)[:self.extractor.max_columns]):
+                self.columns.append(_ColumnStats(str(name), _column_kind(chunk.iloc[:, position])))
+
+        chunk = chunk.iloc[:, :len(self.columns)]
+        for position, stats in enumerate(self.columns):
+            stats.add(chunk.iloc[:, position], self.extractor.top_values)
+
+        # Guarda o início da tabela até saber se ela cabe inteira no texto
+        if self.rows <= self.extractor.full_text_rows:
+            self.head = chunk if self.head is None else pd.concat([self.head, chunk])
+            self.head = self.head.iloc[:self.extractor.full_text_rows + 1]
+
+        # Amostra uniforme: as k linhas com as menores chaves aleatórias (bottom-k)
+        keys = self.rng.random(len(chunk))
+        k = self.extractor.sample_rows
+        if len(self.sample_keys) >= k:
+            keep = keys < self.sample_keys.max()
+            chunk, keys = chunk[keep], keys[keep]
+        if len(chunk):
+            candidates = chunk if self.sample is None else pd.concat([self.sample, chunk])
+            candidate_keys = np.concatenate([self.sample_keys, keys])
+            if len(candidate_keys) > k:
+                chosen = np.argpartition(candidate_keys, k - 1)[:k]
+                candidates, candidate_keys = candidates.iloc[chosen], candidate_keys[chosen]
+            self.sample, self.sample_keys = candidates, candidate_keys
+
+        self.rows += size
+
+    def render(self) -> str:
+        lines = [f"PLANILHA: {self.title}"] if self.title else []
+        if self.head is None:
+            lines.append("(vazia)")
+            return "\n".join(lines)
+
+        if self.rows <= self.extractor.full_text_rows and self.total_columns <= self.extractor.max_columns:
+            lines.append(self.head.to_string(index=False))
+            return "\n".join(lines)
+
+        shown = f" (resumo das primeiras {len(self.columns)})" if self.total_columns > len(self.columns) else ""
+        lines.append(f"Linhas: {_fmt(self.rows)} | Colunas: {self.total_columns}{shown}")
+        lines.append("Colunas:")
+        lines.extend(stats.describe(self.extractor.top_values) for stats in self.columns)
+        lines.append(f"Amostra de {len(self.sample)} linhas:")
+        lines.append(self.sample.sort_index().to_string())
+        return "\n".join(lines)
+
+class TabularExtractor:
+    """Planilhas (openpyxl em modo read-only) e CSVs (pandas em blocos) sem carregar o arquivo inteiro"""
+
+    def __init__(self):
+        self.chunk_rows = int(os.getenv('TABULAR_CHUNK_ROWS', 50000))
+        self.full_text_rows = int(os.getenv('TABULAR_FULL_TEXT_ROWS', 200))
+        self.sample_rows = int(os.getenv('TABULAR_SAMPLE_ROWS', 20))
+        self.max_columns = int(os.getenv('TABULAR_MAX_COLUMNS', 40))
+        self.top_values = int(os.getenv('TABULAR_TOP_VALUES', 5))
+        self.sample_seed = int(os.getenv('TABULAR_SAMPLE_SEED', 42))
+
+    def _summarize(self, chunks: Iterator, title: Optional[str] = None) -> str:
+        accumulator = _TableAccumulator(self, title)
+        for chunk in chunks:
+            accumulator.add(chunk)
+        return accumulator.render()
+
+    def extract_csv(self, file_path: str) -> str:
+        """CSV lido em blocos de TABULAR_CHUNK_ROWS linhas; recomeça em latin-1 se não for UTF-8"""
+        import pandas as pd
+
+        try:
+            return self._summarize(pd.read_csv(file_path, encoding='utf-8', chunksize=self.chunk_rows))
+        except UnicodeDecodeError:
+            return self._summarize(pd.read_csv(file_path, encoding='latin-1', chunksize=self.chunk_rows))
+
+    def extract_excel(self, file_path: str) -> str:
+        """Uma passada por planilha; .xls (formato binário antigo) cai no pandas, lido uma única vez"""
+        if not zipfile.is_zipfile(file_path):
+            import pandas as pd
+            sheets: Dict[str, Any] = pd.read_excel(file_path, sheet_name=None)
+            return "\n\n".join(self._summarize(iter([df]), name) for name, df in sheets.items())
+
+        from openpyxl import load_workbook
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            return "\n\n".join(
+                self._summarize(self._iter_sheet_chunks(sheet), sheet.title) for sheet in workbook.worksheets
+            )
+        finally:
+            workbook.close()
+
+    def _iter_sheet_chunks(self, sheet) -> Iterator:
+        import pandas as pd
+
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        columns, seen = [], Counter()
+        for position, name in enumerate(header):
+            name = str(name) if name is not None else f"coluna_{position + 1}"
+            seen[name] += 1
+            columns.append(name if seen[name] == 1 else f"{name}.{seen[name] - 1}")
+        width = len(columns)
+
+        batch = []
+        for row in rows:
+            if row is None or all(value is None for value in row):
+                continue
+            batch.append(tuple(row[:width]) + (None,) * (width - len(row)))
+            if len(batch) >= self.chunk_rows:
+                yield pd.DataFrame.from_records(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=columns)
+
+# Instância global
+tabular_extractor = TabularExtractor()
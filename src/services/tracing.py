@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Tracing
+Árvores de spans por requisição com exportação no formato OTLP/JSON
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any, Callable, Iterator, Tuple
+
+import requests
+
+from services.fork_safety import register_after_fork
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'false').lower() == 'true'
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+
+class _Trace:
+    """Spans finalizados de um mesmo trace, exportados quando a raiz termina"""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List['Span'] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: 'Span'):
+        with self._lock:
+            self.spans.append(span)
+
+class Span:
+    """Operação cronometrada com atributos, filha do span ativo no contexto"""
+
+    def __init__(self, name: str, trace: _Trace, parent_id: Optional[str], attributes: Dict[str, Any], kind: int = 1):
+        self.name = name
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        self.is_root = parent_id is None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def recording(self) -> bool:
+        return True
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.error = message
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.trace.add(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns or time.time_ns()),
+            'attributes': [_otlp_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+class _NoopSpan:
+    """Span usado quando o tracing está desligado ou o trace não foi amostrado"""
+
+    trace_id = None
+    span_id = None
+    recording = False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_error(self, message: str):
+        pass
+
+    def end(self):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)[:1000]}}
+
+class TraceExporter:
+    """Exporta traces em background para arquivo JSON lines ou coletor OTLP/HTTP"""
+
+    def __init__(self):
+        self.service_name = os.getenv('OTEL_SERVICE_NAME', 'arqv30-enhanced')
+        self.endpoint = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT', '').rstrip('/')
+        self.file_path = os.getenv('TRACING_FILE', os.path.join('logs', 'traces.jsonl'))
+        self.sample_ratio = float(os.getenv('TRACING_SAMPLE_RATIO', 1.0))
+        self._queue: 'queue.Queue[Optional[_Trace]]' = queue.Queue(maxsize=int(os.getenv('TRACING_QUEUE_SIZE', 1000)))
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+        self._session: Optional[requests.Session] = None
+
+    def submit(self, trace: _Trace):
+        """Enfileira trace concluído (descarta se a fila estiver cheia)"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            logger.debug("Fila de traces cheia - trace descartado")
+
+    def _ensure_worker(self):
+        # Threads não sobrevivem ao fork: cada worker do gunicorn cria a sua
+        if self._worker_pid == os.getpid():
+            return
+        self._worker_pid = os.getpid()
+        self._worker = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                return
+            try:
+                self.export(trace)
+            except Exception as e:
+                logger.debug(f"Falha ao exportar trace {trace.trace_id}: {e}")
+
+    def _payload(self, trace: _Trace) -> Dict[str, Any]:
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [
+                    _otlp_attribute('service.name', self.service_name),
+                    _otlp_attribute('process.pid', os.getpid())
+                ]},
+                'scopeSpans': [{
+                    'scope': {'name': 'arqv30.tracing'},
+                    'spans': [span.to_otlp() for span in trace.spans]
+                }]
+            }]
+        }
+
+    def export(self, trace: _Trace):
+        """Grava um trace no destino configurado"""
+        payload = self._payload(trace)
+
+        if self.endpoint:
+            if self._session is None:
+                self._session = requests.Session()
+            self._session.post(f"{self.endpoint}/v1/traces", json=payload, timeout=5)
+            return
+
+        directory = os.path.dirname(self.file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.file_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(payload, ensure_ascii=False) + '\n')
+
+    def flush(self, timeout: float = 5.0):
+        """Aguarda a fila esvaziar (usado no encerramento)"""
+        deadline = time.time() + timeout
+        while not self._queue.empty() and time.time() < deadline:
+            time.sleep(0.05)
+
+    def reset_after_fork(self):
+        """Descarta fila e sessão herdadas do master; a thread de exportação é recriada no próximo trace"""
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._worker = None
+        self._worker_pid = None
+        self._session = None
+
+exporter = TraceExporter()
+register_after_fork('tracing', exporter.reset_after_fork)
+atexit.register(exporter.flush)
+
+def _parse_traceparent(header: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Extrai trace_id e span pai de um cabeçalho W3C traceparent"""
+    if not header:
+        return None, None
+    parts = header.strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    return parts[1], parts[2]
+
+def begin_span(name: str, traceparent: Optional[str] = None, kind: int = 1, **attributes) -> Tuple[Any, contextvars.Token]:
+    """Abre span filho do span ativo (ou raiz de um novo trace) e o torna ativo"""
+    parent = _current_span.get()
+
+    if not TRACING_ENABLED or parent is NOOP_SPAN:
+        return NOOP_SPAN, _current_span.set(parent)
+
+    if parent is None:
+        # Decisão de amostragem tomada uma vez por trace, na raiz
+        if random.random() >= exporter.sample_ratio:
+            return NOOP_SPAN, _current_span.set(NOOP_SPAN)
+        trace_id, parent_id = _parse_traceparent(traceparent)
+        span = Span(name, _Trace(trace_id or os.urandom(16).hex()), parent_id, attributes, kind)
+        # Com traceparent remoto o span local ainda é a raiz deste processo
+        span.is_root = True
+    else:
+        span = Span(name, parent.trace, parent.span_id, attributes, kind)
+
+    return span, _current_span.set(span)
+
+def end_span(span: Any, token: contextvars.Token, error: Optional[BaseException] = None):
+    """Finaliza o span, restaura o anterior e exporta o trace quando a raiz termina"""
+    _current_span.reset(token)
+    if not span.recording:
+        return
+    if error is not None:
+        span.set_error(f"{type(error).__name__}: {error}")
+    span.end()
+    if span.is_root:
+        exporter.submit(span.trace)
+
+@contextmanager
+def start_span(name: str, **attributes) -> Iterator[Any]:
+    """Context manager de span; sem tracing ativo devolve um span no-op"""
+    if not TRACING_ENABLED:
+        yield NOOP_SPAN
+        return
+
+    span, token = begin_span(name, **attributes)
+    try:
+        yield span
+    except BaseException as e:
+        end_span(span, token, e)
+        raise
+    else:
+        end_span(span, token)
+
+def get_current_span() -> Any:
+    """Span ativo no contexto (ou no-op)"""
+    return _current_span.get() or NOOP_SPAN
+
+def set_attribute(key: str, value: Any):
+    """Atributo no span ativo, ex.: cache.hit"""
+    if TRACING_ENABLED:
+        get_current_span().set_attribute(key, value)
+
+def traced(name: str) -> Callable:
+    """Decorator que envolve a função em um span"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def wrap_context(func: Callable) -> Callable:
+    """Leva o contexto atual (span e recorder de fases) para threads de executors"""
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Cópia por execução: um mesmo Context não pode ser usado por duas threads
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
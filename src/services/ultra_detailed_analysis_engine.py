@@ -13,6 +13,12 @@ from typing import Dict, List, Optional, Any
 from services.ai_manager import ai_manager
 from services.search_manager import search_manager
 from services.content_extractor import content_extractor
+from services.context_packer import context_packer
+from services.attachment_service import attachment_service
+from services.stub_providers import polite_delay
+from services.phase_timing import record_phase
+from services.tracing import traced
+from services.metrics import timed, engine_method_seconds
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +32,8 @@ class UltraDetailedAnalysisEngine:
         self.max_content_extraction = 30
         logger.info("Ultra Detailed Analysis Engine inicializado - Modo GIGANTE ativado")
     
+    @timed(engine_method_seconds, method='generate_gigantic_analysis')
+    @traced('engine.generate_gigantic_analysis')
     def generate_gigantic_analysis(
         self, 
         data: Dict[str, Any], 
@@ -63,6 +71,7 @@ class UltraDetailedAnalysisEngine:
                 "analysis_depth": "GIGANTE",
                 "data_sources": len(massive_data.get("search_results", [])),
                 "content_extracted": len(massive_data.get("extracted_content", [])),
+                "attachments_used": len(massive_data.get("attachments", [])),
                 "insights_generated": len(unique_insights),
                 "quality_score": 99.8,
                 "completeness": "MAXIMUM"
@@ -75,6 +84,7 @@ class UltraDetailedAnalysisEngine:
             logger.error(f"❌ Erro na análise GIGANTE: {str(e)}", exc_info=True)
             return self._generate_emergency_analysis(data, str(e))
     
+    @timed(engine_method_seconds, method='_collect_massive_data')
     def _collect_massive_data(
         self, 
         data: Dict[str, Any], 
@@ -90,21 +100,34 @@ class UltraDetailedAnalysisEngine:
             "market_intelligence": {},
             "competitive_data": {},
             "trend_analysis": {},
+            "attachments": [],
             "total_sources": 0
         }
         
+        # Anexos processados da sessão, lidos direto do armazenamento de anexos
+        if session_id:
+            massive_data["attachments"] = attachment_service.get_session_attachments(
+                session_id, include_content=True, attachment_ids=data.get('attachment_ids')
+            )
+            if massive_data["attachments"]:
+                logger.info(f"📎 {len(massive_data['attachments'])} anexo(s) da sessão incluído(s) no contexto")
+        
         # Queries de pesquisa ultra-específicas
         search_queries = self._generate_ultra_specific_queries(data)
         
         for query in search_queries:
             try:
                 # Busca com múltiplos provedores
-                results = search_manager.multi_search(query, max_results_per_provider=10)
+                with record_phase('search', query=query) as span:
+                    results = search_manager.multi_search(query, max_results_per_provider=10)
+                    span.set_attribute('results', len(results))
                 massive_data["search_results"].extend(results)
                 
                 # Extrai conteúdo das páginas
                 for result in results[:5]:  # Top 5 por query
-                    content = content_extractor.extract_content(result['url'])
+                    with record_phase('extraction', url=result['url']) as span:
+                        content = content_extractor.extract_content(result['url'])
+                        span.set_attribute('content_length', len(content or ''))
                     if content:
                         massive_data["extracted_content"].append({
                             'url': result['url'],
@@ -114,7 +137,7 @@ class UltraDetailedAnalysisEngine:
                             'source': result['source']
                         })
                 
-                time.sleep(1)  # Rate limiting
+                polite_delay(1)  # Rate limiting
                 
             except Exception as e:
                 logger.warning(f"Erro na query '{query}': {str(e)}")
@@ -165,6 +188,7 @@ class UltraDetailedAnalysisEngine:
         
         return base_queries[:15]  # Máximo 15 queries
     
+    @timed(engine_method_seconds, method='_execute_ultra_analysis')
     def _execute_ultra_analysis(
         self, 
         data: Dict[str, Any], 
@@ -173,13 +197,14 @@ class UltraDetailedAnalysisEngine:
         """Executa análise ultra-profunda com IA"""
         
         # Prepara contexto massivo
-        search_context = self._prepare_massive_context(massive_data)
+        search_context = self._prepare_massive_context(data, massive_data)
         
         # Prompt ultra-detalhado
         ultra_prompt = self._build_ultra_detailed_prompt(data, search_context)
         
         # Executa análise com IA
-        ai_response = ai_manager.generate_analysis(ultra_prompt, max_tokens=8192)
+        with record_phase('llm'):
+            ai_response = ai_manager.generate_analysis(ultra_prompt, max_tokens=8192)
         
         if ai_response:
             try:
@@ -200,26 +225,16 @@ class UltraDetailedAnalysisEngine:
         
         return self._generate_basic_ultra_analysis(data)
     
-    def _prepare_massive_context(self, massive_data: Dict[str, Any]) -> str:
-        """Prepara contexto massivo para análise"""
-        
-        context = "PESQUISA MASSIVA REALIZADA:\n\n"
-        
-        # Adiciona conteúdo extraído
-        for i, content_item in enumerate(massive_data.get("extracted_content", [])[:20], 1):
-            context += f"--- FONTE {i}: {content_item['title']} ---\n"
-            context += f"URL: {content_item['url']}\n"
-            context += f"Query: {content_item['query']}\n"
-            context += f"Conteúdo: {content_item['content'][:2000]}\n\n"
-        
-        # Adiciona resumo dos resultados
-        search_results = massive_data.get("search_results", [])
-        if search_results:
-            context += f"RESUMO DOS RESULTADOS ({len(search_results)} fontes):\n"
-            for result in search_results[:30]:
-                context += f"• {result['title']} - {result['snippet'][:150]}\n"
-        
-        return context[:25000]  # Limita tamanho
+    def _prepare_massive_context(self, data: Dict[str, Any], massive_data: Dict[str, Any]) -> str:
+        """Prepara contexto massivo para análise dentro do orçamento de tokens do provedor"""
+        
+        return context_packer.pack_analysis_context(
+            data,
+            massive_data.get("attachments", []),
+            massive_data.get("extracted_content", []),
+            massive_data.get("search_results", []),
+            provider=ai_manager.get_best_provider()
+        )
     
     def _build_ultra_detailed_prompt(self, data: Dict[str, Any], search_context: str) -> str:
         """Constrói prompt ultra-detalhado"""
@@ -237,7 +252,7 @@ Você é o DIRETOR SUPREMO DE ANÁLISE DE MERCADO GIGANTE, especialista de elite
 - **Objetivo de Receita**: R$ {data.get('objetivo_receita', 'Não informado')}
 
 ## CONTEXTO DE PESQUISA MASSIVA:
-{search_context[:15000]}
+{search_context or "Nenhuma pesquisa realizada"}
 
 ## INSTRUÇÕES PARA ANÁLISE GIGANTE:
 
@@ -445,6 +460,7 @@ CRÍTICO: Use APENAS dados REAIS da pesquisa. NUNCA invente informações.
             "raw_ai_response": text[:1000]
         }
     
+    @timed(engine_method_seconds, method='_generate_unique_insights')
     def _generate_unique_insights(
         self, 
         data: Dict[str, Any], 
@@ -494,6 +510,7 @@ CRÍTICO: Use APENAS dados REAIS da pesquisa. NUNCA invente informações.
         
         return insights[:25]  # Máximo 25 insights
     
+    @timed(engine_method_seconds, method='_consolidate_gigantic_analysis')
     def _consolidate_gigantic_analysis(
         self, 
         data: Dict[str, Any], 
@@ -16,6 +16,7 @@ import re
 from datetime import datetime
 from bs4 import BeautifulSoup
 import random
+from services.stub_providers import resolve_url, polite_delay
 
 logger = logging.getLogger(__name__)
 
@@ -30,8 +31,8 @@ class WebSailorAgent:
         self.google_cse_id = os.getenv("GOOGLE_CSE_ID")
         
         # URLs das APIs
-        self.google_search_url = "https://www.googleapis.com/customsearch/v1"
-        self.jina_reader_url = "https://r.jina.ai/"
+        self.google_search_url = resolve_url("https://www.googleapis.com/customsearch/v1")
+        self.jina_reader_url = resolve_url("https://r.jina.ai/")
         
         # Headers REAIS para requisições
         self.headers = {
@@ -99,7 +100,7 @@ class WebSailorAgent:
                                 })
                                 
                                 # Delay para não sobrecarregar
-                                time.sleep(0.5)
+                                polite_delay(0.5)
                     
                 except Exception as e:
                     logger.warning(f"Erro em {search_engine.__name__}: {str(e)}")
@@ -123,7 +124,7 @@ class WebSailorAgent:
                                 "source_type": "internal_link",
                                 "parent_url": page["url"]
                             })
-                            time.sleep(0.3)
+                            polite_delay(0.3)
             
             # 3. PESQUISA DE QUERIES RELACIONADAS REAIS
             if aggressive_mode:
@@ -144,7 +145,7 @@ class WebSailorAgent:
                                     "source_type": "related_query",
                                     "original_query": related_query
                                 })
-                                time.sleep(0.4)
+                                polite_delay(0.4)
                     except Exception as e:
                         logger.warning(f"Erro em query relacionada '{related_query}': {str(e)}")
                         continue
@@ -222,7 +223,7 @@ class WebSailorAgent:
         
         try:
             # Bing search via scraping
-            search_url = f"https://www.bing.com/search?q={quote_plus(query)}&cc=br&setlang=pt-br"
+            search_url = resolve_url(f"https://www.bing.com/search?q={quote_plus(query)}&cc=br&setlang=pt-br")
             
             response = requests.get(
                 search_url,
@@ -267,7 +268,7 @@ class WebSailorAgent:
         """Busca REAL usando DuckDuckGo"""
         
         try:
-            search_url = f"https://html.duckduckgo.com/html/?q={quote_plus(query)}"
+            search_url = resolve_url(f"https://html.duckduckgo.com/html/?q={quote_plus(query)}")
             
             response = requests.get(
                 search_url,
@@ -309,7 +310,7 @@ class WebSailorAgent:
         """Busca REAL usando Yahoo"""
         
         try:
-            search_url = f"https://br.search.yahoo.com/search?p={quote_plus(query)}"
+            search_url = resolve_url(f"https://br.search.yahoo.com/search?p={quote_plus(query)}")
             
             response = requests.get(
                 search_url,
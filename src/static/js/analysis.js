@@ -90,7 +90,8 @@ class AnalysisManager {
             objetivo_receita: document.getElementById('objetivo_receita')?.value || '',
             orcamento_marketing: document.getElementById('orcamento_marketing')?.value || '',
             prazo_lancamento: document.getElementById('prazo_lancamento')?.value || '',
-            session_id: this.getSessionId()
+            session_id: this.getSessionId(),
+            attachment_ids: window.uploadManager?.getAttachmentIds() || []
         };
     }
 
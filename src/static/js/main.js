@@ -16,7 +16,13 @@ class ARQVApp {
     }
 
     generateSessionId() {
-        return 'session_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9);
+        // Mesma chave do analysisManager: os anexos enviados precisam cair na sessão da análise
+        let sessionId = localStorage.getItem('arqv30_session_id');
+        if (!sessionId) {
+            sessionId = 'session_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9);
+            localStorage.setItem('arqv30_session_id', sessionId);
+        }
+        return sessionId;
     }
 
     setupEventListeners() {
@@ -3,6 +3,7 @@
 class FileUploadManager {
     constructor() {
         this.maxFileSize = 16 * 1024 * 1024; // 16MB
+        this.maxJobPollTime = 6 * 60 * 1000; // 6min (servidor encerra o job em 5min)
         this.allowedTypes = [
             'application/pdf',
             'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
@@ -176,7 +177,7 @@ class FileUploadManager {
             // Prepare form data
             const formData = new FormData();
             formData.append('file', file);
-            formData.append('session_id', window.app?.sessionId || 'default_session');
+            formData.append('session_id', window.app?.sessionId || '');
             
             // Upload with progress tracking
             const xhr = new XMLHttpRequest();
@@ -200,6 +201,13 @@ class FileUploadManager {
                     } else {
                         this.onUploadError(fileElement, response.error || 'Erro desconhecido');
                     }
+                } else if (xhr.status === 202) {
+                    // Extração em background: consulta o job até concluir
+                    const response = JSON.parse(xhr.responseText);
+                    if (statusElement) {
+                        statusElement.textContent = 'Processando...';
+                    }
+                    this.pollAttachmentJob(fileElement, response.status_url);
                 } else {
                     this.onUploadError(fileElement, 'Erro no servidor');
                 }
@@ -220,6 +228,28 @@ class FileUploadManager {
         }
     }
     
+    async pollAttachmentJob(fileElement, statusUrl, interval = 1000, deadline = Date.now() + this.maxJobPollTime) {
+        try {
+            const response = await fetch(statusUrl);
+            const job = await response.json();
+            
+            if (job.status === 'processing') {
+                if (Date.now() + interval > deadline) {
+                    this.onUploadError(fileElement, 'Tempo limite de processamento excedido');
+                    return;
+                }
+                setTimeout(() => this.pollAttachmentJob(fileElement, statusUrl, Math.min(interval * 1.5, 5000), deadline), interval);
+            } else if (job.success) {
+                this.onUploadSuccess(fileElement, job);
+            } else {
+                this.onUploadError(fileElement, job.error || 'Erro desconhecido');
+            }
+        } catch (error) {
+            console.error('Attachment status error:', error);
+            this.onUploadError(fileElement, 'Erro de conexão');
+        }
+    }
+    
     onUploadSuccess(fileElement, response) {
         const statusElement = fileElement.querySelector('.file-status');
         const progressContainer = fileElement.querySelector('.file-progress');
@@ -278,6 +308,13 @@ class FileUploadManager {
     removeFile(fileId) {
         const fileElement = document.querySelector(`[data-file-id="${fileId}"]`);
         if (fileElement) {
+            // O texto do anexo fica no servidor: a remoção precisa chegar lá para sair da análise
+            const response = fileElement._responseData;
+            if (response && response.attachment_id) {
+                fetch(`/api/session_attachments/${encodeURIComponent(response.session_id)}/${response.attachment_id}`, {
+                    method: 'DELETE'
+                }).catch(error => console.error('Attachment remove error:', error));
+            }
             fileElement.remove();
         }
         
@@ -314,6 +351,13 @@ class FileUploadManager {
         return iconMap[extension] || 'fas fa-file';
     }
     
+    getAttachmentIds() {
+        // Só os anexos visíveis e processados entram na análise
+        return this.getUploadedFiles()
+            .map(file => file.attachment_id)
+            .filter(Boolean);
+    }
+    
     getUploadedFiles() {
         const fileElements = document.querySelectorAll('.file-item');
         const files = [];
@@ -0,0 +1,19 @@
+-- ARQV30 Enhanced v2.0 - Database Migration
+-- Store each analysis section once: sections live only in their own JSONB
+-- columns and comprehensive_analysis keeps the remaining keys. The full
+-- document is assembled on read (DatabaseManager.assemble_analysis).
+
+-- Older rows stored sections as JSON strings inside JSONB; unwrap them
+UPDATE analyses SET avatar_data = (avatar_data #>> '{}')::jsonb WHERE jsonb_typeof(avatar_data) = 'string';
+UPDATE analyses SET positioning_data = (positioning_data #>> '{}')::jsonb WHERE jsonb_typeof(positioning_data) = 'string';
+UPDATE analyses SET competition_data = (competition_data #>> '{}')::jsonb WHERE jsonb_typeof(competition_data) = 'string';
+UPDATE analyses SET marketing_data = (marketing_data #>> '{}')::jsonb WHERE jsonb_typeof(marketing_data) = 'string';
+UPDATE analyses SET metrics_data = (metrics_data #>> '{}')::jsonb WHERE jsonb_typeof(metrics_data) = 'string';
+UPDATE analyses SET comprehensive_analysis = (comprehensive_analysis #>> '{}')::jsonb WHERE jsonb_typeof(comprehensive_analysis) = 'string';
+
+-- Drop the duplicated copy of each section (only where its column holds it)
+UPDATE analyses SET comprehensive_analysis = comprehensive_analysis - 'avatar_ultra_detalhado' WHERE avatar_data IS NOT NULL AND comprehensive_analysis ? 'avatar_ultra_detalhado';
+UPDATE analyses SET comprehensive_analysis = comprehensive_analysis - 'estrategia_posicionamento' WHERE positioning_data IS NOT NULL AND comprehensive_analysis ? 'estrategia_posicionamento';
+UPDATE analyses SET comprehensive_analysis = comprehensive_analysis - 'analise_concorrencia_profunda' WHERE competition_data IS NOT NULL AND comprehensive_analysis ? 'analise_concorrencia_profunda';
+UPDATE analyses SET comprehensive_analysis = comprehensive_analysis - 'estrategia_palavras_chave' WHERE marketing_data IS NOT NULL AND comprehensive_analysis ? 'estrategia_palavras_chave';
+UPDATE analyses SET comprehensive_analysis = comprehensive_analysis - 'metricas_performance' WHERE metrics_data IS NOT NULL AND comprehensive_analysis ? 'metricas_performance';
@@ -0,0 +1,14 @@
+-- ARQV30 Enhanced v2.0 - Database Migration
+-- Indexes for keyset pagination of /api/analyses on (created_at, id),
+-- optionally filtered by nicho or status. Each index matches the
+-- ORDER BY created_at DESC, id DESC of DatabaseManager.list_analyses_page,
+-- so a page is an index range scan regardless of how deep it is.
+
+CREATE INDEX IF NOT EXISTS idx_analyses_created_at_id ON analyses (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_analyses_nicho_created_at_id ON analyses (nicho, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_analyses_status_created_at_id ON analyses (status, created_at DESC, id DESC);
+
+-- Superseded by the composite indexes above
+DROP INDEX IF EXISTS idx_analyses_created_at;
+DROP INDEX IF EXISTS idx_analyses_nicho;
+DROP INDEX IF EXISTS idx_analyses_status;
@@ -0,0 +1,28 @@
+-- ARQV30 Enhanced v2.0 - Database Migration
+-- Aggregate statistics for /api/stats and /api/session/info in a single
+-- pass over analyses, called through PostgREST as rpc('analysis_stats').
+-- Replaces three client-side queries, one of which downloaded the status
+-- of every row.
+
+CREATE OR REPLACE FUNCTION analysis_stats(recent_days INTEGER DEFAULT 7)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH per_status AS (
+        SELECT
+            COALESCE(status, 'unknown') AS status,
+            COUNT(*) AS total,
+            COUNT(*) FILTER (WHERE created_at >= NOW() - make_interval(days => recent_days)) AS recent
+        FROM analyses
+        GROUP BY 1
+    )
+    SELECT jsonb_build_object(
+        'total_analyses', COALESCE(SUM(total), 0),
+        'recent_analyses', COALESCE(SUM(recent), 0),
+        'status_counts', COALESCE(jsonb_object_agg(status, total), '{}'::jsonb)
+    )
+    FROM per_status;
+$$;
+
+GRANT EXECUTE ON FUNCTION analysis_stats(INTEGER) TO anon, authenticated;
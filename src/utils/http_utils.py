@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - HTTP Utilities
+Sessões HTTP reutilizáveis com pool de conexões para os provedores
+"""
+
+import os
+import logging
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+def create_pooled_session(
+    pool_size: Optional[int] = None,
+    max_retries: int = 0,
+    headers: Optional[Dict[str, str]] = None
+) -> requests.Session:
+    """Cria sessão HTTP com pool de conexões keep-alive próprio"""
+    pool_size = pool_size or int(os.getenv('HTTP_POOL_SIZE', 10))
+
+    session = requests.Session()
+
+    # Retry apenas em falhas de conexão - erros HTTP são tratados pelos provedores
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=0,
+        status=0,
+        backoff_factor=0.5
+    )
+
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    if headers:
+        session.headers.update(headers)
+
+    return session
+
+def warm_up_session(session: requests.Session, url: str, timeout: float = 5.0) -> bool:
+    """Abre conexão TCP/TLS antecipadamente para que a primeira chamada real não pague o handshake"""
+    try:
+        session.head(url, timeout=timeout, allow_redirects=False)
+        return True
+    except Exception as e:
+        logger.debug(f"Warm-up falhou para {url}: {e}")
+        return False
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - JSON Codec
+Serialização JSON com orjson quando instalado e fallback para a biblioteca padrão
+"""
+
+import os
+import json
+import logging
+from typing import Any, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON_CODEC=stdlib força a biblioteca padrão mesmo com orjson instalado
+BACKEND = 'orjson' if orjson is not None and os.getenv('JSON_CODEC', 'auto').lower() != 'stdlib' else 'stdlib'
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Serializa para bytes UTF-8"""
+    if BACKEND == 'orjson':
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def dumps(obj: Any) -> str:
+    """Serializa para str (UTF-8 sem escapes de acentos)"""
+    if BACKEND == 'orjson':
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Desserializa str ou bytes"""
+    if BACKEND == 'orjson':
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Exceção levantada por loads em ambos os backends (orjson.JSONDecodeError herda de ValueError)
+DecodeError = ValueError
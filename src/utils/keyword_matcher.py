@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Keyword Matcher
+Contagem de várias listas de palavras-chave em uma única passada sobre o texto,
+sem diferenciar maiúsculas nem acentos
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List
+
+_COMBINING_MARKS = re.compile('[\u0300-\u036f]')
+
+def fold(text: str) -> str:
+    """Minúsculas e sem acentos ('Aversão' -> 'aversao'); texto ASCII só passa pelo casefold"""
+    text = text.casefold()
+    if text.isascii():
+        return text
+    return _COMBINING_MARKS.sub('', unicodedata.normalize('NFKD', text))
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Alternação em forma de trie ('p(?:esquisa|ersona(?:lidade)?)'): em cada posição o motor
+    testa um ramo por prefixo em vez de todas as palavras, e o '?' guloso prefere a mais longa"""
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if '' in node:
+            return '(?:' + '|'.join(branches) + ')?'
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+    return build(trie)
+
+class KeywordMatcher:
+    """Uma regex compilada uma vez para todas as palavras-chave de todos os grupos; o texto
+    é percorrido uma vez (count_keywords) e os grupos são somados a partir da contagem.
+
+    Cada ocorrência conta para a palavra-chave mais longa que casa naquela posição e a
+    palavra precisa começar em fronteira de palavra ('dor' não casa dentro de 'vendedor',
+    mas 'depoimento' casa em 'depoimentos')."""
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        self.groups: Dict[str, List[str]] = {group: list(keywords) for group, keywords in groups.items()}
+
+        # Forma normalizada -> palavras-chave originais (a mesma palavra pode estar em mais de um grupo)
+        self._keywords_by_folded: Dict[str, List[str]] = {}
+        for keywords in self.groups.values():
+            for keyword in keywords:
+                spelled = self._keywords_by_folded.setdefault(fold(keyword), [])
+                if keyword not in spelled:
+                    spelled.append(keyword)
+
+        # Depois do fold as letras latinas são ASCII; re.ASCII deixa o \b bem mais barato
+        self._pattern = re.compile(r'\b' + _trie_pattern(self._keywords_by_folded), re.ASCII)
+
+    def count_keywords(self, text: str) -> Counter:
+        """Ocorrências de cada palavra-chave (grafia original) em uma passada.
+
+        O texto é normalizado uma vez com fold(); a regex só contém letras ASCII."""
+        matches = Counter(self._pattern.findall(fold(text)))
+        counts = Counter()
+        for matched, count in matches.items():
+            for keyword in self._keywords_by_folded[matched]:
+                counts[keyword] += count
+        return counts
+
+    def group_totals(self, counts: Counter) -> Dict[str, int]:
+        """Soma das ocorrências por grupo, na ordem dos grupos"""
+        return {group: sum(counts[keyword] for keyword in keywords) for group, keywords in self.groups.items()}
+
+    def found(self, counts: Counter, group: str) -> List[str]:
+        """Palavras-chave do grupo presentes na contagem, na ordem da lista"""
+        return [keyword for keyword in self.groups[group] if counts[keyword]]
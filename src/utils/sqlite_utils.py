@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - SQLite Utils
+Conexões SQLite reaproveitadas por thread para os bancos locais em cache/
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+def add_missing_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]):
+    """Acrescenta colunas novas a uma tabela criada por uma versão anterior (CREATE TABLE IF NOT EXISTS não altera)"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, definition in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+class ThreadLocalConnections:
+    """Uma conexão por thread para um arquivo SQLite.
+
+    A conexão é aberta no primeiro uso da thread e reaproveitada nas próximas; conexões
+    herdadas de outro processo (fork) nunca são reutilizadas."""
+
+    def __init__(self, db_path: str, timeout: float = 10):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Mesma semântica do `with conn:` do sqlite3 (commit no fim, rollback em erro), sem fechar a conexão"""
+        conn = self.get()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def close(self):
+        """Fecha a conexão da thread atual"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local = threading.local()
+
+    def reset_after_fork(self):
+        """No filho, descarta as conexões do pai sem fechá-las (o arquivo continua aberto no pai)"""
+        self._local = threading.local()
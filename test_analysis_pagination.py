@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Testes da Paginação por Keyset
+DatabaseManager.list_analyses_page contra um cliente Supabase falso que avalia
+os filtros PostgREST (eq, or_, and(...)) como o servidor faria
+"""
+
+import os
+import re
+import sys
+import base64
+
+os.environ.setdefault('LOG_FILE_ENABLED', 'false')
+os.environ.setdefault('AI_WARMUP_ENABLED', 'false')
+
+# Adiciona o diretório src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import pytest
+
+from database import DatabaseManager, encode_cursor, decode_cursor
+
+def _split_top_level(expr):
+    """Separa condições por vírgula fora de parênteses e aspas"""
+    parts, depth, quoted, current = [], 0, False, ''
+    for char in expr:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(current)
+            current = ''
+            continue
+        current += char
+    parts.append(current)
+    return parts
+
+def _compile_condition(condition):
+    """Condição PostgREST ('col.op.valor' ou 'and(...)') -> predicado sobre a linha"""
+    nested = re.fullmatch(r'(and|or)\((.*)\)', condition)
+    if nested:
+        predicates = [_compile_condition(part) for part in _split_top_level(nested.group(2))]
+        combine = all if nested.group(1) == 'and' else any
+        return lambda row: combine(predicate(row) for predicate in predicates)
+
+    column, operator, value = condition.split('.', 2)
+    value = value[1:-1] if value.startswith('"') else value
+    if column == 'id':
+        value = int(value)
+    compare = {
+        'eq': lambda a, b: a == b,
+        'lt': lambda a, b: a < b,
+        'gt': lambda a, b: a > b,
+    }[operator]
+    return lambda row: compare(row[column], value)
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+        self.columns = None
+        self.predicates = []
+        self.orders = []
+        self.max_rows = None
+        self.skip = 0
+
+    def select(self, columns):
+        self.columns = [c.strip() for c in columns.split(',')]
+        return self
+
+    def eq(self, column, value):
+        self.predicates.append(lambda row: row[column] == value)
+        return self
+
+    def or_(self, expr):
+        self.predicates.append(_compile_condition(f"or({expr})"))
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.max_rows = count
+        return self
+
+    def range(self, start, end):
+        self.skip = start
+        self.max_rows = end - start + 1
+        return self
+
+    def execute(self):
+        rows = [row for row in self.rows if all(predicate(row) for predicate in self.predicates)]
+        for column, desc in reversed(self.orders):
+            rows.sort(key=lambda row: row[column], reverse=desc)
+        rows = rows[self.skip:]
+        rows = rows[:self.max_rows] if self.max_rows is not None else rows
+        data = [{column: row[column] for column in self.columns} for row in rows]
+        return type('Result', (), {'data': data})()
+
+class FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def table(self, name):
+        assert name == 'analyses'
+        return FakeQuery(self.rows)
+
+def _rows():
+    """23 análises; vários grupos compartilham o mesmo created_at (inclusive com microssegundos)"""
+    timestamps = (
+        ['2026-03-01T10:00:00+00:00'] * 4 +
+        ['2026-03-01T09:30:00.123456+00:00'] * 6 +
+        ['2026-02-28T23:59:59+00:00'] +
+        ['2026-02-20T08:00:00+00:00'] * 7 +
+        ['2026-01-15T12:00:00+00:00'] * 5
+    )
+    return [
+        {
+            'id': index + 1,
+            'nicho': 'saude' if index % 3 == 0 else 'financas',
+            'produto': f'produto {index + 1}',
+            'status': 'completed',
+            'created_at': created_at,
+            'updated_at': created_at
+        }
+        for index, created_at in enumerate(timestamps)
+    ]
+
+def _manager(rows):
+    manager = DatabaseManager()
+    manager.available = True
+    manager._client = FakeClient(rows)
+    return manager
+
+def _expected_order(rows):
+    return [row['id'] for row in sorted(rows, key=lambda row: (row['created_at'], row['id']), reverse=True)]
+
+def _collect_pages(manager, limit, **filters):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page = manager.list_analyses_page(limit=limit, cursor=cursor, **filters)
+        assert len(page['analyses']) <= limit
+        ids.extend(row['id'] for row in page['analyses'])
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            return ids, pages
+        assert pages < 100, "paginação não terminou"
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 4, 5, 6, 7, 23, 50])
+def test_pages_cover_every_row_once(limit):
+    """Linhas com o mesmo created_at não se repetem nem somem entre páginas"""
+    rows = _rows()
+    ids, pages = _collect_pages(_manager(rows), limit)
+
+    assert ids == _expected_order(rows)
+    assert len(ids) == len(set(ids))
+    # Sonda limit+1: quando o total é múltiplo do limite não sobra página vazia
+    assert pages == -(-len(rows) // limit)
+
+def test_pages_with_filter():
+    rows = _rows()
+    ids, _ = _collect_pages(_manager(rows), 4, nicho='saude')
+
+    assert ids == _expected_order([row for row in rows if row['nicho'] == 'saude'])
+
+def test_cursor_round_trip():
+    row = {'id': 42, 'created_at': '2026-03-01T09:30:00.123456+00:00'}
+    cursor = encode_cursor(row)
+
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (row['created_at'], 42)
+
+@pytest.mark.parametrize('cursor', [
+    'lixo!!',
+    base64.urlsafe_b64encode(b'sem separador').decode('ascii'),
+    base64.urlsafe_b64encode(b'2026-03-01T10:00:00+00:00|abc').decode('ascii'),
+    base64.urlsafe_b64encode(b'ontem|12').decode('ascii'),
+    base64.urlsafe_b64encode(b'\xff\xfe|1').decode('ascii'),
+])
+def test_malformed_cursor_raises(cursor):
+    with pytest.raises(ValueError):
+        _manager(_rows()).list_analyses_page(limit=5, cursor=cursor)
+
+@pytest.fixture
+def client(monkeypatch):
+    from run import create_app
+    import routes.analysis
+
+    monkeypatch.setattr(routes.analysis, 'db_manager', _manager(_rows()))
+    return create_app().test_client()
+
+def test_route_rejects_malformed_cursor(client):
+    response = client.get('/api/analyses?cursor=lixo!!')
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Cursor inválido'
+
+def test_route_pages_with_cursor(client):
+    first = client.get('/api/analyses?limit=5&cursor=').get_json()
+    second = client.get(f"/api/analyses?limit=5&cursor={first['next_cursor']}").get_json()
+
+    ids = [row['id'] for row in first['analyses'] + second['analyses']]
+    assert ids == _expected_order(_rows())[:10]
+
+def test_route_default_keeps_offset_response(client):
+    """Sem cursor a resposta continua no formato antigo (com offset, sem next_cursor)"""
+    body = client.get('/api/analyses?limit=5').get_json()
+
+    assert set(body) == {'analyses', 'limit', 'offset', 'count'}
+    assert body['offset'] == 0
+    assert [row['id'] for row in body['analyses']] == _expected_order(_rows())[:5]
+
+def test_route_offset_applies_filters_and_fields(client):
+    rows = _rows()
+    body = client.get('/api/analyses?limit=3&offset=2&nicho=saude&fields=id,produto').get_json()
+
+    expected = _expected_order([row for row in rows if row['nicho'] == 'saude'])[2:5]
+    assert [row['id'] for row in body['analyses']] == expected
+    assert all(set(row) == {'id', 'produto'} for row in body['analyses'])
+
+def test_route_rejects_offset_with_cursor(client):
+    response = client.get('/api/analyses?offset=5&cursor=')
+
+    assert response.status_code == 400
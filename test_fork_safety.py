@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Testes de Fork Safety
+Todos os hooks pós-fork registrados pelos serviços rodam sem erro em um processo filho
+"""
+
+import os
+import sys
+import glob
+import importlib
+import traceback
+
+os.environ.setdefault('LOG_FILE_ENABLED', 'false')
+os.environ.setdefault('AI_WARMUP_ENABLED', 'false')
+
+# Adiciona o diretório src ao path
+SRC_DIR = os.path.join(os.path.dirname(__file__), 'src')
+sys.path.insert(0, SRC_DIR)
+
+import pytest
+
+from services import fork_safety
+
+def _import_services_with_hooks():
+    """Importa a aplicação e todo módulo que registra hook, mesmo os que ela não importa"""
+    import run  # noqa: F401
+    modules = ['database']
+    for path in glob.glob(os.path.join(SRC_DIR, 'services', '*.py')):
+        with open(path, encoding='utf-8') as f:
+            if 'register_after_fork(' in f.read():
+                modules.append(f"services.{os.path.splitext(os.path.basename(path))[0]}")
+    for module in modules:
+        importlib.import_module(module)
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork indisponível')
+def test_every_after_fork_hook_runs_in_child():
+    _import_services_with_hooks()
+    hooks = list(fork_safety._after_fork_hooks)
+    assert hooks
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Filho: chama cada hook sem o try/except de reinit_after_fork e reporta as falhas
+        os.close(read_fd)
+        failures = []
+        for name, callback in hooks:
+            try:
+                callback()
+            except Exception:
+                failures.append(f"{name}: {traceback.format_exc(limit=3)}")
+        with os.fdopen(write_fd, 'w', encoding='utf-8') as out:
+            out.write('\n'.join(failures))
+        os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, encoding='utf-8') as report:
+        failures = report.read()
+    _, status = os.waitpid(pid, 0)
+
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    assert failures == '', failures
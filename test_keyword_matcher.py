@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Testes do Keyword Matcher
+Normalização de acentos, fronteira de palavra e preferência pela palavra-chave mais longa
+"""
+
+import os
+import sys
+import unicodedata
+
+os.environ.setdefault('LOG_FILE_ENABLED', 'false')
+os.environ.setdefault('AI_WARMUP_ENABLED', 'false')
+
+# Adiciona o diretório src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import pytest
+
+from utils.keyword_matcher import KeywordMatcher, fold
+
+@pytest.mark.parametrize('text, expected', [
+    ('Aversão', 'aversao'),
+    ('ESTATÍSTICA', 'estatistica'),
+    ('Questionário de Motivação', 'questionario de motivacao'),
+    ('ação', 'acao'),
+    (unicodedata.normalize('NFD', 'gráfico'), 'grafico'),
+    ('plain ascii', 'plain ascii'),
+])
+def test_fold(text, expected):
+    assert fold(text) == expected
+
+def test_accents_and_case_are_ignored():
+    matcher = KeywordMatcher({'provas': ['gráfico', 'estatística'], 'drivers': ['aversão a perda']})
+
+    counts = matcher.count_keywords("GRAFICO, gráfico e Gráfico; Estatistica. Aversao a perda e AVERSÃO A PERDA")
+
+    assert counts['gráfico'] == 3
+    assert counts['estatística'] == 1
+    assert counts['aversão a perda'] == 2
+    assert matcher.group_totals(counts) == {'provas': 4, 'drivers': 2}
+
+def test_decomposed_text_matches():
+    matcher = KeywordMatcher({'dados': ['análise']})
+
+    assert matcher.count_keywords(unicodedata.normalize('NFD', 'Análise e ANÁLISE'))['análise'] == 2
+
+def test_keyword_must_start_at_word_boundary():
+    matcher = KeywordMatcher({'perfis': ['dor']})
+
+    counts = matcher.count_keywords("O vendedor e o condor não contam; a dor e as dores contam")
+
+    assert counts['dor'] == 2
+
+def test_longest_keyword_wins():
+    matcher = KeywordMatcher({'perfis': ['personalidade'], 'persona': ['persona']})
+
+    counts = matcher.count_keywords("A persona tem personalidade forte; personas e personalidades")
+
+    assert counts['persona'] == 2
+    assert counts['personalidade'] == 2
+    assert matcher.found(counts, 'persona') == ['persona']
+
+def test_keyword_shared_between_groups():
+    matcher = KeywordMatcher({'perfis': ['Comportamento', 'dor'], 'persona': ['comportamento']})
+
+    counts = matcher.count_keywords("comportamento COMPORTAMENTO")
+
+    assert counts['Comportamento'] == 2
+    assert counts['comportamento'] == 2
+    assert matcher.group_totals(counts) == {'perfis': 2, 'persona': 2}
+    assert matcher.found(counts, 'perfis') == ['Comportamento']
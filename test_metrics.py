@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Testes das Métricas Multi-worker
+Snapshots de workers encerrados são consolidados (counters e histogramas) e removidos
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+os.environ.setdefault('LOG_FILE_ENABLED', 'false')
+os.environ.setdefault('AI_WARMUP_ENABLED', 'false')
+
+# Adiciona o diretório src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import pytest
+
+from services.metrics import MetricsRegistry
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = MetricsRegistry()
+    registry.multiproc_dir = str(tmp_path)
+    registry.counter('jobs_total', 'Jobs', ('result',))
+    registry.gauge('in_progress', 'Em andamento')
+    registry.histogram('duration_seconds', 'Duração', buckets=(1.0, 5.0))
+    return registry
+
+def _write_worker(registry, pid, jobs, in_progress, durations):
+    """Snapshot como o flush() de outro worker gravaria"""
+    histogram = {'buckets': [0, 0], 'sum': 0.0, 'count': 0}
+    for value in durations:
+        histogram['buckets'][0 if value <= 1.0 else 1] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+    snapshot = {
+        'pid': pid,
+        'kinds': {'jobs_total': 'counter', 'in_progress': 'gauge', 'duration_seconds': 'histogram'},
+        'metrics': {
+            'jobs_total': {'done': jobs},
+            'in_progress': {'': in_progress},
+            'duration_seconds': {'': histogram}
+        }
+    }
+    with open(registry._snapshot_path(pid), 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+
+def _sample(text, prefix):
+    return [line for line in text.splitlines() if line.startswith(prefix)]
+
+def test_retire_worker_keeps_counters_and_removes_snapshot(registry):
+    first, second = _dead_pid(), _dead_pid()
+    _write_worker(registry, first, jobs=3, in_progress=2, durations=[0.5, 2.0])
+    _write_worker(registry, second, jobs=4, in_progress=1, durations=[3.0])
+
+    registry.retire_worker(first)
+    registry.retire_worker(second)
+    registry.retire_worker(second)  # child_exit repetido não soma de novo
+
+    assert sorted(os.listdir(registry.multiproc_dir)) == ['.lock', 'retired.json']
+    with open(registry._retired_path(), encoding='utf-8') as f:
+        retired = json.load(f)
+    assert retired['metrics']['jobs_total'] == {'done': 7}
+    assert retired['metrics']['duration_seconds'][''] == {'buckets': [1, 2], 'sum': 5.5, 'count': 3}
+    assert 'in_progress' not in retired['metrics']
+
+def test_render_adds_retired_totals_and_drops_dead_gauges(registry):
+    _write_worker(registry, _dead_pid(), jobs=5, in_progress=3, durations=[0.2])
+    registry.metrics['jobs_total'].inc(result='done')
+    registry.metrics['in_progress'].set(1)
+
+    text = registry.render()
+
+    # O snapshot do worker morto foi consolidado no próprio render
+    assert [name for name in os.listdir(registry.multiproc_dir) if name.startswith('worker_')] == [f"worker_{os.getpid()}.json"]
+    assert _sample(text, 'jobs_total{') == ['jobs_total{result="done"} 6']
+    assert _sample(text, 'in_progress ') == ['in_progress 1']
+    assert _sample(text, 'duration_seconds_count') == ['duration_seconds_count 1']
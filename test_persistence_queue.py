@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v2.0 - Testes da Fila de Persistência
+Gravação em lote contra um banco falso que rejeita linhas específicas
+"""
+
+import os
+import sys
+
+os.environ.setdefault('LOG_FILE_ENABLED', 'false')
+os.environ.setdefault('AI_WARMUP_ENABLED', 'false')
+
+# Adiciona o diretório src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import pytest
+
+import services.persistence_queue as persistence_queue_module
+from services.persistence_queue import AnalysisPersistenceQueue
+
+class FakeDatabase:
+    """Insere em memória; um lote com alguma linha 'invalida' é recusado inteiro, como no PostgREST"""
+
+    available = True
+
+    def __init__(self):
+        self.saved = []
+        self.insert_calls = 0
+
+    def build_analysis_row(self, analysis_data):
+        return {'produto': analysis_data['produto']}
+
+    def insert_analyses(self, rows):
+        self.insert_calls += 1
+        if any(row['produto'] == 'invalida' for row in rows):
+            raise RuntimeError('invalid input syntax for type json')
+        saved = []
+        for row in rows:
+            self.saved.append(row)
+            saved.append(dict(row, id=len(self.saved)))
+        return saved
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(persistence_queue_module, 'db_manager', database)
+    manager = AnalysisPersistenceQueue(cache_dir=str(tmp_path))
+    manager.max_retries = 2
+    manager.retry_base_delay = 0
+    return manager, database
+
+def _batch(products):
+    return [(f"pending-{index}", {'produto': product}) for index, product in enumerate(products)]
+
+def test_batch_is_saved_in_one_insert(queue):
+    manager, database = queue
+
+    manager._write_batch(_batch(['a', 'b', 'c']))
+
+    assert database.insert_calls == 1
+    assert [manager.get_status(f"pending-{index}")['status'] for index in range(3)] == ['saved'] * 3
+
+def test_rejected_row_does_not_drop_the_rest_of_the_batch(queue):
+    manager, database = queue
+    products = ['a', 'b', 'invalida', 'c', 'd']
+
+    manager._write_batch(_batch(products))
+
+    statuses = {product: manager.get_status(f"pending-{index}") for index, product in enumerate(products)}
+    assert statuses['invalida']['status'] == 'failed'
+    assert 'json' in statuses['invalida']['error']
+    assert all(statuses[product]['status'] == 'saved' for product in 'abcd')
+    assert [row['produto'] for row in database.saved] == ['a', 'b', 'c', 'd']
+    assert [statuses[product]['database_id'] for product in 'abcd'] == [1, 2, 3, 4]
+
+def test_single_row_batch_fails_after_retries(queue):
+    manager, database = queue
+
+    manager._write_batch(_batch(['invalida']))
+
+    assert database.insert_calls == manager.max_retries
+    assert manager.get_status('pending-0')['status'] == 'failed'